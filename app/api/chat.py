@@ -1,33 +1,84 @@
-from fastapi import APIRouter, HTTPException
-from ..models.schemas import ChatMessage, ChatResponse
-from ..services.chat_agent import chat_agent
-from typing import List, Dict, Any
+from fastapi import APIRouter, HTTPException, UploadFile, File, Depends
+from ..models.schemas import ChatMessage, ChatResponse, IngestionReport
+from ..services.chat_agent import ChatAgent, get_chat_agent
+from ..services.conversation_store import DEFAULT_SESSION_ID, ConversationStore, get_conversation_store
+from ..services.ingestion import BulkIngestor
+from ..services.knowledge_graph import KnowledgeGraphService
+from ..services.write_behind import WriteBehindQueue, get_write_behind_queue
+from .dependencies import get_tenant_bulk_ingestor, get_tenant_id, get_tenant_kg_service
+from typing import List, Dict, Any, Optional
 
 router = APIRouter()
 
 @router.post("/message", response_model=ChatResponse)
-async def send_message(message: ChatMessage):
-    """Send a message to the chat agent"""
+async def send_message(message: ChatMessage, chat_agent: ChatAgent = Depends(get_chat_agent),
+                       kg_service: KnowledgeGraphService = Depends(get_tenant_kg_service)):
+    """Send a message to the chat agent; entities are added to the tenant's graph"""
     try:
-        response = chat_agent.process_message(message.message)
+        response = await chat_agent.process_message(message.message, message.session_id or DEFAULT_SESSION_ID,
+                                                    kg_service.tenant_id)
         return response
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
+@router.post("/ingest", response_model=IngestionReport)
+async def ingest_documents(file: UploadFile = File(...), nlp_batch_size: int = None,
+                           n_process: int = None, write_batch_size: int = None,
+                           bulk_ingestor: BulkIngestor = Depends(get_tenant_bulk_ingestor)):
+    """Bulk-ingest an NDJSON upload into the tenant's graph, one {"text": ...} document per line"""
+    try:
+        # UploadFile spools large bodies to disk and is read line by line
+        return await bulk_ingestor.ingest(
+            file.file,
+            nlp_batch_size=nlp_batch_size,
+            n_process=n_process,
+            write_batch_size=write_batch_size
+        )
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+    finally:
+        await file.close()
+
 @router.get("/history")
-async def get_chat_history():
-    """Get the conversation history"""
+async def get_chat_history(session_id: str = DEFAULT_SESSION_ID, cursor: Optional[int] = None, limit: int = 50,
+                           chat_agent: ChatAgent = Depends(get_chat_agent), tenant_id: str = Depends(get_tenant_id)):
+    """Get a page of a session's conversation history, newest page first"""
     try:
-        history = chat_agent.get_conversation_history()
-        return {"history": history}
+        history, next_cursor = await chat_agent.get_conversation_history(session_id, cursor, limit, tenant_id)
+        return {"session_id": session_id, "history": history, "next_cursor": next_cursor}
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
 @router.delete("/history")
-async def clear_chat_history():
-    """Clear the conversation history"""
+async def clear_chat_history(session_id: str = DEFAULT_SESSION_ID, chat_agent: ChatAgent = Depends(get_chat_agent),
+                             tenant_id: str = Depends(get_tenant_id)):
+    """Clear a session's conversation history"""
     try:
-        chat_agent.conversation_history = []
+        await chat_agent.clear_conversation_history(session_id, tenant_id)
         return {"message": "Chat history cleared"}
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+@router.get("/sessions")
+async def get_conversation_store_stats(conversation_store: ConversationStore = Depends(get_conversation_store)):
+    """Get conversation store backend, session and message counts"""
+    return conversation_store.stats()
+
+@router.get("/nlp")
+async def get_nlp_stats(chat_agent: ChatAgent = Depends(get_chat_agent)):
+    """Get the spaCy pipeline profile, model load time and extraction cache hit rate"""
+    return chat_agent.nlp_stats()
+
+@router.get("/queue")
+async def get_queue_stats(write_behind_queue: WriteBehindQueue = Depends(get_write_behind_queue)):
+    """Get write-behind queue depth, lag and write counters"""
+    return write_behind_queue.stats()
+
+@router.post("/queue/flush")
+async def flush_queue(write_behind_queue: WriteBehindQueue = Depends(get_write_behind_queue)):
+    """Write all pending queued graph updates now"""
+    try:
+        await write_behind_queue.flush()
+        return write_behind_queue.stats()
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
\ No newline at end of file
@@ -0,0 +1,28 @@
+from fastapi import Depends, Header, HTTPException
+from typing import AsyncIterator, Optional
+from ..core.tenants import validate_tenant_id
+from ..services.graph_dump import GraphDumper
+from ..services.ingestion import BulkIngestor
+from ..services.knowledge_graph import KnowledgeGraphService, TenantLimitError, get_warm_kg_service
+
+def get_tenant_id(x_tenant_id: Optional[str] = Header(None)) -> str:
+    """Tenant named by the X-Tenant-ID header, DEFAULT_TENANT_ID without one"""
+    try:
+        return validate_tenant_id(x_tenant_id)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+async def get_tenant_kg_service(tenant_id: str = Depends(get_tenant_id)) -> AsyncIterator[KnowledgeGraphService]:
+    """The tenant's service, leased for the request; a tenant's first request waits for its warm-up"""
+    try:
+        service = await get_warm_kg_service(tenant_id)
+    except TenantLimitError as e:
+        raise HTTPException(status_code=503, detail=str(e))
+    with service.lease():
+        yield service
+
+def get_tenant_graph_dumper(kg_service: KnowledgeGraphService = Depends(get_tenant_kg_service)) -> GraphDumper:
+    return GraphDumper(kg_service)
+
+def get_tenant_bulk_ingestor(kg_service: KnowledgeGraphService = Depends(get_tenant_kg_service)) -> BulkIngestor:
+    return BulkIngestor(service=kg_service)
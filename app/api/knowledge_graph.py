@@ -1,80 +1,334 @@
-from fastapi import APIRouter, HTTPException
-from ..models.schemas import KnowledgeGraphResponse, SearchRequest, SearchResponse
-from ..services.knowledge_graph import kg_service
-from typing import List, Dict, Any
+from fastapi import APIRouter, HTTPException, Request, Response, Depends
+from fastapi.responses import StreamingResponse
+from ..core.config import settings
+from ..core.database import query_log
+from ..models.schemas import DumpReport, KnowledgeGraphResponse, RestoreReport, SearchRequest, SearchResponse
+from ..services.graph_codec import MEDIA_TYPES, GraphSnapshot, accepts_gzip, negotiate_format
+from ..services.graph_dump import DUMP_NAME_PATTERN, GraphDumper, dump_root, list_dumps
+from ..services.knowledge_graph import KnowledgeGraphService
+from .dependencies import get_tenant_graph_dumper, get_tenant_id, get_tenant_kg_service
+from datetime import datetime
+from pathlib import Path
+from typing import List, Dict, Any, Optional
+import json
 
 router = APIRouter()
 
+# Every representation depends on these request headers
+VARY_HEADERS = {"Vary": "Accept, Accept-Encoding, X-Tenant-ID"}
+
+def encoded_response(request: Request, snapshot: GraphSnapshot, wire_format: str,
+                     headers: Dict[str, str]) -> Response:
+    # Returned as-is: the rows came from the database, so response_model validation is skipped
+    body, compressed = snapshot.body(wire_format, accepts_gzip(request.headers.get("accept-encoding", "")))
+    headers = {**headers, **VARY_HEADERS}
+    if compressed:
+        headers["Content-Encoding"] = "gzip"
+    return Response(content=body, media_type=MEDIA_TYPES[wire_format], headers=headers)
+
 @router.get("/", response_model=KnowledgeGraphResponse)
-async def get_knowledge_graph(limit: int = 100):
-    """Get the current knowledge graph"""
+async def get_knowledge_graph(request: Request, limit: int = 100, format: Optional[str] = None,
+                              since: Optional[int] = None,
+                              kg_service: KnowledgeGraphService = Depends(get_tenant_kg_service)):
+    """Get the current knowledge graph.
+    
+    ``format=compact`` (or ``Accept: application/vnd.kg.compact+json``) returns the
+    columnar encoding and ``format=msgpack`` the same as MessagePack. Bodies are
+    encoded once per snapshot and gzipped when the client accepts it.
+    
+    Every response carries ``next_cursor``; with ``since`` set to a previous
+    one, only the nodes and relationships written after it are returned.
+    """
+    try:
+        wire_format = negotiate_format(request.headers.get("accept", ""), format)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    
+    if since is not None:
+        # Deltas are small and cursor-specific, so they are neither cached nor tagged
+        try:
+            changes = await kg_service.get_changes(since, limit)
+            return encoded_response(request, changes, wire_format, {})
+        except Exception as e:
+            raise HTTPException(status_code=500, detail=str(e))
+    
+    try:
+        sequence = await kg_service.current_sequence()
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+    etag = kg_service.snapshot_etag(limit, sequence, wire_format)
+    if_none_match = request.headers.get("if-none-match", "")
+    if etag in [tag.strip() for tag in if_none_match.split(",")]:
+        kg_service.not_modified_responses += 1
+        return Response(status_code=304, headers={"ETag": etag, **VARY_HEADERS})
+    
+    try:
+        snapshot = await kg_service.get_snapshot(limit, sequence)
+        # A cache miss re-reads the sequence, which may have moved on since the tag was built
+        etag = kg_service.snapshot_etag(limit, snapshot.cursor, wire_format)
+        return encoded_response(request, snapshot, wire_format, {"ETag": etag})
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+@router.get("/export")
+async def export_knowledge_graph(consistent: bool = False, page_size: int = 1000, limit: Optional[int] = None,
+                                 kg_service: KnowledgeGraphService = Depends(get_tenant_kg_service)):
+    """Stream the whole knowledge graph as NDJSON, one node or relationship per line"""
+    async def lines():
+        counts = {"node": 0, "relationship": 0}
+        async for record in kg_service.export_graph(page_size=page_size, consistent=consistent, limit=limit):
+            counts[record["kind"]] += 1
+            yield json.dumps(record, default=str) + "\n"
+        yield json.dumps({"kind": "end", "nodes": counts["node"], "relationships": counts["relationship"]}) + "\n"
+    
+    return StreamingResponse(lines(), media_type="application/x-ndjson")
+
+@router.post("/dump", response_model=DumpReport)
+async def dump_knowledge_graph(compression: Optional[str] = None,
+                               dumper: GraphDumper = Depends(get_tenant_graph_dumper)):
+    """Write the tenant's whole graph to a new dump directory under its dump root"""
+    name = f"kg-{datetime.now().strftime('%Y%m%d-%H%M%S-%f')}"
+    try:
+        return await dumper.dump(str(Path(dump_root(dumper.service.tenant_id)) / name), compression=compression)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+@router.get("/dumps")
+async def get_dumps(tenant_id: str = Depends(get_tenant_id)):
+    """The tenant's complete dumps, newest first"""
+    return {"dumps": list_dumps(dump_root(tenant_id))}
+
+@router.post("/restore", response_model=RestoreReport)
+async def restore_knowledge_graph(name: str, batch_size: Optional[int] = None,
+                                  dumper: GraphDumper = Depends(get_tenant_graph_dumper)):
+    """Bulk-load one of the tenant's dumps by name, merging it into its current graph"""
+    if not DUMP_NAME_PATTERN.fullmatch(name) or name in (".", ".."):
+        raise HTTPException(status_code=400, detail=f"Invalid dump name {name!r}")
     try:
-        return kg_service.get_knowledge_graph(limit)
+        return await dumper.restore(str(Path(dump_root(dumper.service.tenant_id)) / name), batch_size=batch_size)
+    except FileNotFoundError as e:
+        raise HTTPException(status_code=404, detail=str(e))
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
+@router.get("/backend")
+async def get_backend_stats(kg_service: KnowledgeGraphService = Depends(get_tenant_kg_service)):
+    """Get the active storage backend and its size"""
+    return kg_service.backend.stats()
+
+@router.get("/cache")
+async def get_cache_stats(kg_service: KnowledgeGraphService = Depends(get_tenant_kg_service)):
+    """Get graph snapshot cache hit/miss statistics"""
+    return kg_service.snapshot_cache_stats()
+
+@router.get("/queries")
+async def get_query_log():
+    """Get recent slow Neo4j queries and sampled PROFILE plans"""
+    return {
+        "slow_query_threshold": settings.SLOW_QUERY_THRESHOLD,
+        "profile_sample_rate": settings.QUERY_PROFILE_SAMPLE_RATE,
+        "slow_queries": list(query_log.slow_queries),
+        "profiles": list(query_log.profiles)
+    }
+
+@router.get("/autocomplete")
+async def autocomplete_entities(prefix: str, limit: int = 10,
+                                kg_service: KnowledgeGraphService = Depends(get_tenant_kg_service)):
+    """Complete entity names from the in-memory resolution index"""
+    return {"prefix": prefix, "completions": kg_service.entity_index.complete(prefix, limit)}
+
+def _analytics_enabled(kg_service: KnowledgeGraphService):
+    if not settings.ANALYTICS_ENABLED:
+        raise HTTPException(status_code=409, detail="Graph analytics are disabled (ANALYTICS_ENABLED)")
+    return kg_service.analytics
+
+def _analytics_results(kg_service: KnowledgeGraphService):
+    if _analytics_enabled(kg_service).results is None:
+        raise HTTPException(status_code=503, detail="Graph analytics have not been computed yet")
+    return kg_service.analytics
+
+@router.get("/analytics/status")
+async def get_analytics_status(kg_service: KnowledgeGraphService = Depends(get_tenant_kg_service)):
+    """Get analytics graph size, pending changes and last computation time"""
+    return kg_service.analytics.status()
+
+@router.post("/analytics/refresh", status_code=202)
+async def refresh_analytics(kg_service: KnowledgeGraphService = Depends(get_tenant_kg_service)):
+    """Start recomputing analytics in the background"""
+    analytics = _analytics_enabled(kg_service)
+    # Computing before the graph is loaded would publish results for part of it
+    if not analytics.loaded:
+        raise HTTPException(status_code=503, detail="The analytics graph is still loading")
+    analytics.refresh()
+    return analytics.status()
+
+@router.get("/analytics/pagerank")
+async def get_pagerank(limit: int = 20, offset: int = 0,
+                       kg_service: KnowledgeGraphService = Depends(get_tenant_kg_service)):
+    """Most central entities by precomputed PageRank"""
+    analytics = _analytics_results(kg_service)
+    return {"computed_at": analytics.computed_at, "results": analytics.top_pagerank(limit, offset)}
+
+@router.get("/analytics/components")
+async def get_components(limit: int = 20, min_size: int = 1,
+                         kg_service: KnowledgeGraphService = Depends(get_tenant_kg_service)):
+    """Largest connected components (ignoring edge direction)"""
+    analytics = _analytics_results(kg_service)
+    return {
+        "computed_at": analytics.computed_at,
+        "total": len(analytics.results["components"]),
+        "components": analytics.groups("components", limit, min_size)
+    }
+
+@router.get("/analytics/communities")
+async def get_communities(limit: int = 20, min_size: int = 1,
+                          kg_service: KnowledgeGraphService = Depends(get_tenant_kg_service)):
+    """Largest Louvain communities"""
+    analytics = _analytics_results(kg_service)
+    return {
+        "computed_at": analytics.computed_at,
+        "total": len(analytics.results["communities"]),
+        "communities": analytics.groups("communities", limit, min_size)
+    }
+
+@router.get("/analytics/entity/{entity_id}")
+async def get_entity_analytics(entity_id: str, kg_service: KnowledgeGraphService = Depends(get_tenant_kg_service)):
+    """PageRank, rank, component and community of one entity"""
+    scores = _analytics_results(kg_service).entity_scores(entity_id)
+    if scores is None:
+        raise HTTPException(status_code=404, detail=f"Entity not in the analytics snapshot: {entity_id}")
+    return scores
+
+@router.get("/analytics/path")
+async def get_shortest_path(source: str, target: str, directed: bool = False,
+                            kg_service: KnowledgeGraphService = Depends(get_tenant_kg_service)):
+    """Shortest path between two entities on the analytics snapshot"""
+    path = await _analytics_results(kg_service).shortest_path(source, target, directed)
+    return {"source": source, "target": target, "path": path, "length": len(path) - 1 if path else None}
+
+@router.get("/events")
+async def get_event_stats(kg_service: KnowledgeGraphService = Depends(get_tenant_kg_service)):
+    """Get live delta subscriber counts and resync statistics"""
+    return kg_service.events.stats()
+
+@router.get("/entity-index")
+async def get_entity_index_stats(kg_service: KnowledgeGraphService = Depends(get_tenant_kg_service)):
+    """Get entity resolution index size and hit/miss statistics"""
+    return kg_service.entity_index.stats()
+
+@router.get("/similar")
+async def get_similar_entities(entity: Optional[str] = None, text: Optional[str] = None, limit: int = 10,
+                               kg_service: KnowledgeGraphService = Depends(get_tenant_kg_service)):
+    """Top-k entities by name and mention-context similarity to an entity (id, name or alias) or free text"""
+    similarity = kg_service.similarity
+    if similarity.state != "ready":
+        raise HTTPException(status_code=503, detail="The similarity index has not been loaded yet")
+    if entity is not None:
+        entity_id = kg_service.resolve_entity(entity)
+        results = similarity.similar_to_entity(entity_id, limit)
+        if results is None:
+            raise HTTPException(status_code=404, detail=f"Entity not in the similarity index: {entity}")
+        return {"entity": entity_id, "results": results}
+    if text:
+        return {"text": text, "results": similarity.similar_to_text(text, limit)}
+    raise HTTPException(status_code=400, detail="Pass entity or text")
+
+@router.get("/similar/stats")
+async def get_similarity_stats(kg_service: KnowledgeGraphService = Depends(get_tenant_kg_service)):
+    """Get similarity index size, vectorizer, IVF state and query latency"""
+    return kg_service.similarity.stats()
+
 @router.post("/search", response_model=SearchResponse)
-async def search_entities(request: SearchRequest):
+async def search_entities(request: SearchRequest,
+                          kg_service: KnowledgeGraphService = Depends(get_tenant_kg_service)):
     """Search for entities in the knowledge graph"""
     try:
-        results = kg_service.search_entities(request.query, request.limit)
-        return SearchResponse(results=results, total_count=len(results))
+        # Fetch one extra row to tell whether another page exists
+        results = await kg_service.search_entities(request.query, request.limit + 1, request.offset)
+        next_offset = request.offset + request.limit if len(results) > request.limit else None
+        results = results[:request.limit]
+        return SearchResponse(results=results, total_count=len(results), next_offset=next_offset)
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
 @router.get("/entity/{entity_id}")
-async def get_entity_details(entity_id: str):
-    """Get details and connections for a specific entity"""
+async def get_entity_details(entity_id: str,
+                             kg_service: KnowledgeGraphService = Depends(get_tenant_kg_service)):
+    """Get details and direct connections for a specific entity (see /neighbourhood for paging and depth)"""
     try:
-        connections = kg_service.get_entity_connections(entity_id)
+        connections = await kg_service.get_entity_connections(entity_id)
         return {"entity_id": entity_id, "connections": connections}
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
+@router.get("/entity/{entity_id}/neighbourhood")
+async def get_entity_neighbourhood(entity_id: str, depth: int = 1, direction: str = "both",
+                                   types: Optional[str] = None, fan_out: int = 100,
+                                   limit: int = 100, offset: int = 0,
+                                   kg_service: KnowledgeGraphService = Depends(get_tenant_kg_service)):
+    """Get entities within `depth` hops, nearest first (`types` is a comma-separated filter)"""
+    try:
+        neighbourhood = await kg_service.get_neighbourhood(
+            entity_id,
+            depth=depth,
+            direction=direction,
+            relationship_types=[t.strip() for t in types.split(",") if t.strip()] if types else None,
+            fan_out=fan_out,
+            limit=limit,
+            offset=offset
+        )
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+    if neighbourhood is None:
+        raise HTTPException(status_code=404, detail=f"Entity not found: {entity_id}")
+    return {"entity_id": entity_id, **neighbourhood}
+
+@router.get("/neighbourhood/cache")
+async def get_neighbourhood_cache_stats(kg_service: KnowledgeGraphService = Depends(get_tenant_kg_service)):
+    """Get neighbourhood cache hit/miss and invalidation statistics"""
+    return kg_service.neighbourhood_cache_stats()
+
 @router.post("/entity")
-async def create_entity(name: str, entity_type: str, properties: Dict[str, Any] = None):
+async def create_entity(name: str, entity_type: str, properties: Dict[str, Any] = None,
+                        kg_service: KnowledgeGraphService = Depends(get_tenant_kg_service)):
     """Manually create an entity"""
     try:
-        entity_id = kg_service.create_entity(name, entity_type, properties)
+        entity_id = await kg_service.create_entity(name, entity_type, properties)
         return {"entity_id": entity_id, "message": "Entity created successfully"}
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
 @router.post("/relationship")
 async def create_relationship(start_entity: str, end_entity: str, 
-                            relationship_type: str, properties: Dict[str, Any] = None):
+                            relationship_type: str, properties: Dict[str, Any] = None,
+                            kg_service: KnowledgeGraphService = Depends(get_tenant_kg_service)):
     """Manually create a relationship between entities"""
     try:
-        success = kg_service.create_relationship(start_entity, end_entity, relationship_type, properties)
-        if success:
-            return {"message": "Relationship created successfully"}
-        else:
-            raise HTTPException(status_code=400, detail="Failed to create relationship")
+        success = await kg_service.create_relationship(start_entity, end_entity, relationship_type, properties)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
+    if not success:
+        raise HTTPException(status_code=400, detail="Failed to create relationship")
+    return {"message": "Relationship created successfully"}
 
 @router.get("/stats")
-async def get_graph_stats():
+async def get_graph_stats(kg_service: KnowledgeGraphService = Depends(get_tenant_kg_service)):
     """Get statistics about the knowledge graph"""
+    return kg_service.stats.snapshot()
+
+@router.post("/stats/reconcile")
+async def reconcile_graph_stats(kg_service: KnowledgeGraphService = Depends(get_tenant_kg_service)):
+    """Recompute graph statistics from a full scan"""
     try:
-        stats_query = """
-        MATCH (n:Entity)
-        OPTIONAL MATCH (n)-[r]-()
-        RETURN 
-            count(DISTINCT n) as total_entities,
-            count(DISTINCT r) as total_relationships,
-            collect(DISTINCT labels(n)) as entity_types
-        """
-        
-        from ..core.database import db
-        result = db.execute_query(stats_query)
-        if result:
-            stats = result[0]
-            return {
-                "total_entities": stats["total_entities"],
-                "total_relationships": stats["total_relationships"] // 2,  # Divide by 2 because each relationship is counted twice
-                "entity_types": [label for sublist in stats["entity_types"] for label in sublist if label != "Entity"]
-            }
-        return {"total_entities": 0, "total_relationships": 0, "entity_types": []}
+        await kg_service.stats.reconcile()
+        return kg_service.stats.snapshot()
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
\ No newline at end of file
@@ -0,0 +1,131 @@
+#!/usr/bin/env python3
+"""
+Command-line tools for the Knowledge Management Agent
+
+Usage:
+    python -m app.cli ingest journal.ndjson --n-process 4 --tenant acme
+    python -m app.cli dump dumps/today --compression zstd
+    python -m app.cli restore dumps/today
+"""
+
+import argparse
+import asyncio
+import sys
+
+def _print_progress(report):
+    print(
+        f"\r📥 {report.documents} documents, {report.entities} entities, "
+        f"{report.relationships} relationships ({report.docs_per_second:.1f} docs/sec)",
+        end="",
+        file=sys.stderr,
+        flush=True
+    )
+
+async def run_ingest(args):
+    from .core.database import close_connections
+    from .services.backends import close_graph_backend
+    from .services.ingestion import get_bulk_ingestor
+    from .services.knowledge_graph import close_kg_services
+    
+    source = sys.stdin.buffer if args.path == "-" else open(args.path, "rb")
+    try:
+        report = await get_bulk_ingestor(args.tenant).ingest(
+            source,
+            nlp_batch_size=args.nlp_batch_size,
+            n_process=args.n_process,
+            write_batch_size=args.write_batch_size,
+            progress=_print_progress
+        )
+    finally:
+        if source is not sys.stdin.buffer:
+            source.close()
+        # Flushes the similarity index and stops analytics before the backend goes
+        await close_kg_services()
+        await close_graph_backend()
+        await close_connections()
+    
+    print(file=sys.stderr)
+    print(report.model_dump_json())
+    return 0
+
+def _print_restore_progress(report):
+    print(
+        f"\r📦 {report.nodes} nodes, {report.relationships} relationships "
+        f"({report.records_per_second:.0f} records/sec)",
+        end="",
+        file=sys.stderr,
+        flush=True
+    )
+
+async def run_dump(args):
+    from .core.database import close_connections
+    from .services.backends import close_graph_backend
+    from .services.graph_dump import get_graph_dumper
+    
+    try:
+        report = await get_graph_dumper(args.tenant).dump(args.directory, compression=args.compression,
+                                               chunk_records=args.chunk_records)
+    finally:
+        await close_graph_backend()
+        await close_connections()
+    
+    print(report.model_dump_json())
+    return 0
+
+async def run_restore(args):
+    from .core.database import close_connections
+    from .services.backends import close_graph_backend
+    from .services.graph_dump import get_graph_dumper
+    
+    try:
+        report = await get_graph_dumper(args.tenant).restore(args.directory, batch_size=args.batch_size,
+                                                  progress=_print_restore_progress)
+    finally:
+        await close_graph_backend()
+        await close_connections()
+    
+    print(file=sys.stderr)
+    print(report.model_dump_json())
+    return 0
+
+def tenant_id(value: str) -> str:
+    from .core.tenants import validate_tenant_id
+    
+    try:
+        return validate_tenant_id(value)
+    except ValueError as e:
+        raise argparse.ArgumentTypeError(str(e))
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog="python -m app.cli", description="Knowledge Management Agent tools")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+    
+    ingest = subparsers.add_parser("ingest", help="Bulk-ingest an NDJSON corpus into the knowledge graph")
+    ingest.add_argument("path", help="NDJSON file with one {\"text\": ...} document per line, or - for stdin")
+    ingest.add_argument("--nlp-batch-size", type=int, help="Documents per spaCy nlp.pipe batch")
+    ingest.add_argument("--n-process", type=int, help="spaCy worker processes")
+    ingest.add_argument("--write-batch-size", type=int, help="Documents per graph write transaction")
+    
+    dump = subparsers.add_parser("dump", help="Write the whole graph to a directory of compressed NDJSON chunks")
+    dump.add_argument("directory", help="New directory for the dump")
+    dump.add_argument("--compression", choices=["gzip", "zstd", "none"], help="Chunk compression (zstd needs zstandard)")
+    dump.add_argument("--chunk-records", type=int, help="Records per chunk file")
+    
+    restore = subparsers.add_parser("restore", help="Bulk-load a dump directory into the knowledge graph")
+    restore.add_argument("directory", help="Directory written by the dump command")
+    restore.add_argument("--batch-size", type=int, help="Records per write transaction")
+    
+    for command in (ingest, dump, restore):
+        command.add_argument("--tenant", type=tenant_id, help="Tenant whose graph to use (default: DEFAULT_TENANT_ID)")
+    
+    args = parser.parse_args(argv)
+    if args.command == "ingest":
+        return asyncio.run(run_ingest(args))
+    if args.command == "dump":
+        return asyncio.run(run_dump(args))
+    if args.command == "restore":
+        return asyncio.run(run_restore(args))
+    return 1
+
+if __name__ == "__main__":
+    sys.exit(main())
\ No newline at end of file
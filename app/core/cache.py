@@ -0,0 +1,120 @@
+from typing import Any, Dict, Hashable, Iterable, Optional, Set
+from collections import OrderedDict
+import threading
+import time
+
+_MISSING = object()
+
+class LRUCache:
+    """Small thread-safe LRU cache with optional TTL and hit/miss counters"""
+    
+    def __init__(self, maxsize: int = 128, ttl: Optional[float] = None):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._data: "OrderedDict[Hashable, tuple]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+    
+    def get(self, key: Hashable, default: Any = None) -> Any:
+        with self._lock:
+            entry = self._data.get(key, _MISSING)
+            if entry is not _MISSING and self.ttl is not None and time.monotonic() - entry[1] > self.ttl:
+                del self._data[key]
+                self._forget(key)
+                entry = _MISSING
+            if entry is _MISSING:
+                self.misses += 1
+                return default
+            self._data.move_to_end(key)
+            self.hits += 1
+            return entry[0]
+    
+    def set(self, key: Hashable, value: Any):
+        with self._lock:
+            self._data[key] = (value, time.monotonic())
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                evicted_key, _ = self._data.popitem(last=False)
+                self._forget(evicted_key)
+                self.evictions += 1
+    
+    def pop(self, key: Hashable, default: Any = None) -> Any:
+        with self._lock:
+            entry = self._data.pop(key, _MISSING)
+            self._forget(key)
+            return default if entry is _MISSING else entry[0]
+    
+    def clear(self):
+        with self._lock:
+            for key in self._data:
+                self._forget(key)
+            self._data.clear()
+    
+    def _forget(self, key: Hashable):
+        """Hook called with the lock held whenever an entry leaves the cache"""
+    
+    def __contains__(self, key: Hashable) -> bool:
+        with self._lock:
+            return key in self._data
+    
+    def __len__(self) -> int:
+        return len(self._data)
+    
+    def stats(self) -> Dict[str, Any]:
+        lookups = self.hits + self.misses
+        return {
+            "size": len(self._data),
+            "maxsize": self.maxsize,
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "hit_rate": round(self.hits / lookups, 4) if lookups else 0.0
+        }
+
+class TaggedLRUCache(LRUCache):
+    """LRUCache whose entries can also be dropped by tag.
+    
+    Each entry is stored with the tags it depends on (e.g. the ids of the
+    nodes a result was built from) and invalidate() removes every entry
+    carrying any of the given tags.
+    """
+    
+    def __init__(self, maxsize: int = 128, ttl: Optional[float] = None):
+        super().__init__(maxsize, ttl)
+        self._keys_by_tag: Dict[Hashable, Set[Hashable]] = {}
+        self._tags_by_key: Dict[Hashable, Set[Hashable]] = {}
+        self.invalidations = 0
+    
+    def set(self, key: Hashable, value: Any, tags: Iterable[Hashable] = ()):
+        with self._lock:
+            self._forget(key)
+            tags = set(tags)
+            self._tags_by_key[key] = tags
+            for tag in tags:
+                self._keys_by_tag.setdefault(tag, set()).add(key)
+        super().set(key, value)
+    
+    def invalidate(self, tags: Iterable[Hashable]) -> int:
+        """Drop every entry tagged with any of ``tags``; returns the number dropped"""
+        with self._lock:
+            keys = set()
+            for tag in tags:
+                keys.update(self._keys_by_tag.get(tag, ()))
+            for key in keys:
+                self._data.pop(key, None)
+                self._forget(key)
+            self.invalidations += len(keys)
+            return len(keys)
+    
+    def _forget(self, key: Hashable):
+        for tag in self._tags_by_key.pop(key, ()):
+            keys = self._keys_by_tag.get(tag)
+            if keys is not None:
+                keys.discard(key)
+                if not keys:
+                    del self._keys_by_tag[tag]
+    
+    def stats(self) -> Dict[str, Any]:
+        return {**super().stats(), "invalidations": self.invalidations}
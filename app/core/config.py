@@ -1,17 +1,147 @@
 from pydantic_settings import BaseSettings
-from typing import Optional
+from typing import Dict, List, Optional
 
 class Settings(BaseSettings):
+    # Graph storage: "neo4j", or "embedded" (in-process, optionally persisted to SQLite)
+    GRAPH_BACKEND: str = "neo4j"
+    EMBEDDED_DB_PATH: Optional[str] = None
+    
+    # Tenants: requests name one in the X-Tenant-ID header (DEFAULT_TENANT_ID without it).
+    # Each tenant loaded in a process has its own caches, statistics and indexes;
+    # past MAX_TENANTS the least recently used idle tenant is unloaded
+    DEFAULT_TENANT_ID: str = "default"
+    MAX_TENANTS: int = 100
+    
     # Neo4j Configuration
     NEO4J_URI: str = "bolt://localhost:7687"
     NEO4J_USERNAME: str = "neo4j"
     NEO4J_PASSWORD: str = "password"
+    NEO4J_MAX_CONCURRENT_QUERIES: int = 32
+    NEO4J_DATABASE: Optional[str] = None
+    
+    # Neo4j driver: connection pool, timeouts in seconds (None means the server default for
+    # transactions) and records fetched per round trip
+    NEO4J_MAX_CONNECTION_POOL_SIZE: int = 100
+    NEO4J_CONNECTION_ACQUISITION_TIMEOUT: float = 60.0
+    NEO4J_CONNECTION_TIMEOUT: float = 30.0
+    NEO4J_TRANSACTION_TIMEOUT: Optional[float] = None
+    NEO4J_FETCH_SIZE: int = 1000
+    
+    # Transient-error retries: managed transactions retry for up to the retry time,
+    # auto-commit statements up to NEO4J_MAX_RETRIES times with exponential backoff
+    NEO4J_MAX_TRANSACTION_RETRY_TIME: float = 15.0
+    NEO4J_MAX_RETRIES: int = 3
+    NEO4J_RETRY_BACKOFF: float = 0.2
+    
+    # Entity types that also become a node label; other types are stored under :Entity
+    # only, which keeps the set of distinct write queries (and cached plans) bounded
+    ENTITY_LABELS: List[str] = [
+        "CONCEPT", "PERSON", "NORP", "FAC", "ORG", "GPE", "LOC", "PRODUCT", "EVENT", "WORK_OF_ART",
+        "LAW", "LANGUAGE", "DATE", "TIME", "PERCENT", "MONEY", "QUANTITY", "ORDINAL", "CARDINAL"
+    ]
     
     # OpenAI Configuration
     OPENAI_API_KEY: Optional[str] = None
     
+    # Extra relationship verbs, e.g. {"SUPPORTS": "supports", "PART_OF": "is\\s+part\\s+of"}
+    RELATIONSHIP_PATTERNS: Dict[str, str] = {}
+    # Relationship types that can be written without a verb, e.g. via POST /api/kg/relationship;
+    # anything else is rejected, which keeps the set of relationship write queries bounded
+    RELATIONSHIP_TYPES: List[str] = []
+    
+    # Entity search: text properties covered by the full-text index
+    SEARCH_TEXT_PROPERTIES: List[str] = ["name", "type", "description", "notes", "source"]
+    
+    # Number of GET /api/kg/ snapshots (one per limit) kept in memory
+    GRAPH_SNAPSHOT_CACHE_SIZE: int = 16
+    # Seconds between re-reads of the durable change sequence that GET /api/kg/ ETags are built
+    # from; writes by other workers are seen within this interval. 0 reads it on every request,
+    # so even a 304 costs a database round trip
+    GRAPH_SEQUENCE_REFRESH_INTERVAL: float = 1.0
+    
+    # Graph statistics: full reconciliation at startup and every N seconds (0 disables)
+    STATS_RECONCILE_ON_STARTUP: bool = True
+    STATS_RECONCILE_INTERVAL: float = 3600
+    
+    # Conversation history: "memory" (per process) or "sqlite" (shared by workers)
+    CONVERSATION_STORE: str = "memory"
+    CONVERSATION_DB_PATH: str = "conversations.db"
+    CONVERSATION_MAX_MESSAGES: int = 200
+    CONVERSATION_MAX_SESSIONS: int = 1000
+    
+    # Live graph deltas over /ws/graph: coalescing window (seconds) and per-client queue bound
+    GRAPH_EVENTS_WINDOW: float = 0.1
+    GRAPH_EVENTS_QUEUE_SIZE: int = 64
+    
+    # k-hop neighbourhood queries: cached results, depth cap and visited-node cap
+    NEIGHBOURHOOD_CACHE_SIZE: int = 256
+    NEIGHBOURHOOD_MAX_DEPTH: int = 3
+    NEIGHBOURHOOD_MAX_NODES: int = 5000
+    
+    # Graph analytics: load the in-memory graph at startup and recompute every interval
+    # seconds when it changed, in a "thread" or "process" executor
+    ANALYTICS_ENABLED: bool = True
+    ANALYTICS_REFRESH_INTERVAL: float = 30.0
+    ANALYTICS_EXECUTOR: str = "thread"
+    
+    # Entity similarity: "auto" uses spaCy word vectors when NLP_MODEL has them, else hashed
+    # character n-grams of SIMILARITY_DIM. SIMILARITY_DIR keeps memory-mapped vectors across
+    # restarts (one worker per directory); search switches to the IVF index at IVF_MIN_SIZE
+    SIMILARITY_ENABLED: bool = True
+    SIMILARITY_VECTORIZER: str = "auto"
+    SIMILARITY_DIM: int = 256
+    SIMILARITY_DIR: Optional[str] = None
+    SIMILARITY_CONTEXT_WEIGHT: float = 0.3
+    SIMILARITY_CONTEXT_CHARS: int = 120
+    SIMILARITY_IVF_MIN_SIZE: int = 20000
+    SIMILARITY_NPROBE: int = 16
+    SIMILARITY_FLUSH_INTERVAL: float = 5.0
+    
+    # Maximum entities held by the in-memory name -> id resolution index
+    ENTITY_INDEX_MAX_SIZE: int = 100000
+    
+    # Query instrumentation: queries slower than SLOW_QUERY_THRESHOLD seconds are logged with
+    # their Cypher and parameter sizes; a sampled fraction of read queries runs with PROFILE
+    SLOW_QUERY_THRESHOLD: float = 0.5
+    SLOW_QUERY_LOG_SIZE: int = 100
+    QUERY_PROFILE_SAMPLE_RATE: float = 0.0
+    
+    # spaCy pipeline profile: "ner" loads only the entity recogniser, "parser" also keeps the
+    # tagger and parser for dependency-based relationships, "full" loads every component
+    NLP_MODEL: str = "en_core_web_sm"
+    NLP_PROFILE: str = "ner"
+    
+    # Extraction results cached by normalised text hash (0 disables); TTL in seconds
+    NLP_CACHE_SIZE: int = 4096
+    NLP_CACHE_TTL: Optional[float] = 3600.0
+    
+    # Graph dumps; compression is "gzip", "zstd" (needs zstandard) or "none"
+    DUMP_DIR: str = "dumps"
+    DUMP_CHUNK_RECORDS: int = 500000
+    DUMP_COMPRESSION: str = "gzip"
+    RESTORE_BATCH_SIZE: int = 10000
+    
+    # Bulk ingestion
+    INGEST_NLP_BATCH_SIZE: int = 64
+    INGEST_N_PROCESS: int = 1
+    INGEST_WRITE_BATCH_SIZE: int = 500
+    INGEST_QUEUE_SIZE: int = 4
+    
+    # Write-behind queue for chat ingestion
+    WRITE_BEHIND_ENABLED: bool = False
+    WRITE_BEHIND_BATCH_SIZE: int = 200
+    WRITE_BEHIND_FLUSH_INTERVAL: float = 0.5
+    WRITE_BEHIND_MAX_PENDING: int = 10000
+    WRITE_BEHIND_MAX_RETRIES: int = 5
+    WRITE_BEHIND_RETRY_BACKOFF: float = 0.2
+    
     # Application Configuration
     DEBUG: bool = True
+    SKIP_SCHEMA_SETUP: bool = False
+    # Schema setup at startup is retried while Neo4j is unreachable; after the last retry
+    # /ready reports the failure
+    SCHEMA_SETUP_RETRY_INTERVAL: float = 5.0
+    SCHEMA_SETUP_MAX_RETRIES: int = 60
     
     class Config:
         env_file = ".env"
@@ -1,38 +1,304 @@
-from neo4j import GraphDatabase
+from neo4j import AsyncGraphDatabase, Query, READ_ACCESS, WRITE_ACCESS, unit_of_work
+from neo4j.exceptions import ServiceUnavailable, SessionExpired, TransientError
+from typing import Any, AsyncIterator, Awaitable, Callable, Dict, List, Optional, Tuple
+from collections import deque
+from contextlib import asynccontextmanager
+from datetime import datetime
+from functools import lru_cache
 from .config import settings
+from .metrics import registry
+import asyncio
 import logging
+import random
+import re
+import time
 
 logger = logging.getLogger(__name__)
 
-class Neo4jConnection:
+QUERY_SECONDS = registry.histogram(
+    "neo4j_query_seconds", "Neo4j query latency, including waiting for a query slot",
+    ["query", "outcome"]
+)
+TRANSACTION_RETRIES = registry.counter(
+    "neo4j_transaction_retries_total", "Neo4j transactions retried after a transient error", ["query"]
+)
+QUERIES_IN_FLIGHT = registry.gauge("neo4j_queries_in_flight", "Neo4j queries holding a query slot")
+QUERIES_WAITING = registry.gauge("neo4j_queries_waiting", "Neo4j queries waiting for a query slot")
+PROFILABLE_QUERY = re.compile(r"^\s*(MATCH|OPTIONAL|UNWIND|WITH|RETURN)\b", re.IGNORECASE)
+MAX_LOGGED_QUERY_LENGTH = 2000
+
+def parameter_sizes(parameters: Optional[dict]) -> Dict[str, Optional[int]]:
+    """Length of each list, dict or string parameter (None for scalars)"""
+    return {
+        key: len(value) if isinstance(value, (list, tuple, dict, str)) else None
+        for key, value in (parameters or {}).items()
+    }
+
+def summarise_plan(plan: Dict[str, Any]) -> Dict[str, Any]:
+    """Operator tree of a PROFILE result with rows and db hits per operator"""
+    return {
+        "operator": plan.get("operatorType"),
+        "rows": plan.get("rows"),
+        "db_hits": plan.get("dbHits"),
+        "children": [summarise_plan(child) for child in plan.get("children", [])]
+    }
+
+class QueryLog:
+    """Recent slow queries and sampled PROFILE plans, newest last"""
+    
+    def __init__(self, size: int = 100):
+        self.slow_queries = deque(maxlen=size)
+        self.profiles = deque(maxlen=size)
+    
+    def record(self, name: str, query: str, parameters: Any, seconds: float, outcome: str,
+               plan: Optional[Dict[str, Any]] = None):
+        QUERY_SECONDS.observe(seconds, query=name, outcome=outcome)
+        if seconds < settings.SLOW_QUERY_THRESHOLD and plan is None:
+            return
+        
+        entry = {
+            "name": name,
+            "seconds": round(seconds, 4),
+            "outcome": outcome,
+            "query": " ".join(query.split())[:MAX_LOGGED_QUERY_LENGTH],
+            "parameter_sizes": parameters,
+            "at": datetime.now().isoformat()
+        }
+        if plan is not None:
+            self.profiles.append({**entry, "plan": summarise_plan(plan)})
+        if seconds >= settings.SLOW_QUERY_THRESHOLD:
+            self.slow_queries.append(entry)
+            logger.warning(f"Slow query {name} took {seconds:.3f}s ({outcome}), "
+                           f"parameter sizes {parameters}: {entry['query']}")
+    
+    def clear(self):
+        self.slow_queries.clear()
+        self.profiles.clear()
+
+query_log = QueryLog(settings.SLOW_QUERY_LOG_SIZE)
+
+def query_name(query: str) -> str:
+    """Fallback metric label: the leading Cypher keyword"""
+    words = query.split(None, 1)
+    return words[0].lower() if words else "empty"
+
+class AsyncNeo4jConnection:
+    """Non-blocking data-access layer used by the Neo4j backend.
+    
+    Reads run in managed read transactions (routed to followers in a
+    cluster) and writes in managed write transactions; the driver retries
+    both on transient errors with exponential backoff for up to
+    NEO4J_MAX_TRANSACTION_RETRY_TIME seconds. Statements that can't run in a
+    transaction function (e.g. ``CALL { } IN TRANSACTIONS``) go through
+    execute_autocommit, which retries transient errors itself.
+    
+    In-flight queries are capped by NEO4J_MAX_CONCURRENT_QUERIES so a burst of
+    requests queues here instead of exhausting the driver's connection pool.
+    """
+    
     def __init__(self):
         self.driver = None
+        self._semaphore = None
+        self.in_flight = 0
+        self.waiting = 0
+        self.peak_in_flight = 0
         self.connect()
     
     def connect(self):
         try:
-            self.driver = GraphDatabase.driver(
+            self.driver = AsyncGraphDatabase.driver(
                 settings.NEO4J_URI,
-                auth=(settings.NEO4J_USERNAME, settings.NEO4J_PASSWORD)
+                auth=(settings.NEO4J_USERNAME, settings.NEO4J_PASSWORD),
+                max_connection_pool_size=settings.NEO4J_MAX_CONNECTION_POOL_SIZE,
+                connection_acquisition_timeout=settings.NEO4J_CONNECTION_ACQUISITION_TIMEOUT,
+                connection_timeout=settings.NEO4J_CONNECTION_TIMEOUT,
+                max_transaction_retry_time=settings.NEO4J_MAX_TRANSACTION_RETRY_TIME,
+                fetch_size=settings.NEO4J_FETCH_SIZE
             )
-            logger.info("Connected to Neo4j database")
+            logger.info("Connected to Neo4j database (async)")
         except Exception as e:
             logger.error(f"Failed to connect to Neo4j: {e}")
             raise
     
-    def close(self):
+    @property
+    def semaphore(self) -> asyncio.Semaphore:
+        # Created lazily so it belongs to the event loop serving requests
+        if self._semaphore is None:
+            self._semaphore = asyncio.Semaphore(settings.NEO4J_MAX_CONCURRENT_QUERIES)
+        return self._semaphore
+    
+    async def close(self):
         if self.driver:
-            self.driver.close()
+            await self.driver.close()
     
-    def execute_query(self, query: str, parameters: dict = None):
-        with self.driver.session() as session:
-            result = session.run(query, parameters)
-            return [record.data() for record in result]
+    @asynccontextmanager
+    async def _session(self, access_mode: str, fetch_size: Optional[int] = None):
+        """A session holding one of the NEO4J_MAX_CONCURRENT_QUERIES slots"""
+        self.waiting += 1
+        QUERIES_WAITING.inc()
+        try:
+            await self.semaphore.acquire()
+        finally:
+            self.waiting -= 1
+            QUERIES_WAITING.dec()
+        self.in_flight += 1
+        self.peak_in_flight = max(self.peak_in_flight, self.in_flight)
+        QUERIES_IN_FLIGHT.inc()
+        try:
+            async with self.driver.session(
+                database=settings.NEO4J_DATABASE,
+                default_access_mode=access_mode,
+                fetch_size=fetch_size or settings.NEO4J_FETCH_SIZE
+            ) as session:
+                yield session
+        finally:
+            self.in_flight -= 1
+            QUERIES_IN_FLIGHT.dec()
+            self.semaphore.release()
+    
+    async def _managed(self, access_mode: str, work: Callable[[Any], Awaitable[Any]], name: str) -> Any:
+        """Run ``work(tx)`` as a retried transaction function, counting retries"""
+        attempts = 0
+        
+        @unit_of_work(timeout=settings.NEO4J_TRANSACTION_TIMEOUT)
+        async def counted(tx):
+            nonlocal attempts
+            attempts += 1
+            if attempts > 1:
+                TRANSACTION_RETRIES.inc(query=name)
+            return await work(tx)
+        
+        async with self._session(access_mode) as session:
+            if access_mode == READ_ACCESS:
+                return await session.execute_read(counted)
+            return await session.execute_write(counted)
+    
+    async def execute_read(self, query: str, parameters: dict = None, name: Optional[str] = None):
+        """Run a read query in a managed read transaction and return all records.
+        
+        ``name`` labels the latency histogram and slow-query log entries. A
+        QUERY_PROFILE_SAMPLE_RATE fraction of queries runs with PROFILE and
+        its plan is kept in the query log.
+        """
+        name = name or query_name(query)
+        profile = (settings.QUERY_PROFILE_SAMPLE_RATE > 0 and PROFILABLE_QUERY.match(query)
+                   and random.random() < settings.QUERY_PROFILE_SAMPLE_RATE)
+        plan = None
+        
+        async def work(tx):
+            nonlocal plan
+            result = await tx.run("PROFILE " + query if profile else query, parameters)
+            records = await result.data()
+            if profile:
+                plan = (await result.consume()).profile
+            return records
+        
+        started = time.perf_counter()
+        outcome = "error"
+        try:
+            records = await self._managed(READ_ACCESS, work, name)
+            outcome = "ok"
+            return records
+        finally:
+            query_log.record(name, query, parameter_sizes(parameters),
+                             time.perf_counter() - started, outcome, plan)
+    
+    async def execute_write(self, query: str, parameters: dict = None, name: Optional[str] = None):
+        """Run one write statement in a managed write transaction and return its records"""
+        return (await self.execute_transaction([(query, parameters)], name or query_name(query)))[0]
+    
+    async def execute_transaction(self, statements: List[Tuple[str, dict]], name: str = "transaction"):
+        """Run several statements in one managed write transaction (a single commit round trip)"""
+        async def work(tx):
+            results = []
+            for query, parameters in statements:
+                result = await tx.run(query, parameters)
+                results.append(await result.data())
+            return results
+        
+        started = time.perf_counter()
+        outcome = "error"
+        try:
+            results = await self._managed(WRITE_ACCESS, work, name)
+            outcome = "ok"
+            return results
+        finally:
+            query_log.record(name, ";\n".join(query for query, _ in statements),
+                             [parameter_sizes(parameters) for _, parameters in statements],
+                             time.perf_counter() - started, outcome)
     
-    def execute_write_query(self, query: str, parameters: dict = None):
-        with self.driver.session() as session:
-            result = session.write_transaction(lambda tx: tx.run(query, parameters))
-            return result
+    async def execute_autocommit(self, query: str, parameters: dict = None, name: Optional[str] = None):
+        """Run a statement in an auto-commit transaction, retrying transient errors with backoff.
+        
+        For schema changes and ``CALL { } IN TRANSACTIONS``, which manage their
+        own transactions; everything else should use execute_read/execute_write.
+        """
+        name = name or query_name(query)
+        started = time.perf_counter()
+        outcome = "error"
+        try:
+            for attempt in range(settings.NEO4J_MAX_RETRIES + 1):
+                try:
+                    async with self._session(WRITE_ACCESS) as session:
+                        result = await session.run(Query(query, timeout=settings.NEO4J_TRANSACTION_TIMEOUT),
+                                                   parameters)
+                        records = await result.data()
+                    break
+                except (TransientError, ServiceUnavailable, SessionExpired):
+                    if attempt == settings.NEO4J_MAX_RETRIES:
+                        raise
+                    TRANSACTION_RETRIES.inc(query=name)
+                    # Exponential backoff with jitter
+                    await asyncio.sleep(settings.NEO4J_RETRY_BACKOFF * 2 ** attempt * random.uniform(0.5, 1.5))
+            outcome = "ok"
+            return records
+        finally:
+            query_log.record(name, query, parameter_sizes(parameters), time.perf_counter() - started, outcome)
+    
+    async def stream_query(self, query: str, parameters: dict = None, fetch_size: Optional[int] = None,
+                           name: Optional[str] = None) -> AsyncIterator[Dict[str, Any]]:
+        """Yield the records of a read query as the driver pulls them.
+        
+        Runs in an explicit read transaction, so it is routed like execute_read
+        but not retried: a partly consumed stream can't be replayed. The
+        recorded time runs until the stream is exhausted or closed, so it
+        includes time the consumer spends between records.
+        """
+        started = time.perf_counter()
+        outcome = "error"
+        try:
+            async with self._session(READ_ACCESS, fetch_size) as session:
+                async with await session.begin_transaction(timeout=settings.NEO4J_TRANSACTION_TIMEOUT) as tx:
+                    result = await tx.run(query, parameters)
+                    async for record in result:
+                        yield record.data()
+            outcome = "ok"
+        except GeneratorExit:
+            # The consumer stopped early, which is not a query failure
+            outcome = "ok"
+            raise
+        finally:
+            query_log.record(name or query_name(query), query, parameter_sizes(parameters),
+                             time.perf_counter() - started, outcome)
+    
+    def pool_stats(self) -> Dict[str, Any]:
+        """Query slot and connection pool utilisation"""
+        capacity = min(settings.NEO4J_MAX_CONCURRENT_QUERIES, settings.NEO4J_MAX_CONNECTION_POOL_SIZE)
+        return {
+            "max_concurrent_queries": settings.NEO4J_MAX_CONCURRENT_QUERIES,
+            "max_connection_pool_size": settings.NEO4J_MAX_CONNECTION_POOL_SIZE,
+            "in_flight": self.in_flight,
+            "waiting": self.waiting,
+            "peak_in_flight": self.peak_in_flight,
+            "utilisation": round(self.in_flight / capacity, 4) if capacity else 0.0
+        }
+
+@lru_cache()
+def get_async_db() -> AsyncNeo4jConnection:
+    """Shared async connection, created on first use rather than at import"""
+    return AsyncNeo4jConnection()
 
-# Global database instance
-db = Neo4jConnection()
\ No newline at end of file
+async def close_connections():
+    if get_async_db.cache_info().currsize:
+        await get_async_db().close()
+        get_async_db.cache_clear()
\ No newline at end of file
@@ -0,0 +1,174 @@
+from typing import Dict, Iterator, List, Sequence, Tuple
+from contextlib import contextmanager
+import bisect
+import threading
+import time
+
+# Seconds; spans sub-millisecond regex extraction up to slow graph writes
+DEFAULT_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace("\"", "\\\"").replace("\n", "\\n")
+
+def _format_labels(pairs: Sequence[Tuple[str, str]]) -> str:
+    if not pairs:
+        return ""
+    return "{" + ",".join(f'{name}="{_escape(value)}"' for name, value in pairs) + "}"
+
+def _format_value(value: float) -> str:
+    if value == float("inf"):
+        return "+Inf"
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+class Metric:
+    """A named metric family with a fixed set of label names"""
+    
+    kind = "untyped"
+    
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._lock = threading.Lock()
+    
+    def _label_values(self, labels: Dict[str, str]) -> Tuple[str, ...]:
+        if set(labels) != set(self.labelnames):
+            raise ValueError(f"{self.name} expects labels {self.labelnames}, got {tuple(labels)}")
+        return tuple(str(labels[name]) for name in self.labelnames)
+    
+    def render(self) -> List[str]:
+        return [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} {self.kind}"] + self._samples()
+    
+    def _samples(self) -> List[str]:
+        raise NotImplementedError
+
+class Counter(Metric):
+    kind = "counter"
+    
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = ()):
+        super().__init__(name, documentation, labelnames)
+        self._values: Dict[Tuple[str, ...], float] = {}
+    
+    def inc(self, amount: float = 1, **labels):
+        key = self._label_values(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+    
+    def _samples(self) -> List[str]:
+        with self._lock:
+            values = sorted(self._values.items())
+        return [
+            f"{self.name}{_format_labels(list(zip(self.labelnames, key)))} {_format_value(value)}"
+            for key, value in values
+        ]
+
+class Gauge(Metric):
+    kind = "gauge"
+    
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = ()):
+        super().__init__(name, documentation, labelnames)
+        self._values: Dict[Tuple[str, ...], float] = {}
+    
+    def set(self, value: float, **labels):
+        key = self._label_values(labels)
+        with self._lock:
+            self._values[key] = value
+    
+    def inc(self, amount: float = 1, **labels):
+        key = self._label_values(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+    
+    def dec(self, amount: float = 1, **labels):
+        self.inc(-amount, **labels)
+    
+    def value(self, **labels) -> float:
+        with self._lock:
+            return self._values.get(self._label_values(labels), 0)
+    
+    _samples = Counter._samples
+
+class Histogram(Metric):
+    """Cumulative-bucket latency histogram, one series per label combination"""
+    
+    kind = "histogram"
+    
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = (),
+                 buckets: Sequence[float] = DEFAULT_BUCKETS):
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(sorted(buckets))
+        # label values -> [per-bucket counts (last is +Inf), sum]
+        self._series: Dict[Tuple[str, ...], list] = {}
+    
+    def observe(self, value: float, **labels):
+        key = self._label_values(labels)
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            series = self._series.get(key)
+            if series is None:
+                series = self._series[key] = [[0] * (len(self.buckets) + 1), 0.0]
+            series[0][index] += 1
+            series[1] += value
+    
+    @contextmanager
+    def time(self, **labels) -> Iterator[None]:
+        """Time the block; an ``outcome`` label, if declared, is set to "ok" or "error" """
+        started = time.perf_counter()
+        outcome = "ok"
+        try:
+            yield
+        except BaseException:
+            outcome = "error"
+            raise
+        finally:
+            if "outcome" in self.labelnames:
+                labels["outcome"] = outcome
+            self.observe(time.perf_counter() - started, **labels)
+    
+    def _samples(self) -> List[str]:
+        with self._lock:
+            series = sorted((key, (list(counts), total)) for key, (counts, total) in self._series.items())
+        lines = []
+        for key, (counts, total) in series:
+            pairs = list(zip(self.labelnames, key))
+            cumulative = 0
+            for bound, count in zip(self.buckets + (float("inf"),), counts):
+                cumulative += count
+                lines.append(f"{self.name}_bucket{_format_labels(pairs + [('le', _format_value(bound))])} {cumulative}")
+            lines.append(f"{self.name}_sum{_format_labels(pairs)} {_format_value(total)}")
+            lines.append(f"{self.name}_count{_format_labels(pairs)} {cumulative}")
+        return lines
+
+class MetricsRegistry:
+    """Process-wide metrics, rendered in the Prometheus text exposition format"""
+    
+    # The response class appends "; charset=utf-8"
+    content_type = "text/plain; version=0.0.4"
+    
+    def __init__(self):
+        self._metrics: Dict[str, Metric] = {}
+        self._lock = threading.Lock()
+    
+    def register(self, metric: Metric) -> Metric:
+        with self._lock:
+            if metric.name in self._metrics:
+                raise ValueError(f"Metric {metric.name} is already registered")
+            self._metrics[metric.name] = metric
+        return metric
+    
+    def histogram(self, name: str, documentation: str, labelnames: Sequence[str] = (),
+                  buckets: Sequence[float] = DEFAULT_BUCKETS) -> Histogram:
+        return self.register(Histogram(name, documentation, labelnames, buckets))
+    
+    def counter(self, name: str, documentation: str, labelnames: Sequence[str] = ()) -> Counter:
+        return self.register(Counter(name, documentation, labelnames))
+    
+    def gauge(self, name: str, documentation: str, labelnames: Sequence[str] = ()) -> Gauge:
+        return self.register(Gauge(name, documentation, labelnames))
+    
+    def render(self) -> str:
+        with self._lock:
+            metrics = list(self._metrics.values())
+        return "\n".join(line for metric in metrics for line in metric.render()) + "\n"
+
+registry = MetricsRegistry()
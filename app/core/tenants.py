@@ -0,0 +1,28 @@
+from typing import Optional
+from pathlib import Path
+from .config import settings
+import re
+
+TENANT_HEADER = "X-Tenant-ID"
+# Tenant ids are used in file names and Neo4j sequence names
+TENANT_ID_PATTERN = re.compile(r"[A-Za-z0-9][A-Za-z0-9_-]{0,63}")
+
+def validate_tenant_id(tenant_id: Optional[str]) -> str:
+    """The tenant id to use, DEFAULT_TENANT_ID when none is given; ValueError if malformed"""
+    if not tenant_id:
+        return settings.DEFAULT_TENANT_ID
+    if not TENANT_ID_PATTERN.fullmatch(tenant_id):
+        raise ValueError(f"Invalid tenant id {tenant_id!r}: use up to 64 letters, digits, '_' or '-'")
+    return tenant_id
+
+def tenant_path(path: Optional[str], tenant_id: str) -> Optional[str]:
+    """Per-tenant variant of a configured file or directory path.
+    
+    The default tenant keeps ``path`` itself, so single-tenant deployments
+    find their existing data; other tenants get ``<stem>.<tenant><suffix>``
+    next to it (``graph.db`` -> ``graph.acme.db``, ``dumps`` -> ``dumps.acme``).
+    """
+    if not path or tenant_id == settings.DEFAULT_TENANT_ID:
+        return path
+    path = Path(path)
+    return str(path.with_name(f"{path.stem}.{tenant_id}{path.suffix}"))
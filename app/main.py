@@ -1,12 +1,129 @@
 from fastapi import FastAPI, WebSocket, WebSocketDisconnect
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.staticfiles import StaticFiles
-from fastapi.responses import FileResponse
+from fastapi.responses import FileResponse, JSONResponse, PlainTextResponse
+from contextlib import asynccontextmanager
 import os
+import time
 from .api import chat, knowledge_graph
 from .core.config import settings
+from .core.database import close_connections
+from .core.metrics import registry
+from .core.tenants import TENANT_HEADER, validate_tenant_id
+from .services.backends import close_graph_backend
+from .services.chat_agent import get_chat_agent
+from .services.conversation_store import get_conversation_store
+from .services.knowledge_graph import TenantLimitError, close_kg_services, get_kg_service, get_warm_kg_service
+from .services.write_behind import get_write_behind_queue
+import asyncio
+import logging
 
-app = FastAPI(title="Knowledge Management Agent", version="1.0.0")
+logger = logging.getLogger(__name__)
+
+BOOT_STARTED = time.perf_counter()
+
+readiness = {
+    "nlp_loaded": False,
+    "schema_ready": False,
+    "schema_attempts": 0,
+    "schema_error": None,
+    "stats_reconciled": False,
+    "entity_index_warmed": False,
+    "similarity_index_loaded": False,
+    "boot_seconds": None
+}
+
+async def setup_schema() -> bool:
+    """Create constraints and indexes, retrying up to SCHEMA_SETUP_MAX_RETRIES times while Neo4j is unreachable"""
+    kg_service = get_kg_service()
+    for attempt in range(settings.SCHEMA_SETUP_MAX_RETRIES + 1):
+        if attempt:
+            await asyncio.sleep(settings.SCHEMA_SETUP_RETRY_INTERVAL)
+        readiness["schema_attempts"] = attempt + 1
+        await kg_service.initialize_constraints()
+        if kg_service.schema_ready:
+            return True
+    return False
+
+async def warm_up():
+    """Start-up work that runs after the app starts serving; /ready reports progress"""
+    # Schema setup also assigns pre-tenant data to the default tenant, so the
+    # tenant-scoped scans below wait for it
+    schema_done = asyncio.Event()
+    
+    async def load_nlp():
+        await asyncio.to_thread(get_chat_agent().load_nlp_model)
+        readiness["nlp_loaded"] = True
+        # Needs the NLP model to pick spaCy vectors over hashing
+        if settings.SIMILARITY_ENABLED:
+            await schema_done.wait()
+            try:
+                await get_kg_service().similarity.load()
+                readiness["similarity_index_loaded"] = True
+            except Exception as e:
+                logger.warning(f"Similarity index load failed: {e}")
+    
+    async def schema():
+        try:
+            if settings.SKIP_SCHEMA_SETUP or await setup_schema():
+                readiness["schema_ready"] = True
+            else:
+                readiness["schema_error"] = f"Schema setup failed after {readiness['schema_attempts']} attempts"
+                logger.error(f"{readiness['schema_error']}; /ready stays unavailable until a restart")
+        finally:
+            schema_done.set()
+    
+    async def stats():
+        if settings.STATS_RECONCILE_ON_STARTUP:
+            try:
+                await get_kg_service().stats.reconcile()
+                readiness["stats_reconciled"] = True
+            except Exception as e:
+                logger.warning(f"Initial graph statistics reconciliation failed: {e}")
+    
+    async def entity_index():
+        try:
+            await get_kg_service().entity_index.warm()
+            readiness["entity_index_warmed"] = True
+        except Exception as e:
+            logger.warning(f"Entity resolution index warm-up failed: {e}")
+    
+    async def analytics():
+        if settings.ANALYTICS_ENABLED:
+            try:
+                await get_kg_service().analytics.load()
+                get_kg_service().analytics.refresh()
+            except Exception as e:
+                logger.warning(f"Graph analytics load failed: {e}")
+    
+    async def graph():
+        await schema()
+        await asyncio.gather(stats(), entity_index(), analytics())
+    
+    await asyncio.gather(load_nlp(), graph())
+    readiness["boot_seconds"] = round(time.perf_counter() - BOOT_STARTED, 3)
+    logger.info(f"Ready {readiness['boot_seconds']}s after import")
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    write_behind_queue = get_write_behind_queue()
+    if settings.WRITE_BEHIND_ENABLED:
+        write_behind_queue.start()
+    # The default tenant is warmed here; other tenants on their first request
+    get_kg_service().start_periodic_tasks()
+    warm_up_task = asyncio.create_task(warm_up())
+    
+    yield
+    
+    warm_up_task.cancel()
+    await write_behind_queue.stop()
+    await close_kg_services()
+    await close_graph_backend()
+    await close_connections()
+    if get_conversation_store.cache_info().currsize:
+        get_conversation_store().close()
+
+app = FastAPI(title="Knowledge Management Agent", version="1.0.0", lifespan=lifespan)
 
 # CORS middleware
 app.add_middleware(
@@ -33,4 +150,51 @@ async def root():
 
 @app.get("/health")
 async def health_check():
-    return {"status": "healthy"}
\ No newline at end of file
+    return {"status": "healthy"}
+
+@app.get("/metrics", response_class=PlainTextResponse)
+async def metrics():
+    """Latency histograms in the Prometheus text exposition format"""
+    return PlainTextResponse(registry.render(), media_type=registry.content_type)
+
+@app.websocket("/ws/graph")
+async def graph_updates(websocket: WebSocket):
+    """Push coalesced graph deltas; a "resync" message means reload GET /api/kg/.
+    
+    The tenant comes from X-Tenant-ID or, since browsers can't set headers
+    on WebSockets, the ``tenant`` query parameter.
+    """
+    try:
+        tenant_id = validate_tenant_id(websocket.headers.get(TENANT_HEADER) or websocket.query_params.get("tenant"))
+        kg_service = await get_warm_kg_service(tenant_id)
+    except (ValueError, TenantLimitError) as e:
+        await websocket.close(code=1008, reason=str(e))
+        return
+    # Leased so the tenant stays loaded while anyone is subscribed
+    with kg_service.lease():
+        await websocket.accept()
+        queue = kg_service.events.subscribe()
+        
+        async def forward():
+            while True:
+                await websocket.send_json(await queue.get())
+        
+        sender = None
+        try:
+            await websocket.send_json({"type": "subscribed", "version": kg_service.graph_version})
+            sender = asyncio.create_task(forward())
+            # Incoming messages are ignored; receiving is how a disconnect is noticed
+            while True:
+                await websocket.receive_text()
+        except WebSocketDisconnect:
+            pass
+        finally:
+            if sender:
+                sender.cancel()
+            kg_service.events.unsubscribe(queue)
+
+@app.get("/ready")
+async def readiness_check():
+    """Readiness: the NLP model is loaded and the schema is in place"""
+    ready = readiness["nlp_loaded"] and readiness["schema_ready"]
+    return JSONResponse(status_code=200 if ready else 503, content={"ready": ready, **readiness})
\ No newline at end of file
@@ -1,9 +1,10 @@
-from pydantic import BaseModel
+from pydantic import BaseModel, Field
 from typing import List, Optional, Dict, Any
 from datetime import datetime
 
 class ChatMessage(BaseModel):
     message: str
+    session_id: Optional[str] = "default"
     timestamp: Optional[datetime] = None
 
 class ChatResponse(BaseModel):
@@ -11,6 +12,7 @@ class ChatResponse(BaseModel):
     entities_extracted: List[Dict[str, Any]]
     relationships_created: List[Dict[str, Any]]
     timestamp: datetime
+    session_id: Optional[str] = None
 
 class Entity(BaseModel):
     id: str
@@ -39,11 +41,40 @@ class KnowledgeGraphRelationship(BaseModel):
 class KnowledgeGraphResponse(BaseModel):
     nodes: List[KnowledgeGraphNode]
     relationships: List[KnowledgeGraphRelationship]
+    # Pass back as ``since`` to get only what changed afterwards
+    next_cursor: Optional[int] = None
 
 class SearchRequest(BaseModel):
     query: str
-    limit: Optional[int] = 10
+    limit: int = Field(10, ge=1, le=1000)
+    offset: int = Field(0, ge=0)
 
 class SearchResponse(BaseModel):
     results: List[Dict[str, Any]]
-    total_count: int
\ No newline at end of file
+    total_count: int
+    next_offset: Optional[int] = None
+
+class IngestionReport(BaseModel):
+    documents: int = 0
+    skipped: int = 0
+    entities: int = 0
+    relationships: int = 0
+    seconds: float = 0.0
+    docs_per_second: float = 0.0
+
+class DumpReport(BaseModel):
+    path: str
+    nodes: int = 0
+    relationships: int = 0
+    files: int = 0
+    bytes: int = 0
+    seconds: float = 0.0
+    records_per_second: float = 0.0
+
+class RestoreReport(BaseModel):
+    path: str
+    nodes: int = 0
+    relationships: int = 0
+    skipped_relationships: int = 0
+    seconds: float = 0.0
+    records_per_second: float = 0.0
\ No newline at end of file
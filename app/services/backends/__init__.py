@@ -0,0 +1,38 @@
+# Graph storage backends
+from typing import Dict, Optional
+from .base import LEGACY_CREATED_AT, GraphBackend, entity_labels, utc_now
+from .embedded import EmbeddedBackend
+from .neo4j_backend import Neo4jBackend
+from ...core.config import settings
+from ...core.tenants import tenant_path
+
+_backends: Dict[str, GraphBackend] = {}
+
+def get_graph_backend(tenant_id: Optional[str] = None) -> GraphBackend:
+    """Backend selected by GRAPH_BACKEND ("neo4j" or "embedded") for one tenant, created on first use.
+    
+    Neo4j backends share the connection and scope every query by tenant;
+    embedded backends are separate stores, one SQLite file per tenant.
+    """
+    tenant_id = tenant_id or settings.DEFAULT_TENANT_ID
+    backend = _backends.get(tenant_id)
+    if backend is None:
+        if settings.GRAPH_BACKEND == "embedded":
+            backend = EmbeddedBackend(tenant_path(settings.EMBEDDED_DB_PATH, tenant_id), tenant_id)
+        elif settings.GRAPH_BACKEND == "neo4j":
+            backend = Neo4jBackend(tenant_id=tenant_id)
+        else:
+            raise ValueError(f"Unknown GRAPH_BACKEND: {settings.GRAPH_BACKEND!r}")
+        _backends[tenant_id] = backend
+    return backend
+
+async def close_graph_backend(tenant_id: Optional[str] = None):
+    """Close one tenant's backend, or the backends of every tenant"""
+    if tenant_id is not None:
+        backend = _backends.pop(tenant_id, None)
+        if backend is not None:
+            await backend.close()
+        return
+    while _backends:
+        _, backend = _backends.popitem()
+        await backend.close()
@@ -0,0 +1,128 @@
+from typing import List, Dict, Any, Tuple, AsyncIterator, Optional
+from datetime import datetime, timezone
+from ...core.config import settings
+
+# What older versions stored as created_at instead of a timestamp; upsert replaces it
+LEGACY_CREATED_AT = "datetime()"
+
+def entity_labels(entity_type: str) -> List[str]:
+    """Node labels for an entity type: Entity, plus the type itself if it is in ENTITY_LABELS"""
+    return ["Entity", entity_type] if entity_type in settings.ENTITY_LABELS else ["Entity"]
+
+def utc_now() -> str:
+    """Write timestamp: ISO 8601 in UTC, so string order is time order"""
+    return datetime.now(timezone.utc).isoformat(timespec="microseconds")
+
+class GraphBackend:
+    """Storage primitives behind KnowledgeGraphService.
+    
+    Records are plain dicts so the service, caches and API never see driver
+    objects:
+    
+    - node: ``{"id", "labels", "properties"}``
+    - relationship: ``{"rel_id", "type", "start_node_id", "end_node_id", "properties"}``
+    
+    Relationship ``rel_id`` values are unique within a backend and stable
+    for the lifetime of the relationship.
+    
+    Every write stamps ``created_at`` (first write only), ``updated_at`` and
+    ``seq`` on each node and relationship it touches. ``seq`` comes from one
+    counter per backend, is unique per element and write, and increases in
+    commit order, so ``seq > cursor`` finds everything changed since a read.
+    
+    A backend instance serves one tenant: entities are keyed by
+    ``(tenant_id, id)``, every element it writes carries ``tenant_id`` and
+    reads never see another tenant's data.
+    """
+    
+    name = "base"
+    # False when the graph lives only in this object, so closing it loses the data
+    persistent = True
+    
+    async def initialize(self) -> bool:
+        """Create schema (constraints, indexes, tables); True when everything is in place"""
+        raise NotImplementedError
+    
+    async def close(self):
+        pass
+    
+    async def upsert(self, entity_rows: Dict[str, List[Dict[str, Any]]],
+                     relationship_rows: Dict[str, List[Dict[str, Any]]]
+                     ) -> Tuple[Dict[str, List[Dict[str, Any]]], Dict[str, List[Dict[str, Any]]]]:
+        """Merge entities and relationships in one atomic write.
+        
+        ``entity_rows`` maps a label to ``{"id", "properties"}`` rows and
+        ``relationship_rows`` maps a type to ``{"idxs", "start_id", "end_id",
+        "properties"}`` rows. Returns the same keys with ``{"id", "created"}``
+        and ``{"idxs", "created", "rel_id"}`` results, each with the
+        ``created_at``, ``updated_at`` and ``seq`` it was stamped with;
+        relationships whose endpoints do not exist are left out. A
+        ``created_at`` in the properties (e.g. from a dump) is kept.
+        """
+        raise NotImplementedError
+    
+    async def snapshot(self, limit: int) -> Tuple[List[Dict[str, Any]], List[Dict[str, Any]]]:
+        """Up to ``limit`` nodes and up to ``limit`` relationships"""
+        raise NotImplementedError
+    
+    async def current_sequence(self) -> int:
+        """Highest ``seq`` written so far (0 for an empty graph)"""
+        raise NotImplementedError
+    
+    def sequence_epoch(self) -> str:
+        """Prefix for ETags built from ``seq``: empty when the counter survives restarts"""
+        return ""
+    
+    async def changes(self, since: int, limit: int) -> Tuple[List[Dict[str, Any]], List[Dict[str, Any]]]:
+        """Up to ``limit`` nodes and up to ``limit`` relationships with ``seq > since``, in seq order"""
+        raise NotImplementedError
+    
+    def iter_nodes(self, after: str, page_size: int) -> AsyncIterator[Dict[str, Any]]:
+        """Up to ``page_size`` nodes with ``id > after``, in id order"""
+        raise NotImplementedError
+    
+    def iter_outgoing(self, after: str, page_size: int) -> AsyncIterator[Dict[str, Any]]:
+        """Outgoing edges grouped by start node for up to ``page_size`` nodes with ``id > after``.
+        
+        Yields ``{"start_node_id", "relationships": [{"rel_id", "type", "end_node_id", "properties"}]}``
+        in start node id order.
+        """
+        raise NotImplementedError
+    
+    def iter_page_relationships(self, page_ids: List[str], fetch_size: int) -> AsyncIterator[Dict[str, Any]]:
+        """Relationships whose later endpoint (by id) is in ``page_ids``, each once"""
+        raise NotImplementedError
+    
+    async def search(self, query: str, limit: int, offset: int) -> List[Dict[str, Any]]:
+        """Entities matching free text, best first: ``{"id", "name", "type", "properties", "score"}``"""
+        raise NotImplementedError
+    
+    async def get_entity(self, entity_id: str) -> Optional[Dict[str, Any]]:
+        """``{"labels", "properties"}`` of an entity, or None"""
+        raise NotImplementedError
+    
+    async def expand(self, frontier: List[str], direction: str, types: List[str],
+                     fan_out: int) -> List[Dict[str, Any]]:
+        """One breadth-first hop, at most ``fan_out`` edges per frontier node.
+        
+        ``direction`` is "out", "in" or "both" and an empty ``types`` means
+        any type. Rows are ``{"id", "labels", "properties", "rel_id", "type",
+        "start_node_id", "end_node_id", "rel_properties"}`` for the node
+        reached over each edge.
+        """
+        raise NotImplementedError
+    
+    def scan_entities(self, limit: Optional[int] = None,
+                      with_degree: bool = False) -> AsyncIterator[Dict[str, Any]]:
+        """Every entity as ``{"id", "name", "type", "aliases"}`` (plus ``"degree"`` if asked)"""
+        raise NotImplementedError
+    
+    def scan_relationships(self) -> AsyncIterator[Dict[str, Any]]:
+        """Every relationship as ``{"start_id", "end_id", "type"}``"""
+        raise NotImplementedError
+    
+    async def relationship_type_counts(self) -> Dict[str, int]:
+        raise NotImplementedError
+    
+    def stats(self) -> Dict[str, Any]:
+        return {"backend": self.name}
@@ -0,0 +1,415 @@
+from typing import List, Dict, Any, Tuple, AsyncIterator, Optional
+from bisect import bisect_right, insort
+from concurrent.futures import ThreadPoolExecutor
+from itertools import islice
+from .base import LEGACY_CREATED_AT, GraphBackend, entity_labels, utc_now
+from ...core.config import settings
+import asyncio
+import json
+import logging
+import re
+import sqlite3
+import uuid
+
+logger = logging.getLogger(__name__)
+
+WORD_PATTERN = re.compile(r"\w+")
+
+class EmbeddedBackend(GraphBackend):
+    """In-process graph store for single-user deployments, tests and benchmarks.
+    
+    Nodes live in a dict keyed by id with a sorted id list for keyset
+    paging, and edges in per-node adjacency maps keyed by (type, other end)
+    pointing at a relationship table, so point reads and hops are dict
+    lookups. Writes are appended to a change log in seq order, which serves
+    ``changes`` by bisection. With ``path`` set, every write is also applied
+    to a SQLite file (in write order, on one background thread) and the
+    graph is reloaded from it on first use. The store is private to one
+    process and holds one tenant's graph.
+    """
+    
+    name = "embedded"
+    
+    def __init__(self, path: Optional[str] = None, tenant_id: Optional[str] = None):
+        self.path = path
+        self.tenant_id = tenant_id or settings.DEFAULT_TENANT_ID
+        self._nodes: Dict[str, Dict[str, Any]] = {}
+        self._ids: List[str] = []
+        self._out: Dict[str, Dict[Tuple[str, str], int]] = {}
+        self._in: Dict[str, Dict[Tuple[str, str], int]] = {}
+        self._relationships: Dict[int, Tuple[str, str, str, Dict[str, Any]]] = {}
+        self._next_rel_id = 0
+        # (seq, ("node", id) or ("relationship", rel_id)) in seq order; entries
+        # whose element has since been rewritten are stale and skipped
+        self._seq = 0
+        self._change_seqs: List[int] = []
+        self._change_keys: List[Tuple[str, Any]] = []
+        self._stale_changes = 0
+        self.persistent = path is not None
+        # Without a file the counter restarts with the process
+        self._epoch = "" if path else f"{uuid.uuid4().hex[:8]}-"
+        self._loaded = path is None
+        self._connection: Optional[sqlite3.Connection] = None
+        self._executor: Optional[ThreadPoolExecutor] = None
+        self._load_lock: Optional[asyncio.Lock] = None
+    
+    # Persistence
+    
+    def _open(self) -> sqlite3.Connection:
+        connection = sqlite3.connect(self.path, check_same_thread=False)
+        connection.execute("PRAGMA journal_mode=WAL")
+        connection.executescript("""
+        CREATE TABLE IF NOT EXISTS nodes (
+            id TEXT PRIMARY KEY,
+            labels TEXT NOT NULL,
+            properties TEXT NOT NULL
+        );
+        CREATE TABLE IF NOT EXISTS relationships (
+            rel_id INTEGER PRIMARY KEY,
+            start_id TEXT NOT NULL,
+            type TEXT NOT NULL,
+            end_id TEXT NOT NULL,
+            properties TEXT NOT NULL
+        );
+        """)
+        return connection
+    
+    async def _ensure_loaded(self):
+        if self._loaded:
+            return
+        if self._load_lock is None:
+            self._load_lock = asyncio.Lock()
+        async with self._load_lock:
+            if not self._loaded:
+                await self._load()
+    
+    async def _load(self):
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="embedded-graph")
+        loop = asyncio.get_running_loop()
+        self._connection = await loop.run_in_executor(self._executor, self._open)
+        nodes, relationships = await loop.run_in_executor(self._executor, self._read_all)
+        for node_id, labels, properties in nodes:
+            self._put_node(node_id, json.loads(labels), json.loads(properties))
+        for rel_id, start_id, relationship_type, end_id, properties in relationships:
+            self._put_relationship(rel_id, start_id, relationship_type, end_id, json.loads(properties))
+        self._next_rel_id = max(self._relationships, default=-1) + 1
+        self._rebuild_change_log()
+        self._loaded = True
+        logger.info(f"Loaded embedded graph from {self.path}: {len(self._nodes)} nodes, "
+                    f"{len(self._relationships)} relationships")
+    
+    def _read_all(self):
+        return (
+            self._connection.execute("SELECT id, labels, properties FROM nodes").fetchall(),
+            self._connection.execute("SELECT rel_id, start_id, type, end_id, properties FROM relationships").fetchall()
+        )
+    
+    def _write(self, nodes: List[Tuple[str, str, str]], relationships: List[Tuple[int, str, str, str, str]]):
+        with self._connection:
+            self._connection.executemany("INSERT OR REPLACE INTO nodes VALUES (?, ?, ?)", nodes)
+            self._connection.executemany("INSERT OR REPLACE INTO relationships VALUES (?, ?, ?, ?, ?)", relationships)
+    
+    async def initialize(self) -> bool:
+        await self._ensure_loaded()
+        return True
+    
+    async def close(self):
+        if self._executor is not None:
+            await asyncio.get_running_loop().run_in_executor(self._executor, self._connection.close)
+            self._executor.shutdown()
+            self._executor = None
+    
+    # In-memory structures
+    
+    def _put_node(self, node_id: str, labels: List[str], properties: Dict[str, Any]) -> bool:
+        node = self._nodes.get(node_id)
+        if node is None:
+            self._nodes[node_id] = {"labels": labels, "properties": properties}
+            insort(self._ids, node_id)
+            return True
+        node["labels"].extend(label for label in labels if label not in node["labels"])
+        node["properties"].update(properties)
+        return False
+    
+    def _put_relationship(self, rel_id: int, start_id: str, relationship_type: str, end_id: str,
+                          properties: Dict[str, Any]):
+        self._relationships[rel_id] = (start_id, relationship_type, end_id, properties)
+        self._out.setdefault(start_id, {})[(relationship_type, end_id)] = rel_id
+        self._in.setdefault(end_id, {})[(relationship_type, start_id)] = rel_id
+    
+    def _stamp(self, kind: str, key: Any, properties: Dict[str, Any], now: str, created: bool) -> Dict[str, Any]:
+        if properties.get("created_at", LEGACY_CREATED_AT) == LEGACY_CREATED_AT:
+            properties["created_at"] = now
+        properties["updated_at"] = now
+        self._seq += 1
+        properties["seq"] = self._seq
+        self._change_seqs.append(self._seq)
+        self._change_keys.append((kind, key))
+        if not created:
+            self._stale_changes += 1
+        return {"created_at": properties["created_at"], "updated_at": now, "seq": self._seq}
+    
+    def _current_seq(self, kind: str, key: Any) -> Optional[int]:
+        if kind == "node":
+            node = self._nodes.get(key)
+            return node["properties"].get("seq") if node else None
+        relationship = self._relationships.get(key)
+        return relationship[3].get("seq") if relationship else None
+    
+    def _rebuild_change_log(self):
+        """Change log from the stored seq values, dropping stale entries"""
+        entries = [
+            (properties["seq"], ("node", node_id))
+            for node_id, node in self._nodes.items()
+            for properties in [node["properties"]] if isinstance(properties.get("seq"), int)
+        ] + [
+            (relationship[3]["seq"], ("relationship", rel_id))
+            for rel_id, relationship in self._relationships.items() if isinstance(relationship[3].get("seq"), int)
+        ]
+        entries.sort(key=lambda entry: entry[0])
+        self._change_seqs = [seq for seq, _ in entries]
+        self._change_keys = [key for _, key in entries]
+        self._stale_changes = 0
+        self._seq = max(self._seq, self._change_seqs[-1] if entries else 0)
+    
+    def _node_record(self, node_id: str) -> Dict[str, Any]:
+        node = self._nodes[node_id]
+        return {"id": node_id, "labels": list(node["labels"]), "properties": dict(node["properties"])}
+    
+    def _relationship_record(self, rel_id: int) -> Dict[str, Any]:
+        start_id, relationship_type, end_id, properties = self._relationships[rel_id]
+        return {
+            "rel_id": rel_id,
+            "type": relationship_type,
+            "start_node_id": start_id,
+            "end_node_id": end_id,
+            "properties": dict(properties)
+        }
+    
+    # GraphBackend
+    
+    async def upsert(self, entity_rows: Dict[str, List[Dict[str, Any]]],
+                     relationship_rows: Dict[str, List[Dict[str, Any]]]
+                     ) -> Tuple[Dict[str, List[Dict[str, Any]]], Dict[str, List[Dict[str, Any]]]]:
+        await self._ensure_loaded()
+        now = utc_now()
+        entity_results = {}
+        written_nodes = set()
+        for label, rows in entity_rows.items():
+            results = []
+            for row in rows:
+                created = self._put_node(row["id"], entity_labels(label),
+                                         {**row["properties"], "tenant_id": self.tenant_id})
+                stamps = self._stamp("node", row["id"], self._nodes[row["id"]]["properties"], now, created)
+                results.append({"id": row["id"], "created": created, **stamps})
+            entity_results[label] = results
+            written_nodes.update(row["id"] for row in rows)
+        
+        relationship_results = {}
+        written_relationships = []
+        for relationship_type, rows in relationship_rows.items():
+            results = []
+            for row in rows:
+                if row["start_id"] not in self._nodes or row["end_id"] not in self._nodes:
+                    continue
+                rel_id = self._out.get(row["start_id"], {}).get((relationship_type, row["end_id"]))
+                created = rel_id is None
+                if created:
+                    rel_id = self._next_rel_id
+                    self._next_rel_id += 1
+                    self._put_relationship(rel_id, row["start_id"], relationship_type, row["end_id"], {})
+                properties = self._relationships[rel_id][3]
+                properties.update(row["properties"])
+                properties["tenant_id"] = self.tenant_id
+                stamps = self._stamp("relationship", rel_id, properties, now, created)
+                written_relationships.append(rel_id)
+                results.append({"idxs": row["idxs"], "created": created, "rel_id": rel_id, **stamps})
+            relationship_results[relationship_type] = results
+        if self._stale_changes > max(len(self._change_seqs) // 2, 1000):
+            self._rebuild_change_log()
+        
+        if self._connection is not None:
+            # Serialised now so later in-memory updates can't leak into this write
+            nodes = [
+                (node_id, json.dumps(self._nodes[node_id]["labels"]),
+                 json.dumps(self._nodes[node_id]["properties"], default=str))
+                for node_id in written_nodes
+            ]
+            relationships = [
+                (rel_id, start_id, relationship_type, end_id, json.dumps(properties, default=str))
+                for rel_id in written_relationships
+                for start_id, relationship_type, end_id, properties in [self._relationships[rel_id]]
+            ]
+            await asyncio.get_running_loop().run_in_executor(self._executor, self._write, nodes, relationships)
+        return entity_results, relationship_results
+    
+    async def snapshot(self, limit: int) -> Tuple[List[Dict[str, Any]], List[Dict[str, Any]]]:
+        await self._ensure_loaded()
+        nodes = [self._node_record(node_id) for node_id in islice(self._nodes, limit)]
+        relationships = [self._relationship_record(rel_id) for rel_id in islice(self._relationships, limit)]
+        return nodes, relationships
+    
+    async def current_sequence(self) -> int:
+        await self._ensure_loaded()
+        return self._seq
+    
+    def sequence_epoch(self) -> str:
+        return self._epoch
+    
+    async def changes(self, since: int, limit: int) -> Tuple[List[Dict[str, Any]], List[Dict[str, Any]]]:
+        await self._ensure_loaded()
+        nodes, relationships = [], []
+        for position in range(bisect_right(self._change_seqs, since), len(self._change_seqs)):
+            if len(nodes) >= limit and len(relationships) >= limit:
+                break
+            kind, key = self._change_keys[position]
+            if self._current_seq(kind, key) != self._change_seqs[position]:
+                continue
+            if kind == "node" and len(nodes) < limit:
+                nodes.append(self._node_record(key))
+            elif kind == "relationship" and len(relationships) < limit:
+                relationships.append(self._relationship_record(key))
+        return nodes, relationships
+    
+    async def iter_nodes(self, after: str, page_size: int) -> AsyncIterator[Dict[str, Any]]:
+        await self._ensure_loaded()
+        start = bisect_right(self._ids, after)
+        for node_id in self._ids[start:start + page_size]:
+            yield self._node_record(node_id)
+    
+    async def iter_outgoing(self, after: str, page_size: int) -> AsyncIterator[Dict[str, Any]]:
+        await self._ensure_loaded()
+        start = bisect_right(self._ids, after)
+        for node_id in self._ids[start:start + page_size]:
+            yield {
+                "start_node_id": node_id,
+                "relationships": [
+                    {
+                        "rel_id": rel_id,
+                        "type": relationship_type,
+                        "end_node_id": end_id,
+                        "properties": dict(self._relationships[rel_id][3])
+                    }
+                    for (relationship_type, end_id), rel_id in self._out.get(node_id, {}).items()
+                ]
+            }
+    
+    async def iter_page_relationships(self, page_ids: List[str], fetch_size: int) -> AsyncIterator[Dict[str, Any]]:
+        await self._ensure_loaded()
+        for node_id in page_ids:
+            for (_, end_id), rel_id in list(self._out.get(node_id, {}).items()):
+                if end_id <= node_id:
+                    yield self._relationship_record(rel_id)
+            for (_, start_id), rel_id in list(self._in.get(node_id, {}).items()):
+                if start_id < node_id:
+                    yield self._relationship_record(rel_id)
+    
+    async def search(self, query: str, limit: int, offset: int) -> List[Dict[str, Any]]:
+        """Every term must match a word exactly (3), as a prefix (2) or as a substring (1)"""
+        await self._ensure_loaded()
+        terms = query.lower().split()
+        if not terms:
+            return []
+        matches = []
+        for node_id, node in self._nodes.items():
+            properties = node["properties"]
+            texts = [properties[prop].lower() for prop in settings.SEARCH_TEXT_PROPERTIES
+                     if isinstance(properties.get(prop), str)]
+            words = {word for text in texts for word in WORD_PATTERN.findall(text)}
+            score = 0
+            for term in terms:
+                if term in words:
+                    score += 3
+                elif any(word.startswith(term) for word in words):
+                    score += 2
+                elif any(term in text for text in texts):
+                    score += 1
+                else:
+                    break
+            else:
+                matches.append((-score, node_id))
+        matches.sort()
+        return [
+            {
+                "id": node_id,
+                "name": self._nodes[node_id]["properties"].get("name"),
+                "type": self._nodes[node_id]["properties"].get("type"),
+                "properties": dict(self._nodes[node_id]["properties"]),
+                "score": float(-negative_score)
+            }
+            for negative_score, node_id in matches[offset:offset + limit]
+        ]
+    
+    async def get_entity(self, entity_id: str) -> Optional[Dict[str, Any]]:
+        await self._ensure_loaded()
+        if entity_id not in self._nodes:
+            return None
+        record = self._node_record(entity_id)
+        return {"labels": record["labels"], "properties": record["properties"]}
+    
+    async def expand(self, frontier: List[str], direction: str, types: List[str],
+                     fan_out: int) -> List[Dict[str, Any]]:
+        await self._ensure_loaded()
+        type_filter = set(types)
+        rows = []
+        for source_id in frontier:
+            edges = []
+            if direction in ("out", "both"):
+                edges.extend(self._out.get(source_id, {}).items())
+            if direction in ("in", "both"):
+                edges.extend(self._in.get(source_id, {}).items())
+            count = 0
+            for (relationship_type, other_id), rel_id in edges:
+                if count >= fan_out:
+                    break
+                if type_filter and relationship_type not in type_filter:
+                    continue
+                count += 1
+                relationship = self._relationship_record(rel_id)
+                rows.append({
+                    **self._node_record(other_id),
+                    "rel_id": rel_id,
+                    "type": relationship_type,
+                    "start_node_id": relationship["start_node_id"],
+                    "end_node_id": relationship["end_node_id"],
+                    "rel_properties": relationship["properties"]
+                })
+        return rows
+    
+    async def scan_entities(self, limit: Optional[int] = None,
+                            with_degree: bool = False) -> AsyncIterator[Dict[str, Any]]:
+        await self._ensure_loaded()
+        # Only the ids to be read are copied; writes may run between rows
+        for node_id in list(islice(self._nodes, limit)):
+            properties = self._nodes[node_id]["properties"]
+            row = {
+                "id": node_id,
+                "name": properties.get("name"),
+                "type": properties.get("type") or "Unknown",
+                "aliases": properties.get("aliases")
+            }
+            if with_degree:
+                row["degree"] = len(self._out.get(node_id, ())) + len(self._in.get(node_id, ()))
+            yield row
+    
+    async def scan_relationships(self) -> AsyncIterator[Dict[str, Any]]:
+        await self._ensure_loaded()
+        for start_id, relationship_type, end_id, _ in list(self._relationships.values()):
+            yield {"start_id": start_id, "end_id": end_id, "type": relationship_type}
+    
+    async def relationship_type_counts(self) -> Dict[str, int]:
+        await self._ensure_loaded()
+        counts: Dict[str, int] = {}
+        for _, relationship_type, _, _ in self._relationships.values():
+            counts[relationship_type] = counts.get(relationship_type, 0) + 1
+        return counts
+    
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "backend": self.name,
+            "tenant_id": self.tenant_id,
+            "path": self.path,
+            "loaded": self._loaded,
+            "nodes": len(self._nodes),
+            "relationships": len(self._relationships)
+        }
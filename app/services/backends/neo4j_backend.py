@@ -0,0 +1,497 @@
+from typing import List, Dict, Any, Tuple, AsyncIterator, Optional
+from functools import lru_cache
+from neo4j.exceptions import ClientError
+from .base import LEGACY_CREATED_AT, GraphBackend, entity_labels, utc_now
+from ...core.config import settings
+from ...core.database import get_async_db
+import logging
+import re
+
+logger = logging.getLogger(__name__)
+
+ENTITY_FULLTEXT_INDEX = "entity_text"
+# The default tenant keeps the unsuffixed name, so existing cursors stay valid
+SEQUENCE_NAME = "changes"
+# Entity ids are unique per tenant; constraints from before tenants were per id
+KEYED_LABELS = ("Entity", "Concept", "Note")
+# Reserves $count change sequence numbers. The counter node stays write-locked
+# until commit, so writers take numbers in commit order and a reader never
+# sees a higher seq become visible before a lower one. It also lists the
+# relationship types the tenant has written, so changes() reads only those.
+SEQUENCE_QUERY = """
+MERGE (sequence:_Sequence {name: $sequence})
+SET sequence.value = coalesce(sequence.value, 0) + $count,
+    sequence.relationship_types = coalesce(sequence.relationship_types, [])
+        + [new_type IN $types WHERE NOT new_type IN coalesce(sequence.relationship_types, [])]
+RETURN sequence.value as value
+"""
+# Counters from before the type list get every type in the database
+SEQUENCE_TYPES_BACKFILL_QUERY = """
+MATCH (sequence:_Sequence) WHERE sequence.relationship_types IS NULL
+SET sequence.relationship_types = $types
+"""
+# Every upsert stamps these; seq comes from the reserved range, where row.offset
+# is the row's position in the whole write. Older versions stored a placeholder
+# string as created_at, which is replaced.
+CHANGE_STAMP = """{var}.created_at = CASE WHEN coalesce({var}.created_at, $legacy) = $legacy
+            THEN $now ELSE {var}.created_at END,
+        {var}.updated_at = $now,
+        {var}.seq = sequence.value - $count + row.offset + 1"""
+LUCENE_SPECIAL_CHARS = re.compile(r'([+\-&|!(){}\[\]^"~*?:\\/])')
+NEIGHBOURHOOD_PATTERNS = {
+    "out": "(s)-[r]->(n:Entity)",
+    "in": "(s)<-[r]-(n:Entity)",
+    "both": "(s)-[r]-(n:Entity)",
+}
+# Elements written before tenants existed belong to the default tenant
+TENANT_BACKFILL_QUERIES = [
+    """
+    MATCH (n:Entity) WHERE n.tenant_id IS NULL
+    CALL { WITH n SET n.tenant_id = $tenant } IN TRANSACTIONS OF 10000 ROWS
+    """,
+    """
+    MATCH (:Entity)-[r]->(:Entity) WHERE r.tenant_id IS NULL
+    CALL { WITH r SET r.tenant_id = $tenant } IN TRANSACTIONS OF 10000 ROWS
+    """,
+]
+
+def build_fulltext_query(query: str, tenant_id: str) -> str:
+    """Turn user input into a Lucene query with exact, prefix and fuzzy clauses.
+    
+    Every term must match one of SEARCH_TEXT_PROPERTIES and the node's
+    ``tenant_id`` must match, so the index only yields the tenant's nodes.
+    """
+    clauses = []
+    for term in query.lower().split():
+        term = LUCENE_SPECIAL_CHARS.sub(r"\\\1", term)
+        clause = f"{term}^3 OR {term}*^2"
+        if len(term) >= 4:
+            clause += f" OR {term}~"
+        clauses.append("(" + " OR ".join(f"{prop}:({clause})" for prop in settings.SEARCH_TEXT_PROPERTIES) + ")")
+    if not clauses:
+        return ""
+    tenant = LUCENE_SPECIAL_CHARS.sub(r"\\\1", tenant_id)
+    return f'+tenant_id:"{tenant}" +(' + " AND ".join(clauses) + ")"
+
+# Labels and relationship types can't be parameters, so write queries are built per
+# label/type. Labels are limited to ENTITY_LABELS and the service only writes types with
+# a registered verb or in RELATIONSHIP_TYPES, keeping the number of distinct query
+# texts (and cached plans) bounded. Every entity lookup is on (tenant_id, id), served
+# by the composite uniqueness constraint.
+
+@lru_cache(maxsize=None)
+def entity_upsert_query(labels: Tuple[str, ...]) -> str:
+    return f"""
+    MATCH (sequence:_Sequence {{name: $sequence}})
+    UNWIND $rows AS row
+    OPTIONAL MATCH (existing:Entity {{tenant_id: $tenant, id: row.id}})
+    WITH sequence, row, existing IS NULL AS created
+    MERGE (e:{':'.join(labels)} {{tenant_id: $tenant, id: row.id}})
+    SET e += row.properties,
+        e.tenant_id = $tenant,
+        {CHANGE_STAMP.format(var="e")}
+    RETURN row.id as id, created, e.created_at as created_at, e.updated_at as updated_at, e.seq as seq
+    """
+
+@lru_cache(maxsize=256)
+def relationship_upsert_query(relationship_type: str) -> str:
+    return f"""
+    MATCH (sequence:_Sequence {{name: $sequence}})
+    UNWIND $rows AS row
+    MATCH (a:Entity {{tenant_id: $tenant, id: row.start_id}})
+    MATCH (b:Entity {{tenant_id: $tenant, id: row.end_id}})
+    OPTIONAL MATCH (a)-[existing:{relationship_type}]->(b)
+    WITH sequence, row, a, b, count(existing) = 0 AS created
+    MERGE (a)-[r:{relationship_type}]->(b)
+    SET r += row.properties,
+        r.tenant_id = $tenant,
+        {CHANGE_STAMP.format(var="r")}
+    RETURN row.idxs as idxs, created, id(r) as rel_id,
+           r.created_at as created_at, r.updated_at as updated_at, r.seq as seq
+    """
+
+def quote_name(name: str) -> str:
+    return "`" + name.replace("`", "``") + "`"
+
+@lru_cache(maxsize=256)
+def relationship_changes_query(relationship_types: Tuple[str, ...]) -> str:
+    # Relationship property indexes are per type, so each type is read through its own index
+    branches = "\n        UNION ALL\n".join(
+        f"""        MATCH (a:Entity)-[r:{quote_name(relationship_type)}]->(b:Entity)
+        WHERE r.tenant_id = $tenant AND r.seq > $since AND r.seq <= $until
+        RETURN r, a, b ORDER BY r.seq LIMIT $limit"""
+        for relationship_type in relationship_types
+    )
+    return f"""
+    CALL {{
+{branches}
+    }}
+    RETURN id(r) as rel_id, type(r) as type, a.id as start_node_id, b.id as end_node_id,
+           properties(r) as properties
+    ORDER BY r.seq
+    LIMIT $limit
+    """
+
+@lru_cache(maxsize=None)
+def neighbourhood_query(direction: str) -> str:
+    # Each frontier node is expanded in its own subquery, so the cap is per node
+    return f"""
+    UNWIND $frontier AS source_id
+    MATCH (s:Entity {{tenant_id: $tenant, id: source_id}})
+    CALL {{
+        WITH s
+        MATCH {NEIGHBOURHOOD_PATTERNS[direction]}
+        WHERE size($types) = 0 OR type(r) IN $types
+        RETURN r, n
+        LIMIT $fan_out
+    }}
+    RETURN n.id as id, labels(n) as labels, properties(n) as properties,
+           id(r) as rel_id, type(r) as type, startNode(r).id as start_node_id,
+           endNode(r).id as end_node_id, properties(r) as rel_properties
+    """
+
+class Neo4jBackend(GraphBackend):
+    """Graph storage in Neo4j through the shared async connection, scoped to one tenant.
+    
+    All tenants share the database; every node and relationship carries
+    ``tenant_id`` and every query is anchored on tenant-prefixed indexes,
+    so its cost follows the size of the tenant's graph.
+    """
+    
+    name = "neo4j"
+    
+    def __init__(self, db=None, tenant_id: Optional[str] = None):
+        self.db = db or get_async_db()
+        self.tenant_id = tenant_id or settings.DEFAULT_TENANT_ID
+        self.sequence = SEQUENCE_NAME if self.tenant_id == settings.DEFAULT_TENANT_ID \
+            else f"{SEQUENCE_NAME}:{self.tenant_id}"
+        self._indexed_types = set()
+    
+    async def _drop_id_constraints(self):
+        """Drop single-property id constraints, which would stop two tenants sharing an id"""
+        rows = await self.db.execute_autocommit(
+            "SHOW CONSTRAINTS YIELD name, labelsOrTypes, properties "
+            "WHERE properties = ['id'] AND labelsOrTypes[0] IN $labels RETURN name",
+            {"labels": list(KEYED_LABELS)}, name="schema"
+        )
+        for row in rows:
+            await self.db.execute_autocommit(f"DROP CONSTRAINT {quote_name(row['name'])} IF EXISTS", name="schema")
+    
+    async def _drop_untenanted_fulltext_index(self):
+        """Drop a full-text index from before tenants, so it is recreated with ``tenant_id``"""
+        rows = await self.db.execute_autocommit(
+            "SHOW FULLTEXT INDEXES YIELD name, properties WHERE name = $index RETURN properties",
+            {"index": ENTITY_FULLTEXT_INDEX}, name="schema"
+        )
+        if rows and "tenant_id" not in rows[0]["properties"]:
+            await self.db.execute_autocommit(f"DROP INDEX {ENTITY_FULLTEXT_INDEX} IF EXISTS", name="schema")
+    
+    async def initialize(self) -> bool:
+        """Schema is shared by all tenants; the default tenant also migrates pre-tenant data"""
+        queries = [
+            *(f"CREATE CONSTRAINT IF NOT EXISTS FOR (n:{label}) REQUIRE (n.tenant_id, n.id) IS UNIQUE"
+              for label in KEYED_LABELS),
+            "CREATE CONSTRAINT IF NOT EXISTS FOR (s:_Sequence) REQUIRE s.name IS UNIQUE",
+            "CREATE INDEX IF NOT EXISTS FOR (n:Entity) ON (n.tenant_id)",
+            "CREATE INDEX IF NOT EXISTS FOR (n:Entity) ON (n.tenant_id, n.name)",
+            "CREATE INDEX IF NOT EXISTS FOR (n:Entity) ON (n.tenant_id, n.seq)",
+            "CREATE INDEX IF NOT EXISTS FOR (n:Entity) ON (n.tenant_id, n.updated_at)",
+            "CREATE INDEX IF NOT EXISTS FOR (n:Concept) ON (n.tenant_id, n.name)",
+            f"CREATE FULLTEXT INDEX {ENTITY_FULLTEXT_INDEX} IF NOT EXISTS FOR (n:Entity) ON EACH "
+            f"[{', '.join('n.' + prop for prop in [*settings.SEARCH_TEXT_PROPERTIES, 'tenant_id'])}]",
+        ]
+        
+        failed = False
+        try:
+            await self._drop_id_constraints()
+        except Exception as e:
+            failed = True
+            logger.warning(f"Failed to drop per-id constraints: {e}")
+        try:
+            await self._drop_untenanted_fulltext_index()
+        except Exception as e:
+            failed = True
+            logger.warning(f"Failed to replace the full-text index: {e}")
+        if self.tenant_id == settings.DEFAULT_TENANT_ID:
+            for query in TENANT_BACKFILL_QUERIES:
+                try:
+                    await self.db.execute_autocommit(query, {"tenant": self.tenant_id}, name="tenant_backfill")
+                except Exception as e:
+                    failed = True
+                    logger.warning(f"Failed to assign existing data to the default tenant: {e}")
+            try:
+                await self.db.execute_autocommit(SEQUENCE_TYPES_BACKFILL_QUERY,
+                                                 {"types": await self._relationship_types()}, name="schema")
+            except Exception as e:
+                failed = True
+                logger.warning(f"Failed to record relationship types on change sequences: {e}")
+        for query in queries:
+            try:
+                await self.db.execute_autocommit(query, name="schema")
+            except Exception as e:
+                failed = True
+                logger.warning(f"Failed to execute constraint query: {e}")
+        try:
+            await self._ensure_relationship_indexes(await self._relationship_types())
+        except Exception as e:
+            failed = True
+            logger.warning(f"Failed to create relationship indexes: {e}")
+        return not failed
+    
+    async def _relationship_types(self) -> List[str]:
+        rows = await self.db.execute_read("CALL db.relationshipTypes() YIELD relationshipType "
+                                          "RETURN relationshipType as type", name="relationship_types")
+        return [row["type"] for row in rows]
+    
+    async def _ensure_relationship_indexes(self, relationship_types):
+        """Range indexes on (tenant_id, seq) and (tenant_id, updated_at), created once per relationship type"""
+        for relationship_type in relationship_types:
+            if relationship_type in self._indexed_types:
+                continue
+            for prop in ("seq", "updated_at"):
+                await self.db.execute_autocommit(
+                    f"CREATE INDEX IF NOT EXISTS FOR ()-[r:{quote_name(relationship_type)}]-() "
+                    f"ON (r.tenant_id, r.{prop})",
+                    name="schema"
+                )
+            self._indexed_types.add(relationship_type)
+    
+    async def upsert(self, entity_rows: Dict[str, List[Dict[str, Any]]],
+                     relationship_rows: Dict[str, List[Dict[str, Any]]]
+                     ) -> Tuple[Dict[str, List[Dict[str, Any]]], Dict[str, List[Dict[str, Any]]]]:
+        if not entity_rows and not relationship_rows:
+            return {}, {}
+        new_types = [relationship_type for relationship_type in relationship_rows
+                     if relationship_type not in self._indexed_types]
+        if new_types:
+            try:
+                await self._ensure_relationship_indexes(new_types)
+            except Exception as e:
+                logger.warning(f"Failed to create relationship indexes: {e}")
+        
+        # Each row gets its own seq from one reserved range
+        offset = 0
+        grouped = []
+        for rows in list(entity_rows.values()) + list(relationship_rows.values()):
+            grouped.append([{**row, "offset": offset + position} for position, row in enumerate(rows)])
+            offset += len(rows)
+        common = {"sequence": self.sequence, "count": offset, "now": utc_now(), "legacy": LEGACY_CREATED_AT,
+                  "tenant": self.tenant_id}
+        
+        # The counter first, then one UNWIND statement per label/type, all in one transaction
+        statements = [(SEQUENCE_QUERY, {"sequence": self.sequence, "count": offset,
+                                        "types": list(relationship_rows)})]
+        statements.extend(
+            (entity_upsert_query(tuple(entity_labels(label))), {**common, "rows": rows})
+            for label, rows in zip(entity_rows, grouped)
+        )
+        statements.extend(
+            (relationship_upsert_query(relationship_type), {**common, "rows": rows})
+            for relationship_type, rows in zip(relationship_rows, grouped[len(entity_rows):])
+        )
+        
+        results = (await self.db.execute_transaction(statements, name="upsert_batch"))[1:]
+        return (
+            dict(zip(entity_rows, results[:len(entity_rows)])),
+            dict(zip(relationship_rows, results[len(entity_rows):]))
+        )
+    
+    async def snapshot(self, limit: int) -> Tuple[List[Dict[str, Any]], List[Dict[str, Any]]]:
+        nodes_query = """
+        MATCH (n:Entity {tenant_id: $tenant})
+        RETURN n.id as id, labels(n) as labels, properties(n) as properties
+        LIMIT $limit
+        """
+        relationships_query = """
+        MATCH (a:Entity {tenant_id: $tenant})-[r]->(b:Entity)
+        RETURN id(r) as rel_id, type(r) as type,
+               a.id as start_node_id, b.id as end_node_id,
+               properties(r) as properties
+        LIMIT $limit
+        """
+        parameters = {"tenant": self.tenant_id, "limit": limit}
+        nodes = await self.db.execute_read(nodes_query, parameters, name="snapshot_nodes")
+        relationships = await self.db.execute_read(relationships_query, parameters,
+                                                    name="snapshot_relationships")
+        return nodes, relationships
+    
+    async def current_sequence(self) -> int:
+        rows = await self.db.execute_read("MATCH (s:_Sequence {name: $sequence}) RETURN s.value as value",
+                                          {"sequence": self.sequence}, name="current_sequence")
+        return rows[0]["value"] if rows else 0
+    
+    async def changes(self, since: int, limit: int) -> Tuple[List[Dict[str, Any]], List[Dict[str, Any]]]:
+        # Both reads stop at the counter value read first: every seq up to it is
+        # committed, so what is returned is a consistent cut of the tenant's writes
+        rows = await self.db.execute_read(
+            "MATCH (s:_Sequence {name: $sequence}) RETURN s.value as value, s.relationship_types as types",
+            {"sequence": self.sequence}, name="changes_sequence"
+        )
+        if not rows:
+            return [], []
+        until, relationship_types = rows[0]["value"], tuple(sorted(rows[0]["types"] or []))
+        nodes_query = """
+        MATCH (n:Entity)
+        WHERE n.tenant_id = $tenant AND n.seq > $since AND n.seq <= $until
+        RETURN n.id as id, labels(n) as labels, properties(n) as properties
+        ORDER BY n.seq
+        LIMIT $limit
+        """
+        parameters = {"tenant": self.tenant_id, "since": since, "until": until, "limit": limit}
+        nodes = await self.db.execute_read(nodes_query, parameters, name="changes_nodes")
+        relationships = []
+        if relationship_types:
+            # Types first written by another worker get their indexes here
+            new_types = [relationship_type for relationship_type in relationship_types
+                         if relationship_type not in self._indexed_types]
+            if new_types:
+                try:
+                    await self._ensure_relationship_indexes(new_types)
+                except Exception as e:
+                    logger.warning(f"Failed to create relationship indexes: {e}")
+            relationships = await self.db.execute_read(relationship_changes_query(relationship_types), parameters,
+                                                        name="changes_relationships")
+        return nodes, relationships
+    
+    async def iter_nodes(self, after: str, page_size: int) -> AsyncIterator[Dict[str, Any]]:
+        query = """
+        MATCH (n:Entity)
+        WHERE n.tenant_id = $tenant AND n.id > $after
+        RETURN n.id as id, labels(n) as labels, properties(n) as properties
+        ORDER BY n.id
+        LIMIT $page_size
+        """
+        parameters = {"tenant": self.tenant_id, "after": after, "page_size": page_size}
+        async for node in self.db.stream_query(query, parameters, page_size,
+                                               name="export_nodes"):
+            yield node
+    
+    async def iter_outgoing(self, after: str, page_size: int) -> AsyncIterator[Dict[str, Any]]:
+        # One record carries all of a start node's edges
+        query = """
+        MATCH (a:Entity)
+        WHERE a.tenant_id = $tenant AND a.id > $after
+        WITH a ORDER BY a.id LIMIT $page_size
+        CALL {
+            WITH a
+            MATCH (a)-[r]->(b:Entity)
+            RETURN collect({rel_id: id(r), type: type(r), end_node_id: b.id, properties: properties(r)}) as relationships
+        }
+        RETURN a.id as start_node_id, relationships
+        """
+        parameters = {"tenant": self.tenant_id, "after": after, "page_size": page_size}
+        async for row in self.db.stream_query(query, parameters, page_size,
+                                              name="export_outgoing"):
+            yield row
+    
+    async def iter_page_relationships(self, page_ids: List[str], fetch_size: int) -> AsyncIterator[Dict[str, Any]]:
+        query = """
+        UNWIND $ids AS node_id
+        MATCH (x:Entity {tenant_id: $tenant, id: node_id})
+        CALL {
+            WITH x
+            MATCH (x)-[r]->(y:Entity) WHERE y.id <= x.id
+            RETURN r, x as s, y as t
+            UNION
+            WITH x
+            MATCH (y:Entity)-[r]->(x) WHERE y.id < x.id
+            RETURN r, y as s, x as t
+        }
+        RETURN id(r) as rel_id, type(r) as type, s.id as start_node_id,
+               t.id as end_node_id, properties(r) as properties
+        """
+        async for rel in self.db.stream_query(query, {"tenant": self.tenant_id, "ids": page_ids}, fetch_size,
+                                              name="export_page_relationships"):
+            yield rel
+    
+    async def search(self, query: str, limit: int, offset: int) -> List[Dict[str, Any]]:
+        """Full-text index search, or a substring scan when the index is missing"""
+        lucene_query = build_fulltext_query(query, self.tenant_id)
+        if not lucene_query:
+            return []
+        
+        # The index only yields this tenant's nodes; the filter is exact where
+        # the analyzer splits ids (e.g. "acme" also matches "acme-eu")
+        search_query = """
+        CALL db.index.fulltext.queryNodes($index, $query)
+        YIELD node, score
+        WHERE node.tenant_id = $tenant
+        RETURN node.id as id, node.name as name, node.type as type,
+               properties(node) as properties, score
+        SKIP $offset
+        LIMIT $limit
+        """
+        
+        try:
+            return await self.db.execute_read(search_query, {
+                "index": ENTITY_FULLTEXT_INDEX,
+                "query": lucene_query,
+                "tenant": self.tenant_id,
+                "offset": offset,
+                "limit": limit
+            }, name="search_fulltext")
+        except ClientError as e:
+            logger.warning(f"Full-text search unavailable, falling back to scan: {e}")
+        
+        fallback_query = """
+        MATCH (n:Entity {tenant_id: $tenant})
+        WHERE any(prop IN $properties WHERE n[prop] IS :: STRING AND toLower(n[prop]) CONTAINS toLower($query))
+        RETURN n.id as id, n.name as name, n.type as type, properties(n) as properties, null as score
+        ORDER BY n.id
+        SKIP $offset
+        LIMIT $limit
+        """
+        
+        return await self.db.execute_read(fallback_query, {
+            "query": query,
+            "tenant": self.tenant_id,
+            "properties": settings.SEARCH_TEXT_PROPERTIES,
+            "offset": offset,
+            "limit": limit
+        }, name="search_scan")
+    
+    async def get_entity(self, entity_id: str) -> Optional[Dict[str, Any]]:
+        result = await self.db.execute_read(
+            "MATCH (e:Entity {tenant_id: $tenant, id: $entity_id}) RETURN labels(e) as labels, properties(e) as properties",
+            {"tenant": self.tenant_id, "entity_id": entity_id},
+            name="get_entity"
+        )
+        return result[0] if result else None
+    
+    async def expand(self, frontier: List[str], direction: str, types: List[str],
+                     fan_out: int) -> List[Dict[str, Any]]:
+        return await self.db.execute_read(
+            neighbourhood_query(direction),
+            {"tenant": self.tenant_id, "frontier": frontier, "types": list(types), "fan_out": fan_out},
+            name="neighbourhood_expand"
+        )
+    
+    async def scan_entities(self, limit: Optional[int] = None,
+                            with_degree: bool = False) -> AsyncIterator[Dict[str, Any]]:
+        degree = ", COUNT { (n)-->(:Entity) } + COUNT { (n)<--(:Entity) } as degree" if with_degree else ""
+        query = f"""
+        MATCH (n:Entity {{tenant_id: $tenant}})
+        RETURN n.id as id, n.name as name, coalesce(n.type, 'Unknown') as type, n.aliases as aliases{degree}
+        {"LIMIT $limit" if limit is not None else ""}
+        """
+        async for row in self.db.stream_query(query, {"tenant": self.tenant_id, "limit": limit}, name="scan_entities"):
+            yield row
+    
+    async def scan_relationships(self) -> AsyncIterator[Dict[str, Any]]:
+        query = """
+        MATCH (a:Entity {tenant_id: $tenant})-[r]->(b:Entity)
+        RETURN a.id as start_id, b.id as end_id, type(r) as type
+        """
+        async for row in self.db.stream_query(query, {"tenant": self.tenant_id}, name="scan_relationships"):
+            yield row
+    
+    async def relationship_type_counts(self) -> Dict[str, int]:
+        query = """
+        MATCH (:Entity {tenant_id: $tenant})-[r]->(:Entity)
+        RETURN type(r) as type, count(r) as count
+        """
+        rows = await self.db.execute_read(query, {"tenant": self.tenant_id}, name="relationship_type_counts")
+        return {row["type"]: row["count"] for row in rows}
+    
+    def stats(self) -> Dict[str, Any]:
+        return {"backend": self.name, "tenant_id": self.tenant_id, "pool": self.db.pool_stats()}
@@ -1,179 +1,344 @@
-import re
-import spacy
-from typing import List, Dict, Any, Tuple
+import asyncio
+from typing import List, Dict, Any, Optional, Tuple
 from datetime import datetime
-from .knowledge_graph import kg_service
+from functools import lru_cache
+from .conversation_store import DEFAULT_SESSION_ID, get_conversation_store
+from .extraction import extraction_engine
+from .entity_index import EntityResolutionIndex
+from .knowledge_graph import KnowledgeGraphService, get_kg_service
+from .write_behind import get_write_behind_queue
+from ..core.cache import LRUCache
+from ..core.config import settings
+from ..core.metrics import registry
 from ..models.schemas import ChatResponse
+import hashlib
 import logging
+import threading
+import time
+import unicodedata
 
 logger = logging.getLogger(__name__)
 
+CHAT_STAGE_SECONDS = registry.histogram(
+    "chat_stage_seconds", "Time spent in each stage of ChatAgent.process_message", ["stage", "outcome"]
+)
+
+# Pipeline components excluded per NLP_PROFILE. Only doc.ents is used unless the parser
+# profile is chosen; NER in the en_core_web_sm/md/lg pipelines has its own tok2vec.
+NLP_PROFILES = {
+    "ner": ["tok2vec", "tagger", "parser", "attribute_ruler", "lemmatizer", "senter"],
+    "parser": ["lemmatizer", "senter"],
+    "full": [],
+}
+SUBJECT_DEPS = ("nsubj", "nsubjpass")
+OBJECT_DEPS = ("dobj", "attr", "oprd")
+
+def normalise_text(text: str) -> str:
+    """NFC-normalised text with whitespace runs collapsed, the basis of the extraction cache key"""
+    return " ".join(unicodedata.normalize("NFC", text).split())
+
 class ChatAgent:
     def __init__(self):
-        self.nlp = None
-        self.load_nlp_model()
-        self.conversation_history = []
+        self._nlp = None
+        self._nlp_lock = threading.Lock()
+        self.nlp_loaded = False
+        self.nlp_load_seconds = None
+        self.nlp_pipeline: List[str] = []
+        self.extraction_cache = (
+            LRUCache(settings.NLP_CACHE_SIZE, settings.NLP_CACHE_TTL) if settings.NLP_CACHE_SIZE > 0 else None
+        )
+    
+    @property
+    def nlp(self):
+        """spaCy pipeline, loaded on first use unless the startup warm-up got there first"""
+        if not self.nlp_loaded:
+            self.load_nlp_model()
+        return self._nlp
     
     def load_nlp_model(self):
-        """Load spaCy NLP model"""
-        try:
-            self.nlp = spacy.load("en_core_web_sm")
-        except OSError:
-            logger.warning("SpaCy model not found. Using basic NLP processing.")
-            self.nlp = None
+        """Load the spaCy model with the components of NLP_PROFILE"""
+        with self._nlp_lock:
+            if self.nlp_loaded:
+                return
+            if settings.NLP_PROFILE not in NLP_PROFILES:
+                raise ValueError(f"Unknown NLP_PROFILE: {settings.NLP_PROFILE!r}")
+            started = time.perf_counter()
+            try:
+                # Imported here so importing the app doesn't pay for spaCy
+                import spacy
+                self._nlp = spacy.load(settings.NLP_MODEL, exclude=NLP_PROFILES[settings.NLP_PROFILE])
+                self.nlp_pipeline = list(self._nlp.pipe_names)
+            except OSError:
+                logger.warning("SpaCy model not found. Using basic NLP processing.")
+                self._nlp = None
+            self.nlp_load_seconds = time.perf_counter() - started
+            self.nlp_loaded = True
+            logger.info(f"NLP model ready in {self.nlp_load_seconds:.2f}s "
+                        f"(profile {settings.NLP_PROFILE}: {', '.join(self.nlp_pipeline) or 'regex only'})")
     
     def extract_entities(self, text: str) -> List[Dict[str, Any]]:
         """Extract entities from text using NLP"""
         entities = []
         
         if self.nlp:
-            doc = self.nlp(text)
-            for ent in doc.ents:
-                entities.append({
-                    "text": ent.text,
-                    "label": ent.label_,
-                    "start": ent.start_char,
-                    "end": ent.end_char,
-                    "confidence": 1.0  # spaCy doesn't provide confidence scores directly
-                })
+            entities.extend(self.entities_from_doc(self.nlp(text)))
         else:
             # Basic entity extraction using patterns
             entities.extend(self._extract_basic_entities(text))
         
         return entities
     
+    def entities_from_doc(self, doc) -> List[Dict[str, Any]]:
+        """Convert the named entities of a processed spaCy doc"""
+        return [
+            {
+                "text": ent.text,
+                "label": ent.label_,
+                "start": ent.start_char,
+                "end": ent.end_char,
+                "confidence": 1.0  # spaCy doesn't provide confidence scores directly
+            }
+            for ent in doc.ents
+        ]
+    
+    def relationships_from_doc(self, doc) -> List[Dict[str, Any]]:
+        """Subject-verb-object relationships from a dependency parse.
+        
+        The verb (plus a following preposition or determiner, e.g. "depends on",
+        "is a") must match a registered relationship verb, but the subject and
+        object can be anywhere in the clause, not just adjacent to it.
+        """
+        relationships = []
+        for verb in doc:
+            subjects = [child for child in verb.children if child.dep_ in SUBJECT_DEPS]
+            if not subjects:
+                continue
+            candidates = []
+            for child in verb.children:
+                if child.dep_ in OBJECT_DEPS:
+                    determiner = next((token for token in child.children if token.dep_ == "det"), None)
+                    if determiner is not None:
+                        candidates.append((f"{verb.text} {determiner.text}", child))
+                    candidates.append((verb.text, child))
+                elif child.dep_ in ("prep", "agent"):
+                    candidates.extend(
+                        (f"{verb.text} {child.text}", token) for token in child.children if token.dep_ == "pobj"
+                    )
+            
+            for phrase, target in candidates:
+                relationship_type = extraction_engine.relationship_type_for(phrase)
+                if relationship_type is None:
+                    continue
+                for subject in subjects:
+                    start, end = self._phrase_span(subject), self._phrase_span(target)
+                    relationships.append({
+                        "start_entity": start.text,
+                        "end_entity": end.text,
+                        "relationship_type": relationship_type,
+                        "start": min(start.start_char, end.start_char),
+                        "end": max(start.end_char, end.end_char),
+                        "confidence": 0.75
+                    })
+                break
+        return relationships
+    
+    @staticmethod
+    def _phrase_span(token):
+        """The named entity containing a token, or the token with its compound modifiers"""
+        for ent in token.doc.ents:
+            if ent.start <= token.i < ent.end:
+                return ent
+        start = token.i
+        for child in reversed(list(token.lefts)):
+            if child.dep_ != "compound" or child.i != start - 1:
+                break
+            start = child.i
+        return token.doc[start:token.i + 1]
+    
+    def extractions_from_doc(self, doc) -> Tuple[List[Dict[str, Any]], List[Dict[str, Any]]]:
+        """Entities and relationships of a processed doc; parsed docs add dependency relationships"""
+        entities = self.entities_from_doc(doc)
+        with CHAT_STAGE_SECONDS.time(stage="regex_extraction"):
+            relationships = self.extract_relationships(doc.text, entities)
+        if doc.has_annotation("DEP"):
+            with CHAT_STAGE_SECONDS.time(stage="dependency_extraction"):
+                seen = {(rel["start_entity"].lower(), rel["end_entity"].lower(), rel["relationship_type"])
+                        for rel in relationships}
+                for rel in self.relationships_from_doc(doc):
+                    key = (rel["start_entity"].lower(), rel["end_entity"].lower(), rel["relationship_type"])
+                    if key not in seen:
+                        seen.add(key)
+                        relationships.append(rel)
+        return entities, relationships
+    
     def _extract_basic_entities(self, text: str) -> List[Dict[str, Any]]:
         """Basic entity extraction using regex patterns"""
-        entities = []
-        
-        # Extract potential concepts (capitalized words/phrases)
-        concept_pattern = r'\b[A-Z][a-z]+(?:\s+[A-Z][a-z]+)*\b'
-        concepts = re.findall(concept_pattern, text)
-        
-        for concept in concepts:
-            entities.append({
-                "text": concept,
-                "label": "CONCEPT",
-                "start": text.find(concept),
-                "end": text.find(concept) + len(concept),
-                "confidence": 0.8
-            })
-        
-        # Extract dates
-        date_pattern = r'\b\d{1,2}[/-]\d{1,2}[/-]\d{2,4}\b|\b\d{4}[/-]\d{1,2}[/-]\d{1,2}\b'
-        dates = re.findall(date_pattern, text)
-        
-        for date in dates:
-            entities.append({
-                "text": date,
-                "label": "DATE",
-                "start": text.find(date),
-                "end": text.find(date) + len(date),
-                "confidence": 0.9
-            })
-        
-        return entities
+        return extraction_engine.extract_entities(text)
     
     def extract_relationships(self, text: str, entities: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
         """Extract relationships between entities"""
-        relationships = []
+        return extraction_engine.extract_relationships(text)
+    
+    def extract(self, message: str) -> Tuple[List[Dict[str, Any]], List[Dict[str, Any]]]:
+        """Extract entities and relationships from a message.
         
-        # Simple relationship extraction based on common patterns
-        relationship_patterns = [
-            (r'(\w+)\s+is\s+(?:a|an)\s+(\w+)', "IS_A"),
-            (r'(\w+)\s+relates\s+to\s+(\w+)', "RELATES_TO"),
-            (r'(\w+)\s+connects\s+to\s+(\w+)', "CONNECTS_TO"),
-            (r'(\w+)\s+influences\s+(\w+)', "INFLUENCES"),
-            (r'(\w+)\s+causes\s+(\w+)', "CAUSES"),
-            (r'(\w+)\s+depends\s+on\s+(\w+)', "DEPENDS_ON"),
-        ]
+        The message is normalised first (see normalise_text), so offsets refer
+        to the normalised text, and results are cached by its hash: repeated
+        or templated messages skip NLP entirely.
+        """
+        text = normalise_text(message)
+        key = None
+        if self.extraction_cache is not None:
+            key = (extraction_engine.version, hashlib.blake2b(text.encode("utf-8"), digest_size=16).digest())
+            cached = self.extraction_cache.get(key)
+            if cached is not None:
+                return list(cached[0]), list(cached[1])
         
-        for pattern, rel_type in relationship_patterns:
-            matches = re.findall(pattern, text, re.IGNORECASE)
-            for match in matches:
-                relationships.append({
-                    "start_entity": match[0],
-                    "end_entity": match[1],
-                    "relationship_type": rel_type,
-                    "confidence": 0.7
-                })
+        if not self.nlp:
+            # Entities and relationships in a single scan
+            with CHAT_STAGE_SECONDS.time(stage="regex_extraction"):
+                entities, relationships = extraction_engine.extract(text)
+        else:
+            with CHAT_STAGE_SECONDS.time(stage="spacy"):
+                doc = self.nlp(text)
+            entities, relationships = self.extractions_from_doc(doc)
         
-        return relationships
+        if key is not None:
+            self.extraction_cache.set(key, (entities, relationships))
+        return list(entities), list(relationships)
     
-    def process_message(self, message: str) -> ChatResponse:
-        """Process a chat message and update knowledge graph"""
-        timestamp = datetime.now()
-        
-        # Extract entities and relationships
-        entities = self.extract_entities(message)
-        relationships = self.extract_relationships(message, entities)
+    def nlp_stats(self) -> Dict[str, Any]:
+        """Pipeline profile, load time and extraction cache hit rate"""
+        return {
+            "model": settings.NLP_MODEL,
+            "profile": settings.NLP_PROFILE,
+            "loaded": self.nlp_loaded,
+            "spacy": self._nlp is not None,
+            "pipeline": self.nlp_pipeline,
+            "load_seconds": round(self.nlp_load_seconds, 3) if self.nlp_load_seconds is not None else None,
+            "cache": self.extraction_cache.stats() if self.extraction_cache is not None else None
+        }
+    
+    def build_graph_writes(self, entities: List[Dict[str, Any]], relationships: List[Dict[str, Any]],
+                           properties: Dict[str, Any], entity_index: Optional[EntityResolutionIndex] = None
+                           ) -> Tuple[List[Dict[str, Any]], List[Dict[str, Any]], List[Dict[str, Any]]]:
+        """Turn extraction output into upsert_batch rows.
         
-        # Create entities in knowledge graph
+        Relationship endpoints are resolved against the entities of the same text
+        first and then against the tenant's ``entity_index``, so they can link to
+        entities mentioned in earlier messages. The index is passed in rather than
+        looked up because bulk ingestion calls this from a worker thread, which
+        must not touch the tenant registry. Returns the created-entity summaries plus the entity and relationship rows.
+        """
         entities_created = []
+        entity_writes = []
+        entity_ids_by_name = {}
         for entity in entities:
-            entity_id = kg_service.create_entity(
-                name=entity["text"],
-                entity_type=entity["label"],
-                properties={
-                    "confidence": entity["confidence"],
-                    "source": "chat",
-                    "extracted_at": timestamp.isoformat()
-                }
-            )
+            entity_id = KnowledgeGraphService.make_entity_id(entity["text"], entity["label"])
             entities_created.append({
                 "id": entity_id,
                 "name": entity["text"],
                 "type": entity["label"]
             })
+            entity_writes.append({
+                "name": entity["text"],
+                "type": entity["label"],
+                "properties": {"confidence": entity["confidence"], **properties}
+            })
+            entity_ids_by_name[entity["text"].lower()] = entity_id
         
-        # Create relationships in knowledge graph
-        relationships_created = []
+        def resolve(name: str) -> Optional[str]:
+            return entity_ids_by_name.get(name.lower()) or (entity_index.resolve(name) if entity_index else None)
+        
+        relationship_writes = []
         for rel in relationships:
-            # Find matching entities
-            start_entity_id = None
-            end_entity_id = None
-            
-            for entity in entities_created:
-                if entity["name"].lower() == rel["start_entity"].lower():
-                    start_entity_id = entity["id"]
-                if entity["name"].lower() == rel["end_entity"].lower():
-                    end_entity_id = entity["id"]
-            
+            start_entity_id = resolve(rel["start_entity"])
+            end_entity_id = resolve(rel["end_entity"])
             if start_entity_id and end_entity_id:
-                success = kg_service.create_relationship(
-                    start_entity_id,
-                    end_entity_id,
-                    rel["relationship_type"],
-                    {
-                        "confidence": rel["confidence"],
-                        "source": "chat",
-                        "extracted_at": timestamp.isoformat()
-                    }
-                )
-                if success:
-                    relationships_created.append({
-                        "start_entity": start_entity_id,
-                        "end_entity": end_entity_id,
-                        "type": rel["relationship_type"]
-                    })
+                relationship_writes.append({
+                    "start_entity": start_entity_id,
+                    "end_entity": end_entity_id,
+                    "type": rel["relationship_type"],
+                    "properties": {"confidence": rel["confidence"], **properties}
+                })
+        
+        return entities_created, entity_writes, relationship_writes
+    
+    @staticmethod
+    def mention_contexts(text: str, entities: List[Dict[str, Any]],
+                         entities_created: List[Dict[str, Any]]) -> List[Tuple[str, str, str]]:
+        """``(entity_id, name, context)`` for the similarity index, where the context is
+        the text within SIMILARITY_CONTEXT_CHARS of the mention. Empty when similarity is disabled.
+        """
+        if not settings.SIMILARITY_ENABLED:
+            return []
+        window = settings.SIMILARITY_CONTEXT_CHARS
+        return [
+            (created["id"], created["name"], text[max(entity["start"] - window, 0):entity["end"] + window])
+            for entity, created in zip(entities, entities_created)
+        ]
+    
+    async def process_message(self, message: str, session_id: str = DEFAULT_SESSION_ID,
+                              tenant_id: Optional[str] = None) -> ChatResponse:
+        """Process a chat message and update knowledge graph.
+        
+        Each stage is timed into the chat_stage_seconds histogram (see /metrics).
+        """
+        with CHAT_STAGE_SECONDS.time(stage="total"):
+            return await self._process_message(message, session_id, tenant_id)
+    
+    async def _process_message(self, message: str, session_id: str, tenant_id: Optional[str]) -> ChatResponse:
+        timestamp = datetime.now()
+        kg_service = get_kg_service(tenant_id)
+        
+        # Extract entities and relationships off the event loop (spaCy is CPU bound)
+        entities, relationships = await asyncio.to_thread(self.extract, message)
+        
+        with CHAT_STAGE_SECONDS.time(stage="resolve"):
+            entities_created, entity_writes, relationship_writes = self.build_graph_writes(
+                entities, relationships, {"source": "chat", "extracted_at": timestamp.isoformat()},
+                kg_service.entity_index
+            )
+        
+        if settings.WRITE_BEHIND_ENABLED:
+            # Reply as soon as extraction is done; the queue writes in the background
+            with CHAT_STAGE_SECONDS.time(stage="enqueue"):
+                await get_write_behind_queue().put(entity_writes, relationship_writes, tenant_id)
+            relationships_created = [
+                {"start_entity": rel["start_entity"], "end_entity": rel["end_entity"], "type": rel["type"]}
+                for rel in relationship_writes
+            ]
+        else:
+            # Write all nodes and edges in a single transaction
+            with CHAT_STAGE_SECONDS.time(stage="graph_write"):
+                _, relationships_created = await kg_service.upsert_batch(entity_writes, relationship_writes)
+        
+        # Vectorised in the background by the similarity index
+        with CHAT_STAGE_SECONDS.time(stage="similarity"):
+            kg_service.similarity.add_mentions(
+                self.mention_contexts(normalise_text(message), entities, entities_created)
+            )
         
         # Generate response
-        response = self.generate_response(message, entities_created, relationships_created)
+        with CHAT_STAGE_SECONDS.time(stage="response"):
+            response = self.generate_response(message, entities_created, relationships_created)
         
         # Store conversation history
-        self.conversation_history.append({
-            "message": message,
-            "response": response,
-            "entities": entities_created,
-            "relationships": relationships_created,
-            "timestamp": timestamp
-        })
+        with CHAT_STAGE_SECONDS.time(stage="history"):
+            await get_conversation_store().append(session_id, {
+                "message": message,
+                "response": response,
+                "entities": entities_created,
+                "relationships": relationships_created,
+                "timestamp": timestamp
+            }, tenant_id)
         
         return ChatResponse(
             response=response,
             entities_extracted=entities_created,
             relationships_created=relationships_created,
-            timestamp=timestamp
+            timestamp=timestamp,
+            session_id=session_id
         )
     
     def generate_response(self, message: str, entities: List[Dict[str, Any]], 
@@ -196,9 +361,16 @@ class ChatAgent:
         
         return " ".join(response_parts)
     
-    def get_conversation_history(self) -> List[Dict[str, Any]]:
-        """Get the conversation history"""
-        return self.conversation_history
+    async def get_conversation_history(self, session_id: str = DEFAULT_SESSION_ID, cursor: Optional[int] = None,
+                                       limit: int = 50, tenant_id: Optional[str] = None
+                                       ) -> Tuple[List[Dict[str, Any]], Optional[int]]:
+        """Get a page of a session's conversation history and the cursor for the previous page"""
+        return await get_conversation_store().history(session_id, cursor, limit, tenant_id)
+    
+    async def clear_conversation_history(self, session_id: str = DEFAULT_SESSION_ID, tenant_id: Optional[str] = None):
+        await get_conversation_store().clear(session_id, tenant_id)
 
-# Global agent instance
-chat_agent = ChatAgent()
\ No newline at end of file
+@lru_cache()
+def get_chat_agent() -> ChatAgent:
+    """Shared agent instance; the spaCy model loads on first use or warm-up"""
+    return ChatAgent()
\ No newline at end of file
@@ -0,0 +1,203 @@
+from typing import List, Dict, Any, Optional, Tuple
+from collections import OrderedDict, deque
+from datetime import datetime
+from functools import lru_cache
+from ..core.config import settings
+import asyncio
+import json
+import sqlite3
+import threading
+
+DEFAULT_SESSION_ID = "default"
+
+class ConversationStore:
+    """Session-scoped chat history, keeping at most ``max_messages`` per session.
+    
+    Sessions belong to a tenant (DEFAULT_TENANT_ID when ``tenant_id`` is
+    None); the same session id in two tenants is two sessions. Every
+    stored message gets a ``seq`` that increases within the store.
+    history() pages backwards from the newest message: pass the returned
+    ``next_cursor`` as ``cursor`` to fetch the previous page.
+    """
+    
+    def __init__(self, max_messages: int):
+        self.max_messages = max_messages
+    
+    async def append(self, session_id: str, entry: Dict[str, Any], tenant_id: Optional[str] = None) -> int:
+        raise NotImplementedError
+    
+    async def history(self, session_id: str, cursor: Optional[int] = None, limit: int = 50,
+                      tenant_id: Optional[str] = None) -> Tuple[List[Dict[str, Any]], Optional[int]]:
+        """Up to ``limit`` messages older than ``cursor`` (oldest first) and the next cursor"""
+        raise NotImplementedError
+    
+    async def clear(self, session_id: str, tenant_id: Optional[str] = None):
+        raise NotImplementedError
+    
+    def stats(self) -> Dict[str, Any]:
+        raise NotImplementedError
+    
+    def close(self):
+        pass
+
+class MemoryConversationStore(ConversationStore):
+    """Per-process ring buffer per session; least recently used sessions are dropped"""
+    
+    def __init__(self, max_messages: int = 200, max_sessions: int = 1000):
+        super().__init__(max_messages)
+        self.max_sessions = max_sessions
+        self._sessions: "OrderedDict[Tuple[str, str], deque]" = OrderedDict()
+        self._seq = 0
+        self._lock = threading.Lock()
+    
+    async def append(self, session_id: str, entry: Dict[str, Any], tenant_id: Optional[str] = None) -> int:
+        key = (tenant_id or settings.DEFAULT_TENANT_ID, session_id)
+        with self._lock:
+            self._seq += 1
+            messages = self._sessions.get(key)
+            if messages is None:
+                messages = self._sessions[key] = deque(maxlen=self.max_messages)
+            self._sessions.move_to_end(key)
+            messages.append({"seq": self._seq, **entry})
+            while len(self._sessions) > self.max_sessions:
+                self._sessions.popitem(last=False)
+            return self._seq
+    
+    async def history(self, session_id: str, cursor: Optional[int] = None, limit: int = 50,
+                      tenant_id: Optional[str] = None) -> Tuple[List[Dict[str, Any]], Optional[int]]:
+        with self._lock:
+            messages = list(self._sessions.get((tenant_id or settings.DEFAULT_TENANT_ID, session_id), ()))
+        if cursor is not None:
+            messages = [message for message in messages if message["seq"] < cursor]
+        page = messages[-limit:] if limit > 0 else []
+        next_cursor = page[0]["seq"] if page and len(messages) > len(page) else None
+        return page, next_cursor
+    
+    async def clear(self, session_id: str, tenant_id: Optional[str] = None):
+        with self._lock:
+            self._sessions.pop((tenant_id or settings.DEFAULT_TENANT_ID, session_id), None)
+    
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "backend": "memory",
+                "sessions": len(self._sessions),
+                "messages": sum(len(messages) for messages in self._sessions.values()),
+                "max_messages": self.max_messages,
+                "max_sessions": self.max_sessions
+            }
+
+class SQLiteConversationStore(ConversationStore):
+    """Durable store in a SQLite file that several worker processes can share.
+    
+    The database runs in WAL mode so readers never block the writer, and
+    each session is trimmed to ``max_messages`` on insert. Blocking calls
+    run in a worker thread with one connection per thread.
+    """
+    
+    def __init__(self, path: str, max_messages: int = 200):
+        super().__init__(max_messages)
+        self.path = path
+        self._local = threading.local()
+        self._connections: List[sqlite3.Connection] = []
+        self._connections_lock = threading.Lock()
+        connection = self._connection()
+        connection.execute("PRAGMA journal_mode=WAL")
+        connection.executescript("""
+        CREATE TABLE IF NOT EXISTS messages (
+            seq INTEGER PRIMARY KEY AUTOINCREMENT,
+            session_id TEXT NOT NULL,
+            payload TEXT NOT NULL,
+            created_at TEXT NOT NULL
+        );
+        """)
+        # Databases from before tenants: their sessions belong to the default tenant.
+        # Locked so two workers starting together don't both add the column
+        with connection:
+            connection.execute("BEGIN IMMEDIATE")
+            columns = [row[1] for row in connection.execute("PRAGMA table_info(messages)")]
+            if "tenant_id" not in columns:
+                connection.execute("ALTER TABLE messages ADD COLUMN tenant_id TEXT NOT NULL DEFAULT ''")
+                connection.execute("UPDATE messages SET tenant_id = ?", (settings.DEFAULT_TENANT_ID,))
+        connection.executescript("""
+        DROP INDEX IF EXISTS messages_session_seq;
+        CREATE INDEX IF NOT EXISTS messages_tenant_session_seq ON messages (tenant_id, session_id, seq);
+        """)
+    
+    def _connection(self) -> sqlite3.Connection:
+        connection = getattr(self._local, "connection", None)
+        if connection is None:
+            connection = sqlite3.connect(self.path, timeout=30, isolation_level=None, check_same_thread=False)
+            connection.execute("PRAGMA synchronous=NORMAL")
+            self._local.connection = connection
+            with self._connections_lock:
+                self._connections.append(connection)
+        return connection
+    
+    def _append(self, tenant_id: str, session_id: str, entry: Dict[str, Any]) -> int:
+        connection = self._connection()
+        payload = json.dumps(entry, default=lambda value: value.isoformat() if isinstance(value, datetime) else str(value))
+        with connection:
+            connection.execute("BEGIN IMMEDIATE")
+            seq = connection.execute(
+                "INSERT INTO messages (tenant_id, session_id, payload, created_at) VALUES (?, ?, ?, ?)",
+                (tenant_id, session_id, payload, datetime.now().isoformat())
+            ).lastrowid
+            connection.execute("""
+            DELETE FROM messages WHERE tenant_id = ? AND session_id = ? AND seq <= (
+                SELECT seq FROM messages WHERE tenant_id = ? AND session_id = ? ORDER BY seq DESC LIMIT 1 OFFSET ?
+            )
+            """, (tenant_id, session_id, tenant_id, session_id, self.max_messages))
+        return seq
+    
+    def _history(self, tenant_id: str, session_id: str, cursor: Optional[int], limit: int):
+        rows = self._connection().execute("""
+        SELECT seq, payload FROM messages
+        WHERE tenant_id = ? AND session_id = ? AND seq < ?
+        ORDER BY seq DESC
+        LIMIT ?
+        """, (tenant_id, session_id, cursor if cursor is not None else 2 ** 63 - 1, max(limit, 0) + 1)).fetchall()
+        page = [{"seq": seq, **json.loads(payload)} for seq, payload in reversed(rows[:limit])]
+        next_cursor = page[0]["seq"] if page and len(rows) > limit else None
+        return page, next_cursor
+    
+    def _clear(self, tenant_id: str, session_id: str):
+        self._connection().execute("DELETE FROM messages WHERE tenant_id = ? AND session_id = ?", (tenant_id, session_id))
+    
+    async def append(self, session_id: str, entry: Dict[str, Any], tenant_id: Optional[str] = None) -> int:
+        return await asyncio.to_thread(self._append, tenant_id or settings.DEFAULT_TENANT_ID, session_id, entry)
+    
+    async def history(self, session_id: str, cursor: Optional[int] = None, limit: int = 50,
+                      tenant_id: Optional[str] = None) -> Tuple[List[Dict[str, Any]], Optional[int]]:
+        return await asyncio.to_thread(self._history, tenant_id or settings.DEFAULT_TENANT_ID, session_id, cursor, limit)
+    
+    async def clear(self, session_id: str, tenant_id: Optional[str] = None):
+        await asyncio.to_thread(self._clear, tenant_id or settings.DEFAULT_TENANT_ID, session_id)
+    
+    def stats(self) -> Dict[str, Any]:
+        sessions, messages = self._connection().execute(
+            "SELECT (SELECT count(*) FROM (SELECT DISTINCT tenant_id, session_id FROM messages)), count(*) FROM messages"
+        ).fetchone()
+        return {
+            "backend": "sqlite",
+            "path": self.path,
+            "sessions": sessions,
+            "messages": messages,
+            "max_messages": self.max_messages
+        }
+    
+    def close(self):
+        with self._connections_lock:
+            for connection in self._connections:
+                connection.close()
+            self._connections.clear()
+        self._local = threading.local()
+
+@lru_cache()
+def get_conversation_store() -> ConversationStore:
+    """Store selected by CONVERSATION_STORE ("memory" or "sqlite")"""
+    if settings.CONVERSATION_STORE == "sqlite":
+        return SQLiteConversationStore(settings.CONVERSATION_DB_PATH, settings.CONVERSATION_MAX_MESSAGES)
+    if settings.CONVERSATION_STORE != "memory":
+        raise ValueError(f"Unknown CONVERSATION_STORE: {settings.CONVERSATION_STORE!r}")
+    return MemoryConversationStore(settings.CONVERSATION_MAX_MESSAGES, settings.CONVERSATION_MAX_SESSIONS)
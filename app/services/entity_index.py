@@ -0,0 +1,142 @@
+from typing import List, Dict, Any, Iterable, Optional, Tuple
+from collections import OrderedDict
+import logging
+import threading
+
+logger = logging.getLogger(__name__)
+
+def normalise_name(name: str) -> str:
+    """Case-fold and collapse whitespace/underscores so lookups ignore formatting"""
+    return " ".join(name.replace("_", " ").casefold().split())
+
+class _TrieNode:
+    __slots__ = ("children", "entity_id")
+    
+    def __init__(self):
+        self.children: Dict[str, "_TrieNode"] = {}
+        self.entity_id: Optional[str] = None
+
+class EntityResolutionIndex:
+    """Resident name -> entity id index used to link relationship endpoints.
+    
+    Normalised names and aliases live in a hash map for O(1) resolution and
+    in a prefix trie for completion. Entities are evicted least recently
+    used first once ``maxsize`` is reached, together with all their names.
+    """
+    
+    def __init__(self, backend, maxsize: int = 100_000):
+        self.backend = backend
+        self.maxsize = maxsize
+        self._lock = threading.Lock()
+        self._names: Dict[str, str] = {}
+        self._entities: "OrderedDict[str, List[str]]" = OrderedDict()
+        self._trie = _TrieNode()
+        self.hits = 0
+        self.misses = 0
+    
+    def __len__(self) -> int:
+        return len(self._entities)
+    
+    def add(self, entity_id: str, name: str, aliases: Iterable[str] = ()):
+        """Index an entity under its name and aliases (latest write wins on clashes)"""
+        with self._lock:
+            keys = self._entities.setdefault(entity_id, [])
+            self._entities.move_to_end(entity_id)
+            for alias in (name, *aliases):
+                key = normalise_name(alias)
+                if not key or self._names.get(key) == entity_id:
+                    continue
+                previous = self._names.get(key)
+                if previous is not None and previous in self._entities:
+                    self._entities[previous].remove(key)
+                self._names[key] = entity_id
+                self._trie_insert(key, entity_id)
+                keys.append(key)
+            while len(self._entities) > self.maxsize:
+                evicted_id, evicted_keys = self._entities.popitem(last=False)
+                for key in evicted_keys:
+                    self._forget(key)
+    
+    def remove(self, entity_id: str):
+        with self._lock:
+            for key in self._entities.pop(entity_id, []):
+                self._forget(key)
+    
+    def resolve(self, name: str) -> Optional[str]:
+        """Entity id for a name, alias or known id; None when not indexed"""
+        with self._lock:
+            entity_id = self._names.get(normalise_name(name))
+            if entity_id is None and name in self._entities:
+                entity_id = name
+            if entity_id is None:
+                self.misses += 1
+                return None
+            self._entities.move_to_end(entity_id)
+            self.hits += 1
+            return entity_id
+    
+    def complete(self, prefix: str, limit: int = 10) -> List[Dict[str, str]]:
+        """Indexed names starting with ``prefix``, shortest first"""
+        with self._lock:
+            node = self._trie
+            prefix = normalise_name(prefix)
+            for char in prefix:
+                node = node.children.get(char)
+                if node is None:
+                    return []
+            results: List[Tuple[str, str]] = []
+            frontier = [(prefix, node)]
+            # Breadth-first so shorter completions come first
+            while frontier and len(results) < limit:
+                next_frontier = []
+                for key, current in frontier:
+                    if current.entity_id is not None:
+                        results.append((key, current.entity_id))
+                        if len(results) >= limit:
+                            break
+                    next_frontier.extend((key + char, child) for char, child in sorted(current.children.items()))
+                frontier = next_frontier
+            return [{"name": key, "id": entity_id} for key, entity_id in results]
+    
+    def _trie_insert(self, key: str, entity_id: str):
+        node = self._trie
+        for char in key:
+            node = node.children.setdefault(char, _TrieNode())
+        node.entity_id = entity_id
+    
+    def _forget(self, key: str):
+        self._names.pop(key, None)
+        path = [self._trie]
+        for char in key:
+            node = path[-1].children.get(char)
+            if node is None:
+                return
+            path.append(node)
+        path[-1].entity_id = None
+        # Prune branches that no longer lead to any name
+        for depth in range(len(key), 0, -1):
+            node = path[depth]
+            if node.children or node.entity_id is not None:
+                break
+            del path[depth - 1].children[key[depth - 1]]
+    
+    async def warm(self):
+        """Load entities from the graph, up to the index capacity"""
+        count = 0
+        async for row in self.backend.scan_entities(limit=self.maxsize):
+            if row["name"]:
+                aliases = row["aliases"] if isinstance(row["aliases"], list) else []
+                self.add(row["id"], row["name"], aliases)
+                count += 1
+        logger.info(f"Entity resolution index warmed with {count} entities")
+    
+    def stats(self) -> Dict[str, Any]:
+        lookups = self.hits + self.misses
+        return {
+            "entities": len(self._entities),
+            "names": len(self._names),
+            "maxsize": self.maxsize,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": round(self.hits / lookups, 4) if lookups else 0.0
+        }
\ No newline at end of file
@@ -0,0 +1,130 @@
+from typing import List, Dict, Any, Optional, Tuple
+from ..core.config import settings
+import re
+import threading
+
+CONCEPT_PATTERN = r"[A-Z][a-z]+(?:\s+[A-Z][a-z]+)*"
+DATE_PATTERN = r"\d{1,2}[/-]\d{1,2}[/-]\d{2,4}\b|\d{4}[/-]\d{1,2}[/-]\d{1,2}\b"
+
+# Relationship type -> verb phrase (matched case-insensitively between two terms)
+DEFAULT_RELATIONSHIP_PATTERNS = {
+    "IS_A": r"is\s+(?:a|an)",
+    "RELATES_TO": r"relates\s+to",
+    "CONNECTS_TO": r"connects\s+to",
+    "INFLUENCES": r"influences",
+    "CAUSES": r"causes",
+    "DEPENDS_ON": r"depends\s+on",
+}
+
+class ExtractionEngine:
+    """Pattern registry compiled into a single scanner.
+    
+    Entity patterns and every registered relationship verb are combined into
+    one regular expression, compiled once, and the text is scanned left to
+    right in a single pass. Each token match yields an entity with its real
+    span, and a lookahead at the same position yields any relationship that
+    starts there, so repeated mentions and overlapping relationships
+    ("A causes B influences C") are all reported with correct offsets.
+    """
+    
+    def __init__(self, relationship_patterns: Dict[str, str] = None):
+        self._lock = threading.Lock()
+        self._relationship_patterns: Dict[str, str] = {}
+        self._scanner = None
+        self._relationship_groups: List[Tuple[str, str]] = []
+        # Bumped on every recompile so cached extraction results can be keyed by it
+        self.version = 0
+        for relationship_type, verb_pattern in (relationship_patterns or DEFAULT_RELATIONSHIP_PATTERNS).items():
+            self._add(relationship_type, verb_pattern)
+        self._compile()
+    
+    @property
+    def relationship_types(self) -> List[str]:
+        return list(self._relationship_patterns)
+    
+    def register_relationship(self, relationship_type: str, verb_pattern: str):
+        """Add or replace a relationship verb and recompile the scanner"""
+        with self._lock:
+            self._add(relationship_type, verb_pattern)
+            self._compile()
+    
+    def _add(self, relationship_type: str, verb_pattern: str):
+        if not re.fullmatch(r"[A-Z][A-Z0-9_]*", relationship_type):
+            raise ValueError(f"Relationship type must be UPPER_SNAKE_CASE: {relationship_type!r}")
+        if re.compile(verb_pattern).groups:
+            raise ValueError(f"Verb pattern for {relationship_type} must not contain capturing groups")
+        self._relationship_patterns[relationship_type] = verb_pattern
+    
+    def relationship_type_for(self, phrase: str) -> Optional[str]:
+        """Relationship type whose verb pattern matches the whole phrase, e.g. "depends on" """
+        for relationship_type, verb_pattern in self._relationship_patterns.items():
+            if re.fullmatch(verb_pattern, phrase, re.IGNORECASE):
+                return relationship_type
+        return None
+    
+    def _compile(self):
+        self.version += 1
+        self._relationship_groups = [
+            (f"rel_{index}", relationship_type)
+            for index, relationship_type in enumerate(self._relationship_patterns)
+        ]
+        verbs = "|".join(
+            f"(?P<{group}>{self._relationship_patterns[relationship_type]})"
+            for group, relationship_type in self._relationship_groups
+        )
+        term = rf"(?:{CONCEPT_PATTERN}|\w+)"
+        relationship = rf"(?P<subject>{term})\s+(?i:{verbs})\s+(?P<object>{term})\b"
+        self._scanner = re.compile(
+            rf"\b(?:(?=(?P<relationship>{relationship})))?"
+            rf"(?:(?P<date>{DATE_PATTERN})|(?P<concept>{CONCEPT_PATTERN})\b|\w+)"
+        )
+    
+    def extract(self, text: str) -> Tuple[List[Dict[str, Any]], List[Dict[str, Any]]]:
+        """Extract entities and relationships from text in one scan"""
+        entities = []
+        relationships = []
+        scanner = self._scanner
+        relationship_groups = self._relationship_groups
+        
+        for match in scanner.finditer(text):
+            if match.group("date") is not None:
+                entities.append({
+                    "text": match.group("date"),
+                    "label": "DATE",
+                    "start": match.start("date"),
+                    "end": match.end("date"),
+                    "confidence": 0.9
+                })
+            elif match.group("concept") is not None:
+                entities.append({
+                    "text": match.group("concept"),
+                    "label": "CONCEPT",
+                    "start": match.start("concept"),
+                    "end": match.end("concept"),
+                    "confidence": 0.8
+                })
+            
+            if match.group("relationship") is not None:
+                relationship_type = next(
+                    relationship_type for group, relationship_type in relationship_groups
+                    if match.group(group) is not None
+                )
+                relationships.append({
+                    "start_entity": match.group("subject"),
+                    "end_entity": match.group("object"),
+                    "relationship_type": relationship_type,
+                    "start": match.start("relationship"),
+                    "end": match.end("relationship"),
+                    "confidence": 0.7
+                })
+        
+        return entities, relationships
+    
+    def extract_entities(self, text: str) -> List[Dict[str, Any]]:
+        return self.extract(text)[0]
+    
+    def extract_relationships(self, text: str) -> List[Dict[str, Any]]:
+        return self.extract(text)[1]
+
+# Global engine with the default verbs plus any from RELATIONSHIP_PATTERNS
+extraction_engine = ExtractionEngine({**DEFAULT_RELATIONSHIP_PATTERNS, **settings.RELATIONSHIP_PATTERNS})
\ No newline at end of file
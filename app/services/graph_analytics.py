@@ -0,0 +1,229 @@
+from typing import List, Dict, Any, Optional
+from concurrent.futures import Executor, ProcessPoolExecutor, ThreadPoolExecutor
+from datetime import datetime
+import asyncio
+import logging
+import time
+import networkx as nx
+
+logger = logging.getLogger(__name__)
+
+def pagerank(graph: nx.DiGraph, alpha: float = 0.85, max_iter: int = 100, tol: float = 1.0e-6) -> Dict[str, float]:
+    """PageRank by power iteration, using networkx's SciPy solver when SciPy is installed"""
+    if not graph.number_of_nodes():
+        return {}
+    try:
+        return nx.pagerank(graph, alpha=alpha, max_iter=max_iter, tol=tol)
+    except ModuleNotFoundError:
+        pass
+    count = graph.number_of_nodes()
+    out_degree = dict(graph.out_degree())
+    ranks = dict.fromkeys(graph, 1.0 / count)
+    for _ in range(max_iter):
+        # Rank held by nodes without out-edges is spread evenly over all nodes
+        dangling = alpha * sum(ranks[node] for node, degree in out_degree.items() if not degree) / count
+        base = (1.0 - alpha) / count + dangling
+        updated = dict.fromkeys(graph, base)
+        for node, rank in ranks.items():
+            if out_degree[node]:
+                share = alpha * rank / out_degree[node]
+                for successor in graph.successors(node):
+                    updated[successor] += share
+        error = sum(abs(updated[node] - ranks[node]) for node in graph)
+        ranks = updated
+        if error < count * tol:
+            break
+    return ranks
+
+def compute_analytics(graph: nx.DiGraph) -> Dict[str, Any]:
+    """Whole-graph scores for a snapshot; runs in an executor, never on the event loop"""
+    started = time.perf_counter()
+    undirected = graph.to_undirected(as_view=True)
+    pagerank_scores = pagerank(graph)
+    degree_centrality = nx.degree_centrality(graph) if graph.number_of_nodes() > 1 else {}
+    components = sorted(nx.connected_components(undirected), key=len, reverse=True)
+    communities = sorted(
+        nx.community.louvain_communities(undirected, seed=42) if graph.number_of_edges() else
+        [{node} for node in graph.nodes],
+        key=len, reverse=True
+    )
+    return {
+        "pagerank": pagerank_scores,
+        "degree_centrality": degree_centrality,
+        "components": [sorted(component) for component in components],
+        "communities": [sorted(community) for community in communities],
+        "seconds": round(time.perf_counter() - started, 4)
+    }
+
+class GraphAnalytics:
+    """Analytics over a compact in-memory copy of the :Entity graph.
+    
+    The copy is loaded once from the storage backend and then kept current from the write
+    path. A background task recomputes PageRank, degree centrality,
+    connected components and Louvain communities in an executor whenever
+    the graph has changed, and queries only read the last results, so no
+    request ever waits on a whole-graph computation.
+    """
+    
+    def __init__(self, backend, executor: str = "thread"):
+        self.backend = backend
+        self.graph = nx.DiGraph()
+        self.executor_kind = executor
+        self._executor: Optional[Executor] = None
+        self._refresh_task = None
+        self._computing: Optional[asyncio.Task] = None
+        self.pending_changes = 0
+        self.loaded = False
+        # Results of the last run and the graph they were computed from
+        self.results: Optional[Dict[str, Any]] = None
+        self.computed_graph: Optional[nx.DiGraph] = None
+        self.computed_at = None
+        self._pagerank_ranking: List[str] = []
+        self._rank_of: Dict[str, int] = {}
+        self._component_of: Dict[str, int] = {}
+        self._community_of: Dict[str, int] = {}
+    
+    def apply(self, nodes: List[Dict[str, Any]], relationships: List[Dict[str, Any]]):
+        """Fold written nodes and relationships (snapshot shape) into the in-memory graph"""
+        for node in nodes:
+            properties = node["properties"]
+            self.graph.add_node(node["id"], name=properties.get("name"), type=properties.get("type"))
+        for rel in relationships:
+            self.graph.add_edge(rel["start_node_id"], rel["end_node_id"], type=rel["type"])
+        self.pending_changes += len(nodes) + len(relationships)
+    
+    async def load(self):
+        """Build the in-memory graph from the backend, keeping anything written meanwhile"""
+        graph = nx.DiGraph()
+        async for row in self.backend.scan_entities():
+            graph.add_node(row["id"], name=row["name"], type=row["type"])
+        async for row in self.backend.scan_relationships():
+            graph.add_edge(row["start_id"], row["end_id"], type=row["type"])
+        graph.add_nodes_from(self.graph.nodes(data=True))
+        graph.add_edges_from(self.graph.edges(data=True))
+        self.graph = graph
+        self.loaded = True
+        self.pending_changes += 1
+        logger.info(f"Loaded analytics graph: {graph.number_of_nodes()} nodes, {graph.number_of_edges()} edges")
+    
+    def _get_executor(self) -> Executor:
+        if self._executor is None:
+            self._executor = ProcessPoolExecutor(max_workers=1) if self.executor_kind == "process" \
+                else ThreadPoolExecutor(max_workers=1, thread_name_prefix="graph-analytics")
+        return self._executor
+    
+    def refresh(self) -> asyncio.Task:
+        """Start recomputing all scores on a copy of the current graph (at most one run at a time)"""
+        if self._computing is None:
+            self._computing = asyncio.create_task(self._refresh())
+            self._computing.add_done_callback(lambda _: setattr(self, "_computing", None))
+        return self._computing
+    
+    async def _refresh(self):
+        graph = self.graph.copy()
+        changes = self.pending_changes
+        results = await asyncio.get_running_loop().run_in_executor(self._get_executor(), compute_analytics, graph)
+        self.pending_changes -= changes
+        self._pagerank_ranking = sorted(results["pagerank"], key=results["pagerank"].get, reverse=True)
+        self._rank_of = {node: index + 1 for index, node in enumerate(self._pagerank_ranking)}
+        self._component_of = {node: index for index, members in enumerate(results["components"]) for node in members}
+        self._community_of = {node: index for index, members in enumerate(results["communities"]) for node in members}
+        self.results = results
+        self.computed_graph = graph
+        self.computed_at = datetime.now()
+        logger.info(f"Graph analytics refreshed in {results['seconds']}s")
+    
+    def start_periodic_refresh(self, interval: float):
+        """Recompute every ``interval`` seconds while the graph has pending changes"""
+        async def run():
+            while True:
+                await asyncio.sleep(interval)
+                if not self.loaded or not self.pending_changes:
+                    continue
+                try:
+                    await asyncio.shield(self.refresh())
+                except Exception as e:
+                    logger.warning(f"Graph analytics refresh failed: {e}")
+        
+        if self._refresh_task is None:
+            self._refresh_task = asyncio.create_task(run())
+    
+    async def stop(self):
+        if self._refresh_task:
+            self._refresh_task.cancel()
+            try:
+                await self._refresh_task
+            except asyncio.CancelledError:
+                pass
+            self._refresh_task = None
+        if self._executor is not None:
+            self._executor.shutdown(wait=False, cancel_futures=True)
+            self._executor = None
+    
+    def status(self) -> Dict[str, Any]:
+        return {
+            "loaded": self.loaded,
+            "nodes": self.graph.number_of_nodes(),
+            "edges": self.graph.number_of_edges(),
+            "pending_changes": self.pending_changes,
+            "computing": self._computing is not None,
+            "computed_at": self.computed_at,
+            "computed_nodes": self.computed_graph.number_of_nodes() if self.computed_graph is not None else None,
+            "compute_seconds": self.results["seconds"] if self.results else None,
+            "executor": self.executor_kind
+        }
+    
+    def _node(self, node_id: str) -> Dict[str, Any]:
+        attributes = self.computed_graph.nodes[node_id]
+        return {"id": node_id, "name": attributes.get("name"), "type": attributes.get("type")}
+    
+    def top_pagerank(self, limit: int = 20, offset: int = 0) -> List[Dict[str, Any]]:
+        """Most central entities by PageRank"""
+        return [
+            {
+                **self._node(node_id),
+                "rank": offset + index + 1,
+                "pagerank": self.results["pagerank"][node_id],
+                "degree_centrality": self.results["degree_centrality"].get(node_id, 0.0)
+            }
+            for index, node_id in enumerate(self._pagerank_ranking[offset:offset + limit])
+        ]
+    
+    def groups(self, kind: str, limit: int = 20, min_size: int = 1) -> List[Dict[str, Any]]:
+        """Largest connected components or communities, with their top members by PageRank"""
+        pagerank = self.results["pagerank"]
+        groups = []
+        for index, members in enumerate(self.results[kind]):
+            if len(members) < min_size or len(groups) >= limit:
+                break
+            top = sorted(members, key=pagerank.get, reverse=True)[:10]
+            groups.append({"id": index, "size": len(members), "top_members": [self._node(node_id) for node_id in top]})
+        return groups
+    
+    def entity_scores(self, entity_id: str) -> Optional[Dict[str, Any]]:
+        if self.computed_graph is None or entity_id not in self.computed_graph:
+            return None
+        return {
+            **self._node(entity_id),
+            "pagerank": self.results["pagerank"][entity_id],
+            "rank": self._rank_of[entity_id],
+            "degree_centrality": self.results["degree_centrality"].get(entity_id, 0.0),
+            "component": self._component_of.get(entity_id),
+            "community": self._community_of.get(entity_id)
+        }
+    
+    async def shortest_path(self, source: str, target: str, directed: bool = False) -> Optional[List[Dict[str, Any]]]:
+        """Shortest path on the last computed snapshot, searched off the event loop"""
+        graph = self.computed_graph
+        if graph is None or source not in graph or target not in graph:
+            return None
+        search_graph = graph if directed else graph.to_undirected(as_view=True)
+        
+        def search():
+            try:
+                return nx.shortest_path(search_graph, source, target)
+            except nx.NetworkXNoPath:
+                return None
+        
+        path = await asyncio.to_thread(search)
+        return [self._node(node_id) for node_id in path] if path is not None else None
@@ -0,0 +1,278 @@
+from typing import List, Dict, Any, Optional, Tuple
+from ..models.schemas import KnowledgeGraphNode, KnowledgeGraphRelationship, KnowledgeGraphResponse
+import gzip
+import json
+import threading
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+try:
+    import msgpack
+except ImportError:
+    msgpack = None
+
+JSON_MEDIA_TYPE = "application/json"
+COMPACT_MEDIA_TYPE = "application/vnd.kg.compact+json"
+MSGPACK_MEDIA_TYPE = "application/msgpack"
+MEDIA_TYPES = {"json": JSON_MEDIA_TYPE, "compact": COMPACT_MEDIA_TYPE, "msgpack": MSGPACK_MEDIA_TYPE}
+ACCEPTED_MEDIA_TYPES = {
+    COMPACT_MEDIA_TYPE: "compact",
+    MSGPACK_MEDIA_TYPE: "msgpack",
+    "application/x-msgpack": "msgpack",
+}
+COMPACT_FORMAT_VERSION = 1
+# Bodies smaller than this are not worth compressing
+GZIP_MIN_SIZE = 1024
+
+def _default(value: Any) -> Any:
+    """Property values the encoders don't know, e.g. neo4j temporal types"""
+    isoformat = getattr(value, "isoformat", None)
+    return isoformat() if callable(isoformat) else str(value)
+
+def dumps(value: Any) -> bytes:
+    """JSON bytes through orjson when installed, else the standard library"""
+    if orjson is not None:
+        return orjson.dumps(value, default=_default)
+    return json.dumps(value, separators=(",", ":"), default=_default).encode("utf-8")
+
+def available_formats() -> List[str]:
+    return ["json", "compact"] + (["msgpack"] if msgpack is not None else [])
+
+def negotiate_format(accept: str, requested: Optional[str] = None) -> str:
+    """Wire format from an explicit ``format`` parameter or else the Accept header.
+    
+    An explicit format that is unknown or not installed raises ValueError; the
+    Accept header falls back to plain JSON.
+    """
+    if requested:
+        if requested not in available_formats():
+            raise ValueError(f"Unsupported format {requested!r}; available: {', '.join(available_formats())}")
+        return requested
+    
+    preferences = []
+    for position, part in enumerate(accept.split(",")):
+        media_type, *params = [piece.strip() for piece in part.split(";")]
+        quality = 1.0
+        for param in params:
+            if param.startswith("q="):
+                try:
+                    quality = float(param[2:])
+                except ValueError:
+                    quality = 0.0
+        preferences.append((-quality, position, media_type.lower()))
+    # Highest quality first, then the order the client listed them in
+    for negative_quality, _, media_type in sorted(preferences):
+        wire_format = ACCEPTED_MEDIA_TYPES.get(media_type)
+        if negative_quality < 0 and wire_format in available_formats():
+            return wire_format
+    return "json"
+
+def accepts_gzip(accept_encoding: str) -> bool:
+    for part in accept_encoding.split(","):
+        coding, *params = [piece.strip() for piece in part.split(";")]
+        if coding.lower() == "gzip":
+            return not any(param.replace(" ", "") in ("q=0", "q=0.0") for param in params)
+    return False
+
+def encode_compact(nodes: List[Dict[str, Any]], relationships: List[Dict[str, Any]],
+                   version: int, cursor: Optional[int] = None) -> Dict[str, Any]:
+    """Columnar form of a snapshot.
+    
+    ``ids`` holds the snapshot's node ids followed by any relationship
+    endpoints outside the snapshot; node columns cover the first
+    ``len(nodes["labels"])`` ids, and relationship ``source``/``target`` are
+    indices into ``ids``. Labels and types are indices into the ``labels``
+    and ``types`` string tables, and each property key (other than a node's
+    ``id``) is one column with null where a node or relationship lacks it.
+    """
+    ids: List[str] = []
+    index_by_id: Dict[str, int] = {}
+    labels: List[str] = []
+    label_index: Dict[str, int] = {}
+    types: List[str] = []
+    type_index: Dict[str, int] = {}
+    
+    def node_index(node_id: str) -> int:
+        index = index_by_id.get(node_id)
+        if index is None:
+            index = index_by_id[node_id] = len(ids)
+            ids.append(node_id)
+        return index
+    
+    def columns(records: List[Dict[str, Any]]) -> Dict[str, List[Any]]:
+        table: Dict[str, List[Any]] = {}
+        for row, properties in enumerate(records):
+            for key, value in properties.items():
+                column = table.get(key)
+                if column is None:
+                    column = table[key] = [None] * len(records)
+                column[row] = value
+        return table
+    
+    node_labels = []
+    for node in nodes:
+        node_index(node["id"])
+        row = []
+        for label in node["labels"]:
+            index = label_index.get(label)
+            if index is None:
+                index = label_index[label] = len(labels)
+                labels.append(label)
+            row.append(index)
+        node_labels.append(row)
+    
+    rel_ids, rel_types, sources, targets = [], [], [], []
+    for rel in relationships:
+        rel_ids.append(rel["rel_id"])
+        index = type_index.get(rel["type"])
+        if index is None:
+            index = type_index[rel["type"]] = len(types)
+            types.append(rel["type"])
+        rel_types.append(index)
+        sources.append(node_index(rel["start_node_id"]))
+        targets.append(node_index(rel["end_node_id"]))
+    
+    return {
+        "format": COMPACT_FORMAT_VERSION,
+        "graph_version": version,
+        "next_cursor": cursor,
+        "ids": ids,
+        "labels": labels,
+        "types": types,
+        "nodes": {
+            "labels": node_labels,
+            # "id" is already in ids
+            "properties": columns([
+                {key: value for key, value in node["properties"].items() if key != "id"} for node in nodes
+            ])
+        },
+        "relationships": {
+            "id": rel_ids,
+            "type": rel_types,
+            "source": sources,
+            "target": targets,
+            "properties": columns([rel["properties"] for rel in relationships])
+        }
+    }
+
+def decode_compact(payload: Dict[str, Any]) -> Tuple[List[Dict[str, Any]], List[Dict[str, Any]]]:
+    """Node and relationship rows back from the columnar form, e.g. in a Python client.
+    
+    Nulls in property columns are missing properties, as graph properties
+    can't be null.
+    """
+    if payload.get("format") != COMPACT_FORMAT_VERSION:
+        raise ValueError(f"Unsupported compact format {payload.get('format')!r}")
+    ids, labels, types = payload["ids"], payload["labels"], payload["types"]
+    
+    def rows(table: Dict[str, List[Any]], count: int) -> List[Dict[str, Any]]:
+        records: List[Dict[str, Any]] = [{} for _ in range(count)]
+        for key, column in table.items():
+            for record, value in zip(records, column):
+                if value is not None:
+                    record[key] = value
+        return records
+    
+    node_labels = payload["nodes"]["labels"]
+    node_properties = rows(payload["nodes"]["properties"], len(node_labels))
+    nodes = [
+        {"id": ids[index], "labels": [labels[label] for label in row], "properties": {"id": ids[index], **properties}}
+        for index, (row, properties) in enumerate(zip(node_labels, node_properties))
+    ]
+    columns = payload["relationships"]
+    relationships = [
+        {
+            "rel_id": rel_id,
+            "type": types[type_index],
+            "start_node_id": ids[source],
+            "end_node_id": ids[target],
+            "properties": properties
+        }
+        for rel_id, type_index, source, target, properties in zip(
+            columns["id"], columns["type"], columns["source"], columns["target"],
+            rows(columns["properties"], len(columns["id"]))
+        )
+    ]
+    return nodes, relationships
+
+class GraphSnapshot:
+    """Rows of one graph snapshot plus its serialised bodies, built on first use.
+    
+    The rows come straight from the backend, so the Pydantic models are
+    constructed without validation and the wire formats are encoded from the
+    rows directly.
+    """
+    
+    def __init__(self, version: int, nodes: List[Dict[str, Any]], relationships: List[Dict[str, Any]],
+                 cursor: Optional[int] = None):
+        self.version = version
+        self.nodes = nodes
+        self.relationships = relationships
+        # Change sequence to pass as ``since`` for what was written after this
+        self.cursor = cursor
+        self._response: Optional[KnowledgeGraphResponse] = None
+        self._bodies: Dict[Tuple[str, bool], bytes] = {}
+        self._lock = threading.Lock()
+    
+    def response(self) -> KnowledgeGraphResponse:
+        if self._response is None:
+            self._response = KnowledgeGraphResponse.model_construct(
+                nodes=[
+                    KnowledgeGraphNode.model_construct(id=node["id"], labels=node["labels"],
+                                                       properties=node["properties"])
+                    for node in self.nodes
+                ],
+                relationships=[
+                    KnowledgeGraphRelationship.model_construct(
+                        id=str(rel["rel_id"]),
+                        type=rel["type"],
+                        start_node_id=rel["start_node_id"],
+                        end_node_id=rel["end_node_id"],
+                        properties=rel["properties"]
+                    )
+                    for rel in self.relationships
+                ],
+                next_cursor=self.cursor
+            )
+        return self._response
+    
+    def _payload(self, wire_format: str) -> bytes:
+        if wire_format == "json":
+            # Same shape as KnowledgeGraphResponse
+            return dumps({
+                "nodes": [
+                    {"id": node["id"], "labels": node["labels"], "properties": node["properties"]}
+                    for node in self.nodes
+                ],
+                "relationships": [
+                    {
+                        "id": str(rel["rel_id"]),
+                        "type": rel["type"],
+                        "start_node_id": rel["start_node_id"],
+                        "end_node_id": rel["end_node_id"],
+                        "properties": rel["properties"]
+                    }
+                    for rel in self.relationships
+                ],
+                "next_cursor": self.cursor
+            })
+        compact = encode_compact(self.nodes, self.relationships, self.version, self.cursor)
+        if wire_format == "msgpack":
+            return msgpack.packb(compact, default=_default, use_bin_type=True)
+        return dumps(compact)
+    
+    def body(self, wire_format: str, compress: bool = False) -> Tuple[bytes, bool]:
+        """Encoded body and whether it is gzipped; cached per format"""
+        with self._lock:
+            plain = self._bodies.get((wire_format, False))
+            if plain is None:
+                plain = self._bodies[(wire_format, False)] = self._payload(wire_format)
+            if not compress or len(plain) < GZIP_MIN_SIZE:
+                return plain, False
+            compressed = self._bodies.get((wire_format, True))
+            if compressed is None:
+                compressed = self._bodies[(wire_format, True)] = gzip.compress(plain, compresslevel=5)
+            return compressed, True
@@ -0,0 +1,102 @@
+from typing import List, Dict, Any, Optional, Set
+import asyncio
+
+class GraphEventBroadcaster:
+    """Fan-out of graph deltas from the write path to live subscribers.
+    
+    Writes are coalesced for ``window`` seconds (later writes to the same
+    node or edge replace earlier ones) and then sent as one delta to every
+    subscriber. Each subscriber has a bounded queue; a subscriber whose
+    queue is full is sent a single "resync" message in place of everything
+    it has not read yet, so a slow client costs at most ``queue_size``
+    messages of memory.
+    """
+    
+    def __init__(self, window: float = 0.1, queue_size: int = 64):
+        self.window = window
+        self.queue_size = queue_size
+        self._subscribers: Set[asyncio.Queue] = set()
+        self._pending_nodes: Dict[str, Dict[str, Any]] = {}
+        self._pending_relationships: Dict[str, Dict[str, Any]] = {}
+        self._flush_handle: Optional[asyncio.TimerHandle] = None
+        self.version = 0
+        self.deltas_sent = 0
+        self.resyncs_sent = 0
+    
+    def subscribe(self) -> asyncio.Queue:
+        queue = asyncio.Queue(maxsize=self.queue_size)
+        self._subscribers.add(queue)
+        return queue
+    
+    def unsubscribe(self, queue: asyncio.Queue):
+        self._subscribers.discard(queue)
+    
+    def publish(self, version: int, nodes: List[Dict[str, Any]], relationships: List[Dict[str, Any]]):
+        """Queue written nodes and relationships for the next delta"""
+        self.version = version
+        if not self._subscribers:
+            return
+        for node in nodes:
+            self._pending_nodes[node["id"]] = node
+        for relationship in relationships:
+            self._pending_relationships[relationship["id"]] = relationship
+        if self._flush_handle is None:
+            try:
+                loop = asyncio.get_running_loop()
+            except RuntimeError:
+                # Writes outside the event loop (e.g. scripts) have no listeners to notify
+                self._discard_pending()
+                return
+            self._flush_handle = loop.call_later(self.window, self.flush)
+    
+    def flush(self):
+        """Send the pending delta to every subscriber now"""
+        if self._flush_handle is not None:
+            self._flush_handle.cancel()
+            self._flush_handle = None
+        if not self._pending_nodes and not self._pending_relationships:
+            return
+        delta = {
+            "type": "delta",
+            "version": self.version,
+            "nodes": list(self._pending_nodes.values()),
+            "relationships": list(self._pending_relationships.values())
+        }
+        self._discard_pending()
+        for queue in list(self._subscribers):
+            self._offer(queue, delta)
+        self.deltas_sent += 1
+    
+    def resync(self, version: int):
+        """Tell every subscriber to reload, e.g. after a bulk load bypassed the write path"""
+        self.version = version
+        self._discard_pending()
+        for queue in list(self._subscribers):
+            while not queue.empty():
+                queue.get_nowait()
+            queue.put_nowait({"type": "resync", "version": version})
+            self.resyncs_sent += 1
+    
+    def _offer(self, queue: asyncio.Queue, message: Dict[str, Any]):
+        try:
+            queue.put_nowait(message)
+        except asyncio.QueueFull:
+            # Too far behind to catch up with deltas: drop them and ask for a full reload
+            while not queue.empty():
+                queue.get_nowait()
+            queue.put_nowait({"type": "resync", "version": self.version})
+            self.resyncs_sent += 1
+    
+    def _discard_pending(self):
+        self._pending_nodes = {}
+        self._pending_relationships = {}
+    
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "subscribers": len(self._subscribers),
+            "window": self.window,
+            "queue_size": self.queue_size,
+            "max_queue_depth": max((queue.qsize() for queue in self._subscribers), default=0),
+            "deltas_sent": self.deltas_sent,
+            "resyncs_sent": self.resyncs_sent
+        }
@@ -0,0 +1,154 @@
+from typing import Dict, Any, List, Optional, Tuple, Iterable
+from collections import Counter
+from datetime import datetime
+import asyncio
+import logging
+
+logger = logging.getLogger(__name__)
+
+def degree_bucket(degree: int) -> str:
+    """Power-of-two histogram bucket label for a node degree"""
+    if degree <= 1:
+        return str(degree)
+    low = 1 << (degree.bit_length() - 1)
+    return f"{low}-{2 * low - 1}"
+
+class GraphStats:
+    """Graph statistics maintained from the write path.
+    
+    Counts are updated with the entities and relationships each write
+    actually created, so reads are constant time. reconcile() rebuilds
+    everything from a full scan to correct drift (e.g. writes made by other
+    worker processes or directly in Neo4j).
+    """
+    
+    def __init__(self, backend):
+        self.backend = backend
+        self.entity_counts: Counter = Counter()
+        self.relationship_counts: Counter = Counter()
+        self.degree_histogram: Counter = Counter()
+        self._degrees: Dict[str, int] = {}
+        self.last_reconciled_at = None
+        self._reconcile_task = None
+        # While a reconcile scans: the degrees it has read so far and the
+        # writes applied meanwhile, replayed onto its result
+        self._scanned: Optional[Dict[str, int]] = None
+        self._applied_during_scan: Optional[List[Tuple[list, list]]] = None
+        self._reconcile_lock = asyncio.Lock()
+    
+    def _set_degree(self, entity_id: str, degree: int):
+        old = self._degrees.get(entity_id)
+        if old is not None:
+            bucket = degree_bucket(old)
+            self.degree_histogram[bucket] -= 1
+            if not self.degree_histogram[bucket]:
+                del self.degree_histogram[bucket]
+        self._degrees[entity_id] = degree
+        self.degree_histogram[degree_bucket(degree)] += 1
+    
+    def apply(self, created_entities: Iterable[Tuple[str, str]],
+              created_relationships: Iterable[Tuple[str, str, str]]):
+        """Record newly created (id, type) entities and (start, end, type) relationships"""
+        created_entities = list(created_entities)
+        created_relationships = list(created_relationships)
+        if self._applied_during_scan is not None:
+            scanned = self._scanned
+            self._applied_during_scan.append((created_entities, [
+                (start_id, end_id, relationship_type, start_id in scanned, end_id in scanned)
+                for start_id, end_id, relationship_type in created_relationships
+            ]))
+        
+        for entity_id, entity_type in created_entities:
+            self.entity_counts[entity_type] += 1
+            if entity_id not in self._degrees:
+                self._set_degree(entity_id, 0)
+        
+        for start_id, end_id, relationship_type in created_relationships:
+            self.relationship_counts[relationship_type] += 1
+            # A self-loop adds two to the node's degree
+            self._set_degree(start_id, self._degrees.get(start_id, 0) + 1)
+            self._set_degree(end_id, self._degrees.get(end_id, 0) + 1)
+    
+    async def reconcile(self):
+        """Rebuild all statistics from a full scan of the graph.
+        
+        Writes applied while the scan runs are replayed onto its result
+        where the scan can't have seen them: entities it never read, and
+        edges to entities it had already read.
+        """
+        async with self._reconcile_lock:
+            await self._reconcile()
+    
+    async def _reconcile(self):
+        entity_counts: Counter = Counter()
+        degrees: Dict[str, int] = {}
+        self._scanned = degrees
+        self._applied_during_scan = applied = []
+        try:
+            async for row in self.backend.scan_entities(with_degree=True):
+                entity_counts[row["type"]] += 1
+                degrees[row["id"]] = row["degree"]
+            # Relationships created before this read are in its counts
+            counted = len(applied)
+            relationship_counts = Counter(await self.backend.relationship_type_counts())
+        finally:
+            self._scanned = None
+            self._applied_during_scan = None
+        
+        scanned = set(degrees)
+        for index, (created_entities, created_relationships) in enumerate(applied):
+            for entity_id, entity_type in created_entities:
+                if entity_id not in scanned:
+                    entity_counts[entity_type] += 1
+                    degrees.setdefault(entity_id, 0)
+            for start_id, end_id, relationship_type, start_scanned, end_scanned in created_relationships:
+                if index >= counted:
+                    relationship_counts[relationship_type] += 1
+                for entity_id, was_scanned in ((start_id, start_scanned), (end_id, end_scanned)):
+                    if was_scanned or entity_id not in scanned:
+                        degrees[entity_id] = degrees.get(entity_id, 0) + 1
+        
+        self.entity_counts = entity_counts
+        self.relationship_counts = relationship_counts
+        self.degree_histogram = Counter(degree_bucket(degree) for degree in degrees.values())
+        self._degrees = degrees
+        self.last_reconciled_at = datetime.now()
+        logger.info(f"Reconciled graph statistics: {len(degrees)} entities")
+    
+    def start_periodic_reconcile(self, interval: float):
+        """Reconcile every ``interval`` seconds in the background"""
+        async def run():
+            while True:
+                await asyncio.sleep(interval)
+                try:
+                    await self.reconcile()
+                except Exception as e:
+                    logger.warning(f"Graph statistics reconciliation failed: {e}")
+        
+        if self._reconcile_task is None:
+            self._reconcile_task = asyncio.create_task(run())
+    
+    async def stop(self):
+        if self._reconcile_task:
+            self._reconcile_task.cancel()
+            try:
+                await self._reconcile_task
+            except asyncio.CancelledError:
+                pass
+            self._reconcile_task = None
+    
+    def snapshot(self) -> Dict[str, Any]:
+        """Current statistics; constant time in the size of the graph"""
+        def bucket_key(bucket: str) -> int:
+            return int(bucket.split("-")[0])
+        
+        return {
+            "total_entities": sum(self.entity_counts.values()),
+            "total_relationships": sum(self.relationship_counts.values()),
+            "entity_types": sorted(self.entity_counts),
+            "entities_by_type": dict(self.entity_counts),
+            "relationships_by_type": dict(self.relationship_counts),
+            "degree_histogram": {bucket: self.degree_histogram[bucket]
+                                 for bucket in sorted(self.degree_histogram, key=bucket_key)},
+            "last_reconciled_at": self.last_reconciled_at
+        }
\ No newline at end of file
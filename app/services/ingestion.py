@@ -0,0 +1,157 @@
+from typing import Any, Callable, Dict, Iterable, Iterator, List, Optional, Tuple
+from datetime import datetime
+from .chat_agent import get_chat_agent, normalise_text
+from .knowledge_graph import get_kg_service
+from ..core.config import settings
+from ..models.schemas import IngestionReport
+import asyncio
+import json
+import logging
+import threading
+import time
+
+logger = logging.getLogger(__name__)
+
+_DONE = object()
+
+class BulkIngestor:
+    """Stream NDJSON documents through extraction and batched graph writes.
+    
+    Extraction runs in a producer thread (spaCy ``nlp.pipe`` with optional
+    worker processes) and hands chunks of documents to the event loop through a
+    bounded queue, so memory stays flat no matter how large the input is.
+    """
+    
+    def __init__(self, agent=None, service=None):
+        self.agent = agent or get_chat_agent()
+        self.service = service or get_kg_service()
+    
+    def iter_documents(self, lines: Iterable[Any], report: IngestionReport) -> Iterator[Tuple[str, Dict[str, Any]]]:
+        """Parse NDJSON lines into (text, metadata) pairs, skipping bad records"""
+        for line in lines:
+            if isinstance(line, bytes):
+                line = line.decode("utf-8", errors="replace")
+            line = line.strip()
+            if not line:
+                continue
+            try:
+                record = json.loads(line)
+            except json.JSONDecodeError:
+                report.skipped += 1
+                continue
+            if isinstance(record, str):
+                record = {"text": record}
+            if not isinstance(record, dict):
+                report.skipped += 1
+                continue
+            text = record.get("text") or record.get("message")
+            if not isinstance(text, str) or not text.strip():
+                report.skipped += 1
+                continue
+            yield text, record
+    
+    def iter_extractions(self, documents: Iterable[Tuple[str, Dict[str, Any]]], nlp_batch_size: int,
+                         n_process: int) -> Iterator[Tuple[str, Dict[str, Any], List[Dict[str, Any]], List[Dict[str, Any]]]]:
+        """Yield (text, metadata, entities, relationships) for every document"""
+        if self.agent.nlp:
+            docs = self.agent.nlp.pipe(documents, as_tuples=True, batch_size=nlp_batch_size, n_process=n_process)
+            for doc, record in docs:
+                yield (doc.text, record, *self.agent.extractions_from_doc(doc))
+        else:
+            for text, record in documents:
+                # extract() offsets refer to the normalised text
+                yield (normalise_text(text), record, *self.agent.extract(text))
+    
+    def _build_chunk(self, extractions: Iterator, chunk_size: int, ingested_at: str) -> Optional[Dict[str, Any]]:
+        entity_writes, relationship_writes, mentions = [], [], []
+        documents = 0
+        for text, record, entities, relationships in extractions:
+            created, doc_entities, doc_relationships = self.agent.build_graph_writes(
+                entities, relationships,
+                {"source": record.get("source", "bulk"), "extracted_at": record.get("timestamp", ingested_at)},
+                self.service.entity_index
+            )
+            entity_writes.extend(doc_entities)
+            relationship_writes.extend(doc_relationships)
+            mentions.extend(self.agent.mention_contexts(text, entities, created))
+            documents += 1
+            if documents >= chunk_size:
+                break
+        if not documents:
+            return None
+        return {"documents": documents, "entities": entity_writes, "relationships": relationship_writes,
+                "mentions": mentions}
+    
+    async def ingest(self, lines: Iterable[Any], nlp_batch_size: int = None, n_process: int = None,
+                     write_batch_size: int = None,
+                     progress: Callable[[IngestionReport], None] = None) -> IngestionReport:
+        """Ingest an iterable of NDJSON lines and return throughput figures.
+        
+        ``lines`` is consumed lazily from a worker thread, so it may be a file
+        object or any other blocking iterator.
+        """
+        nlp_batch_size = nlp_batch_size or settings.INGEST_NLP_BATCH_SIZE
+        n_process = n_process or settings.INGEST_N_PROCESS
+        write_batch_size = write_batch_size or settings.INGEST_WRITE_BATCH_SIZE
+        
+        report = IngestionReport()
+        loop = asyncio.get_running_loop()
+        queue: asyncio.Queue = asyncio.Queue(maxsize=settings.INGEST_QUEUE_SIZE)
+        stop = threading.Event()
+        ingested_at = datetime.now().isoformat()
+        
+        def produce():
+            try:
+                extractions = self.iter_extractions(
+                    self.iter_documents(lines, report), nlp_batch_size, n_process
+                )
+                while not stop.is_set():
+                    chunk = self._build_chunk(extractions, write_batch_size, ingested_at)
+                    if chunk is None:
+                        break
+                    # Blocks while the writer is behind, which bounds memory use
+                    asyncio.run_coroutine_threadsafe(queue.put(chunk), loop).result()
+            except BaseException as e:
+                asyncio.run_coroutine_threadsafe(queue.put(e), loop).result()
+            finally:
+                asyncio.run_coroutine_threadsafe(queue.put(_DONE), loop).result()
+        
+        started = time.perf_counter()
+        producer = loop.run_in_executor(None, produce)
+        try:
+            while True:
+                chunk = await queue.get()
+                if chunk is _DONE:
+                    break
+                if isinstance(chunk, BaseException):
+                    raise chunk
+                _, created = await self.service.upsert_batch(chunk["entities"], chunk["relationships"])
+                self.service.similarity.add_mentions(chunk["mentions"])
+                report.documents += chunk["documents"]
+                report.entities += len(chunk["entities"])
+                report.relationships += len(created)
+                report.seconds = time.perf_counter() - started
+                report.docs_per_second = report.documents / report.seconds if report.seconds else 0.0
+                logger.info(
+                    f"Ingested {report.documents} documents "
+                    f"({report.docs_per_second:.1f} docs/sec, {report.skipped} skipped)"
+                )
+                if progress:
+                    progress(report)
+        finally:
+            stop.set()
+            # Unblock a producer waiting on a full queue so the thread can exit
+            while not producer.done():
+                try:
+                    queue.get_nowait()
+                except asyncio.QueueEmpty:
+                    await asyncio.sleep(0.01)
+            await producer
+        
+        report.seconds = time.perf_counter() - started
+        report.docs_per_second = report.documents / report.seconds if report.seconds else 0.0
+        return report
+
+def get_bulk_ingestor(tenant_id: Optional[str] = None) -> BulkIngestor:
+    """Ingestor writing into a tenant's graph (the default tenant if None)"""
+    return BulkIngestor(service=get_kg_service(tenant_id))
\ No newline at end of file
@@ -1,146 +1,654 @@
-from typing import List, Dict, Any, Tuple
-from ..core.database import db
-from ..models.schemas import KnowledgeGraphNode, KnowledgeGraphRelationship, KnowledgeGraphResponse
+from typing import List, Dict, Any, Tuple, AsyncIterator, Optional
+from collections import OrderedDict
+from contextlib import contextmanager
+from .backends import GraphBackend, close_graph_backend, entity_labels, get_graph_backend
+from .entity_index import EntityResolutionIndex
+from .extraction import extraction_engine
+from .graph_analytics import GraphAnalytics
+from .graph_codec import GraphSnapshot
+from .graph_events import GraphEventBroadcaster
+from .graph_stats import GraphStats
+from .similarity import EntitySimilarityIndex
+from ..core.cache import LRUCache, TaggedLRUCache
+from ..core.config import settings
+from ..core.tenants import tenant_path
+from ..models.schemas import KnowledgeGraphResponse
+import asyncio
 import logging
+import re
 
 logger = logging.getLogger(__name__)
 
+RELATIONSHIP_TYPE_PATTERN = re.compile(r"[A-Z][A-Z0-9_]*")
+NEIGHBOURHOOD_DIRECTIONS = ("out", "in", "both")
+
+def writable_relationship_type(relationship_type: str) -> bool:
+    """True for types with a registered verb or listed in RELATIONSHIP_TYPES"""
+    return relationship_type in settings.RELATIONSHIP_TYPES or relationship_type in extraction_engine.relationship_types
+
 class KnowledgeGraphService:
-    def __init__(self):
-        self.initialize_constraints()
-    
-    def initialize_constraints(self):
-        """Initialize database constraints and indexes"""
-        queries = [
-            "CREATE CONSTRAINT IF NOT EXISTS FOR (n:Entity) REQUIRE n.id IS UNIQUE",
-            "CREATE CONSTRAINT IF NOT EXISTS FOR (n:Concept) REQUIRE n.id IS UNIQUE",
-            "CREATE CONSTRAINT IF NOT EXISTS FOR (n:Note) REQUIRE n.id IS UNIQUE",
-            "CREATE INDEX IF NOT EXISTS FOR (n:Entity) ON (n.name)",
-            "CREATE INDEX IF NOT EXISTS FOR (n:Concept) ON (n.name)",
-        ]
-        
-        for query in queries:
-            try:
-                db.execute_query(query)
-            except Exception as e:
-                logger.warning(f"Failed to execute constraint query: {e}")
+    """Graph operations for one tenant, with that tenant's caches, statistics and indexes"""
     
-    def create_entity(self, name: str, entity_type: str, properties: Dict[str, Any] = None) -> str:
-        """Create a new entity in the knowledge graph"""
-        if properties is None:
-            properties = {}
-        
-        entity_id = f"{entity_type}_{name}".replace(" ", "_").lower()
-        properties.update({
-            "id": entity_id,
-            "name": name,
-            "type": entity_type,
-            "created_at": "datetime()"
-        })
-        
-        query = f"""
-        MERGE (e:Entity::{entity_type} {{id: $id}})
-        SET e += $properties
-        RETURN e.id as id
-        """
+    def __init__(self, backend: GraphBackend = None, tenant_id: Optional[str] = None):
+        self.tenant_id = tenant_id or settings.DEFAULT_TENANT_ID
+        self.backend = backend or get_graph_backend(self.tenant_id)
+        # Bumped on every successful write in this process; numbers live updates
+        self.graph_version = 0
+        self._snapshot_cache = LRUCache(maxsize=settings.GRAPH_SNAPSHOT_CACHE_SIZE)
+        self.not_modified_responses = 0
+        # Latest durable change sequence known to this process: raised by its own writes and
+        # re-read every GRAPH_SEQUENCE_REFRESH_INTERVAL seconds and on a snapshot cache miss
+        self.sequence: Optional[int] = None
+        self._sequence_task: Optional[asyncio.Task] = None
+        self.stats = GraphStats(self.backend)
+        self.entity_index = EntityResolutionIndex(self.backend, settings.ENTITY_INDEX_MAX_SIZE)
+        self.events = GraphEventBroadcaster(settings.GRAPH_EVENTS_WINDOW, settings.GRAPH_EVENTS_QUEUE_SIZE)
+        self.analytics = GraphAnalytics(self.backend, settings.ANALYTICS_EXECUTOR)
+        self.similarity = EntitySimilarityIndex(self.backend, tenant_path(settings.SIMILARITY_DIR, self.tenant_id))
+        # Neighbourhoods are tagged with the ids of the nodes they were built from
+        self._neighbourhood_cache = TaggedLRUCache(maxsize=settings.NEIGHBOURHOOD_CACHE_SIZE)
+        self.schema_ready = False
+        self._warm_up_task: Optional[asyncio.Task] = None
+        # Requests, sockets and queued writes using the service; only idle services are evicted
+        self.leases = 0
+    
+    @contextmanager
+    def lease(self):
+        """Keep the service from being evicted while the block runs"""
+        self.leases += 1
+        try:
+            yield self
+        finally:
+            self.leases -= 1
+    
+    async def initialize_constraints(self):
+        """Initialize database constraints and indexes (once per process)"""
+        if self.schema_ready:
+            return
+        self.schema_ready = await self.backend.initialize()
+    
+    def _record_write(self, nodes: List[Dict[str, Any]], relationships: List[Dict[str, Any]],
+                      created_entities: List[Tuple[str, str]], created_relationships: List[Tuple[str, str, str]]):
+        """Update derived state after a write: caches, statistics, name and similarity indexes, analytics and live deltas.
         
-        result = db.execute_query(query, {"id": entity_id, "properties": properties})
-        return result[0]["id"] if result else entity_id
+        ``nodes`` and ``relationships`` are everything the write touched, in the
+        shape of the graph snapshot; the ``created_*`` tuples are the new items only.
+        """
+        self.graph_version += 1
+        self._snapshot_cache.clear()
+        if nodes or relationships:
+            self._observe_sequence(max(item["properties"]["seq"] for item in nodes + relationships))
+        self.stats.apply(created_entities, created_relationships)
+        self._neighbourhood_cache.invalidate(
+            [node["id"] for node in nodes]
+            + [rel["start_node_id"] for rel in relationships]
+            + [rel["end_node_id"] for rel in relationships]
+        )
+        for node in nodes:
+            properties = node["properties"]
+            aliases = properties.get("aliases")
+            self.entity_index.add(properties["id"], properties["name"], aliases if isinstance(aliases, list) else [])
+        self.similarity.observe(nodes)
+        self.analytics.apply(nodes, relationships)
+        self.events.publish(self.graph_version, nodes, relationships)
     
-    def create_relationship(self, start_entity: str, end_entity: str, 
-                          relationship_type: str, properties: Dict[str, Any] = None) -> bool:
-        """Create a relationship between two entities"""
-        if properties is None:
-            properties = {}
+    async def reload_derived_state(self):
+        """Rebuild caches, statistics, name and similarity indexes and analytics from the backend.
         
-        properties["created_at"] = "datetime()"
+        For bulk loads that write through the backend directly rather than
+        through ``upsert_batch``.
+        """
+        self.graph_version += 1
+        self._snapshot_cache.clear()
+        self._neighbourhood_cache.clear()
+        await self.refresh_sequence()
+        await self.stats.reconcile()
+        await self.entity_index.warm()
+        if self.similarity.state == "ready":
+            await self.similarity.load()
+        if settings.ANALYTICS_ENABLED:
+            await self.analytics.load()
+            self.analytics.refresh()
+        self.events.resync(self.graph_version)
+    
+    async def warm_up(self):
+        """Load statistics, indexes and analytics and start periodic work, once.
         
-        query = f"""
-        MATCH (a:Entity {{id: $start_id}})
-        MATCH (b:Entity {{id: $end_id}})
-        MERGE (a)-[r:{relationship_type}]->(b)
-        SET r += $properties
-        RETURN r
+        app.main does this piece by piece for the default tenant at startup;
+        other tenants are warmed on their first request, which waits for it.
         """
+        if self._warm_up_task is None:
+            self._warm_up_task = asyncio.create_task(self._warm_up())
+        await asyncio.shield(self._warm_up_task)
+    
+    async def _warm_up(self):
+        try:
+            await self.stats.reconcile()
+            await self.entity_index.warm()
+            if settings.SIMILARITY_ENABLED:
+                await self.similarity.load()
+            if settings.ANALYTICS_ENABLED:
+                await self.analytics.load()
+                self.analytics.refresh()
+        except Exception as e:
+            logger.warning(f"Warm-up of tenant {self.tenant_id} failed: {e}")
+        self.start_periodic_tasks()
+    
+    def start_periodic_tasks(self):
+        if settings.GRAPH_SEQUENCE_REFRESH_INTERVAL > 0 and self._sequence_task is None:
+            self._sequence_task = asyncio.create_task(self._refresh_sequence_periodically())
+        if settings.STATS_RECONCILE_INTERVAL > 0:
+            self.stats.start_periodic_reconcile(settings.STATS_RECONCILE_INTERVAL)
+        if settings.ANALYTICS_ENABLED and settings.ANALYTICS_REFRESH_INTERVAL > 0:
+            self.analytics.start_periodic_refresh(settings.ANALYTICS_REFRESH_INTERVAL)
+    
+    async def close(self):
+        """Stop background work and persist the similarity index"""
+        if self._warm_up_task is not None:
+            self._warm_up_task.cancel()
+        if self._sequence_task is not None:
+            self._sequence_task.cancel()
+        await self.stats.stop()
+        await self.analytics.stop()
+        await self.similarity.close()
+    
+    def resolve_entity(self, reference: str) -> str:
+        """Map an entity name, alias or id to its id without a database round trip.
         
+        Unknown references are returned unchanged so callers can still pass raw ids.
+        """
+        return self.entity_index.resolve(reference) or reference
+    
+    @staticmethod
+    def make_entity_id(name: str, entity_type: str) -> str:
+        """Derive the stable entity id used as the MERGE key"""
+        return f"{entity_type}_{name}".replace(" ", "_").lower()
+    
+    async def create_entity(self, name: str, entity_type: str, properties: Dict[str, Any] = None) -> str:
+        """Create a new entity in the knowledge graph"""
+        return (await self.upsert_entities_batch([
+            {"name": name, "type": entity_type, "properties": properties}
+        ]))[0]
+    
+    async def create_relationship(self, start_entity: str, end_entity: str, 
+                          relationship_type: str, properties: Dict[str, Any] = None) -> bool:
+        """Create a relationship between two entities"""
         try:
-            result = db.execute_query(query, {
-                "start_id": start_entity,
-                "end_id": end_entity,
+            created = await self.upsert_relationships_batch([{
+                "start_entity": self.resolve_entity(start_entity),
+                "end_entity": self.resolve_entity(end_entity),
+                "type": relationship_type,
                 "properties": properties
-            })
-            return len(result) > 0
+            }])
+            return len(created) > 0
+        except ValueError:
+            raise
         except Exception as e:
             logger.error(f"Failed to create relationship: {e}")
             return False
     
-    def get_knowledge_graph(self, limit: int = 100) -> KnowledgeGraphResponse:
-        """Get the current knowledge graph structure"""
-        # Get nodes
-        nodes_query = """
-        MATCH (n:Entity)
-        RETURN id(n) as node_id, n.id as id, labels(n) as labels, properties(n) as properties
-        LIMIT $limit
+    async def upsert_entities_batch(self, entities: List[Dict[str, Any]]) -> List[str]:
+        """Create or update many entities in a single transaction.
+        
+        Each entity is a dict with ``name``, ``type`` and optional ``properties``.
+        Returns the entity ids in input order.
+        """
+        entity_ids, _ = await self.upsert_batch(entities, [])
+        return entity_ids
+    
+    async def upsert_relationships_batch(self, relationships: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        """Create or update many relationships in a single transaction.
+        
+        Each relationship is a dict with ``start_entity``, ``end_entity``, ``type``
+        and optional ``properties``. Returns the relationships whose endpoints exist.
         """
+        _, created = await self.upsert_batch([], relationships)
+        return created
+    
+    @staticmethod
+    def _change_stamps(record: Dict[str, Any]) -> Dict[str, Any]:
+        return {"created_at": record["created_at"], "updated_at": record["updated_at"], "seq": record["seq"]}
+    
+    async def upsert_batch(self, entities: List[Dict[str, Any]], 
+                     relationships: List[Dict[str, Any]]) -> Tuple[List[str], List[Dict[str, Any]]]:
+        """Write entities and relationships together in one transaction.
         
-        # Get relationships
-        relationships_query = """
-        MATCH (a:Entity)-[r]->(b:Entity)
-        RETURN id(r) as rel_id, type(r) as type, 
-               a.id as start_node_id, b.id as end_node_id, 
-               properties(r) as properties
-        LIMIT $limit
+        Rows are grouped by label and relationship type, so the number of
+        backend statements depends on the distinct types in the batch, not on its size.
         """
+        entity_ids = []
+        entity_rows: Dict[str, Dict[str, Dict[str, Any]]] = {}
+        for entity in entities:
+            entity_id = self.make_entity_id(entity["name"], entity["type"])
+            entity_ids.append(entity_id)
+            properties = dict(entity.get("properties") or {})
+            properties.update({
+                "id": entity_id,
+                "name": entity["name"],
+                "type": entity["type"]
+            })
+            entity_rows.setdefault(entity["type"], {})[entity_id] = {"id": entity_id, "properties": properties}
         
-        nodes_result = db.execute_query(nodes_query, {"limit": limit})
-        relationships_result = db.execute_query(relationships_query, {"limit": limit})
+        # Identical edges within a batch are merged once and report every input index
+        relationship_rows: Dict[str, Dict[Tuple[str, str], Dict[str, Any]]] = {}
+        for idx, rel in enumerate(relationships):
+            if not writable_relationship_type(rel["type"]):
+                raise ValueError(f"Unknown relationship type: {rel['type']!r} (add it to RELATIONSHIP_TYPES)")
+            properties = dict(rel.get("properties") or {})
+            key = (rel["start_entity"], rel["end_entity"])
+            row = relationship_rows.setdefault(rel["type"], {}).setdefault(key, {
+                "idxs": [],
+                "start_id": rel["start_entity"],
+                "end_id": rel["end_entity"],
+                "properties": {}
+            })
+            row["idxs"].append(idx)
+            row["properties"].update(properties)
         
-        nodes = [
-            KnowledgeGraphNode(
-                id=node["id"],
-                labels=node["labels"],
-                properties=node["properties"]
-            )
-            for node in nodes_result
+        if not entity_rows and not relationship_rows:
+            return entity_ids, []
+        
+        entity_results, relationship_results = await self.backend.upsert(
+            {label: list(rows.values()) for label, rows in entity_rows.items()},
+            {relationship_type: list(rows.values()) for relationship_type, rows in relationship_rows.items()}
+        )
+        
+        created_entities = [
+            (record["id"], label)
+            for label, result in entity_results.items()
+            for record in result
+            if record["created"]
+        ]
+        created_relationships = []
+        written_relationships = []
+        matched = []
+        for relationship_type, result in relationship_results.items():
+            for record in result:
+                matched.extend(record["idxs"])
+                rel = relationships[record["idxs"][0]]
+                row = relationship_rows[relationship_type][(rel["start_entity"], rel["end_entity"])]
+                written_relationships.append({
+                    "id": str(record["rel_id"]),
+                    "type": relationship_type,
+                    "start_node_id": row["start_id"],
+                    "end_node_id": row["end_id"],
+                    "properties": {**row["properties"], **self._change_stamps(record)}
+                })
+                if record["created"]:
+                    created_relationships.append((rel["start_entity"], rel["end_entity"], relationship_type))
+        written_nodes = [
+            {"id": record["id"], "labels": entity_labels(label),
+             "properties": {**entity_rows[label][record["id"]]["properties"], **self._change_stamps(record)}}
+            for label, result in entity_results.items()
+            for record in result
         ]
+        self._record_write(
+            written_nodes,
+            written_relationships,
+            created_entities,
+            created_relationships
+        )
         
-        relationships = [
-            KnowledgeGraphRelationship(
-                id=str(rel["rel_id"]),
-                type=rel["type"],
-                start_node_id=rel["start_node_id"],
-                end_node_id=rel["end_node_id"],
-                properties=rel["properties"]
-            )
-            for rel in relationships_result
+        created = [
+            {
+                "start_entity": relationships[idx]["start_entity"],
+                "end_entity": relationships[idx]["end_entity"],
+                "type": relationships[idx]["type"]
+            }
+            for idx in sorted(matched)
         ]
+        return entity_ids, created
+    
+    def snapshot_etag(self, limit: int, sequence: int, wire_format: str = "json") -> str:
+        """ETag for the graph snapshot in a wire format at a change sequence.
         
-        return KnowledgeGraphResponse(nodes=nodes, relationships=relationships)
+        The sequence is the backend's durable counter, so every worker (and
+        every process writing to the same graph) tags the same graph alike.
+        """
+        suffix = "" if wire_format == "json" else f"-{wire_format}"
+        return f'W/"kg-{self.tenant_id}-{self.backend.sequence_epoch()}{sequence}-{limit}{suffix}"'
+    
+    def snapshot_cache_stats(self) -> Dict[str, Any]:
+        return {
+            "graph_version": self.graph_version,
+            "sequence": self.sequence,
+            "not_modified_responses": self.not_modified_responses,
+            **self._snapshot_cache.stats()
+        }
+    
+    def _observe_sequence(self, sequence: int):
+        # Never lowered: a slow read may return after a newer local write
+        self.sequence = sequence if self.sequence is None else max(self.sequence, sequence)
+    
+    async def refresh_sequence(self) -> int:
+        """Read the durable change sequence, which also counts other workers' writes"""
+        self._observe_sequence(await self.backend.current_sequence())
+        return self.sequence
+    
+    async def _refresh_sequence_periodically(self):
+        while True:
+            await asyncio.sleep(settings.GRAPH_SEQUENCE_REFRESH_INTERVAL)
+            try:
+                await self.refresh_sequence()
+            except Exception as e:
+                logger.warning(f"Change sequence refresh of tenant {self.tenant_id} failed: {e}")
+    
+    async def current_sequence(self) -> int:
+        """Change sequence to tag the snapshot with, usually without a backend read.
+        
+        Writes through this process are counted at once; writes by other
+        workers, the CLI or a restore once the background refresh sees them,
+        within GRAPH_SEQUENCE_REFRESH_INTERVAL seconds. With an interval of 0
+        the durable sequence is read every time.
+        """
+        if self.sequence is None or settings.GRAPH_SEQUENCE_REFRESH_INTERVAL <= 0:
+            return await self.refresh_sequence()
+        return self.sequence
+    
+    async def get_snapshot(self, limit: int = 100, sequence: Optional[int] = None) -> GraphSnapshot:
+        """Backend rows of the current graph, with their encoded bodies cached alongside.
+        
+        ``sequence`` is the change sequence the caller tagged the response
+        with, if any; the cached snapshot at that sequence is served without a
+        backend read. Otherwise (or on a cache miss) the durable sequence is
+        read again, and the snapshot's cursor is the one to tag it with.
+        """
+        cached = self._snapshot_cache.get(limit)
+        if sequence is not None and cached and cached.cursor == sequence:
+            return cached
+        sequence = await self.refresh_sequence()
+        if cached and cached.cursor == sequence:
+            return cached
+        
+        # Sequence read first, so a write racing with the snapshot is sent again rather than missed
+        nodes, relationships = await self.backend.snapshot(limit)
+        snapshot = GraphSnapshot(self.graph_version, nodes, relationships, sequence)
+        self._snapshot_cache.set(limit, snapshot)
+        return snapshot
     
-    def search_entities(self, query: str, limit: int = 10) -> List[Dict[str, Any]]:
-        """Search for entities in the knowledge graph"""
-        search_query = """
-        MATCH (n:Entity)
-        WHERE n.name CONTAINS $query OR any(prop in keys(n) WHERE n[prop] CONTAINS $query)
-        RETURN n.id as id, n.name as name, n.type as type, properties(n) as properties
-        LIMIT $limit
+    async def get_changes(self, since: int, limit: int = 100) -> GraphSnapshot:
+        """Nodes and relationships written after the ``since`` cursor, oldest first.
+        
+        At most ``limit`` items in total. The snapshot's cursor is the seq of
+        the last item returned (or ``since`` when nothing changed), so passing
+        it back continues where this left off without skipping anything.
         """
+        nodes, relationships = await self.backend.changes(since, limit)
+        changed = sorted(
+            [(node["properties"]["seq"], "node", node) for node in nodes]
+            + [(rel["properties"]["seq"], "relationship", rel) for rel in relationships],
+            key=lambda item: item[0]
+        )[:limit]
+        return GraphSnapshot(
+            self.graph_version,
+            [item for _, kind, item in changed if kind == "node"],
+            [item for _, kind, item in changed if kind == "relationship"],
+            changed[-1][0] if changed else since
+        )
+    
+    async def get_knowledge_graph(self, limit: int = 100, since: Optional[int] = None) -> KnowledgeGraphResponse:
+        """Get the current knowledge graph structure, or only what changed after ``since``"""
+        if since is not None:
+            return (await self.get_changes(since, limit)).response()
+        return (await self.get_snapshot(limit)).response()
+    
+    async def export_graph(self, page_size: int = 1000, consistent: bool = False,
+                           limit: Optional[int] = None) -> AsyncIterator[Dict[str, Any]]:
+        """Stream the whole graph as node and relationship records.
+        
+        Pages are walked with a keyset cursor on the unique ``id`` so the cost
+        per page stays flat. By default all nodes are emitted before all edges.
+        In consistent mode each edge follows the page containing its later
+        endpoint, so any prefix of the stream (e.g. when ``limit`` caps the
+        node count) only contains edges whose endpoints were already sent.
+        """
+        node_count = 0
+        after = ""
+        while limit is None or node_count < limit:
+            size = page_size if limit is None else min(page_size, limit - node_count)
+            page_ids = []
+            async for node in self.backend.iter_nodes(after, size):
+                page_ids.append(node["id"])
+                yield {"kind": "node", **node}
+            if not page_ids:
+                break
+            node_count += len(page_ids)
+            after = page_ids[-1]
+            
+            if consistent:
+                async for rel in self._stream_page_relationships(page_ids, page_size):
+                    yield rel
+            
+            if len(page_ids) < size:
+                break
+        
+        if consistent:
+            return
+        
+        # Edges are paged by their start node; one record carries all of its edges
+        after = ""
+        while True:
+            rows = 0
+            async for row in self.backend.iter_outgoing(after, page_size):
+                rows += 1
+                after = row["start_node_id"]
+                for rel in row["relationships"]:
+                    yield {
+                        "kind": "relationship",
+                        "id": str(rel["rel_id"]),
+                        "type": rel["type"],
+                        "start_node_id": row["start_node_id"],
+                        "end_node_id": rel["end_node_id"],
+                        "properties": rel["properties"]
+                    }
+            if rows < page_size:
+                break
+    
+    async def _stream_page_relationships(self, page_ids: List[str], fetch_size: int) -> AsyncIterator[Dict[str, Any]]:
+        """Edges whose later endpoint (by id) is in the page; each edge is emitted once"""
+        async for rel in self.backend.iter_page_relationships(page_ids, fetch_size):
+            yield {
+                "kind": "relationship",
+                "id": str(rel.pop("rel_id")),
+                **rel
+            }
+    
+    async def search_entities(self, query: str, limit: int = 10, offset: int = 0) -> List[Dict[str, Any]]:
+        """Search for entities in the knowledge graph, best matches first"""
+        return await self.backend.search(query, limit, offset)
+    
+    async def get_neighbourhood(self, entity_id: str, depth: int = 1, direction: str = "both",
+                                relationship_types: Optional[List[str]] = None, fan_out: int = 100,
+                                limit: int = 100, offset: int = 0) -> Optional[Dict[str, Any]]:
+        """Entities within ``depth`` hops of an entity, nearest first, one page at a time.
         
-        return db.execute_query(search_query, {"query": query, "limit": limit})
-    
-    def get_entity_connections(self, entity_id: str) -> Dict[str, Any]:
-        """Get all connections for a specific entity"""
-        query = """
-        MATCH (e:Entity {id: $entity_id})
-        OPTIONAL MATCH (e)-[r1]->(connected)
-        OPTIONAL MATCH (connected2)-[r2]->(e)
-        RETURN e as entity,
-               collect(DISTINCT {relationship: r1, connected: connected, direction: 'outgoing'}) as outgoing,
-               collect(DISTINCT {relationship: r2, connected: connected2, direction: 'incoming'}) as incoming
+        Each hop is one backend call that expands every frontier node
+        separately, capped at ``fan_out`` edges, so a hub never produces an
+        outgoing x incoming cross product. The whole neighbourhood is
+        cached per (entity, depth, direction, types, fan_out) and dropped
+        when any node in it is written or gains an edge. Returns None if the
+        entity does not exist.
         """
+        if direction not in NEIGHBOURHOOD_DIRECTIONS:
+            raise ValueError(f"direction must be one of {', '.join(NEIGHBOURHOOD_DIRECTIONS)}")
+        types = sorted(set(relationship_types or []))
+        for relationship_type in types:
+            if not RELATIONSHIP_TYPE_PATTERN.fullmatch(relationship_type):
+                raise ValueError(f"Invalid relationship type: {relationship_type!r}")
+        depth = max(1, min(depth, settings.NEIGHBOURHOOD_MAX_DEPTH))
+        
+        key = (entity_id, depth, direction, tuple(types), fan_out)
+        neighbourhood = self._neighbourhood_cache.get(key)
+        if neighbourhood is None:
+            neighbourhood = await self._expand_neighbourhood(entity_id, depth, direction, types, fan_out)
+            if neighbourhood is None:
+                return None
+            self._neighbourhood_cache.set(
+                key, neighbourhood, [entity_id, *(node["id"] for node in neighbourhood["neighbours"])]
+            )
+        
+        page = neighbourhood["neighbours"][offset:offset + limit]
+        page_ids = {entity_id, *(node["id"] for node in page)}
+        total = len(neighbourhood["neighbours"])
+        return {
+            "entity": neighbourhood["entity"],
+            "depth": depth,
+            "direction": direction,
+            "relationship_types": types,
+            "neighbours": page,
+            "relationships": [
+                rel for rel in neighbourhood["relationships"]
+                if rel["start_node_id"] in page_ids and rel["end_node_id"] in page_ids
+            ],
+            "total_neighbours": total,
+            "truncated": neighbourhood["truncated"],
+            "next_offset": offset + limit if offset + limit < total else None
+        }
+    
+    async def _expand_neighbourhood(self, entity_id: str, depth: int, direction: str,
+                                    types: List[str], fan_out: int) -> Optional[Dict[str, Any]]:
+        """Breadth-first expansion, one round trip per hop"""
+        root = await self.backend.get_entity(entity_id)
+        if root is None:
+            return None
         
-        result = db.execute_query(query, {"entity_id": entity_id})
-        return result[0] if result else {}
+        visited = {entity_id}
+        neighbours: List[Dict[str, Any]] = []
+        relationships: Dict[int, Dict[str, Any]] = {}
+        frontier = [entity_id]
+        truncated = False
+        for hop in range(1, depth + 1):
+            if not frontier:
+                break
+            next_frontier = []
+            for row in await self.backend.expand(frontier, direction, types, fan_out):
+                relationships[row["rel_id"]] = {
+                    "id": str(row["rel_id"]),
+                    "type": row["type"],
+                    "start_node_id": row["start_node_id"],
+                    "end_node_id": row["end_node_id"],
+                    "properties": row["rel_properties"]
+                }
+                if row["id"] in visited:
+                    continue
+                if len(visited) > settings.NEIGHBOURHOOD_MAX_NODES:
+                    truncated = True
+                    continue
+                visited.add(row["id"])
+                neighbours.append({"id": row["id"], "labels": row["labels"], "properties": row["properties"], "hop": hop})
+                next_frontier.append(row["id"])
+            frontier = next_frontier
+        
+        return {
+            "entity": {"id": entity_id, **root},
+            "neighbours": neighbours,
+            "relationships": [
+                rel for rel in relationships.values()
+                if rel["start_node_id"] in visited and rel["end_node_id"] in visited
+            ],
+            "truncated": truncated
+        }
+    
+    async def get_entity_connections(self, entity_id: str) -> Dict[str, Any]:
+        """Direct connections in the original GET /api/kg/entity/{id} shape, from the cached neighbourhood.
+        
+        Nodes are property maps and each relationship is a
+        ``[start properties, type, end properties]`` triple, as the Neo4j
+        driver rendered them. Capped at the default ``fan_out`` of 100 edges;
+        an unknown entity gives an empty dict.
+        """
+        neighbourhood = await self.get_neighbourhood(entity_id, limit=settings.NEIGHBOURHOOD_MAX_NODES)
+        if neighbourhood is None:
+            return {}
+        entity = neighbourhood["entity"]["properties"]
+        properties = {node["id"]: node["properties"] for node in neighbourhood["neighbours"]}
+        properties[entity_id] = entity
+        connections = {"entity": entity, "outgoing": [], "incoming": []}
+        for rel in neighbourhood["relationships"]:
+            triple = [properties[rel["start_node_id"]], rel["type"], properties[rel["end_node_id"]]]
+            # A self-loop is both
+            if rel["start_node_id"] == entity_id:
+                connections["outgoing"].append({"relationship": triple, "connected": triple[2], "direction": "outgoing"})
+            if rel["end_node_id"] == entity_id:
+                connections["incoming"].append({"relationship": triple, "connected": triple[0], "direction": "incoming"})
+        return connections
+    
+    def neighbourhood_cache_stats(self) -> Dict[str, Any]:
+        return self._neighbourhood_cache.stats()
+
+class TenantLimitError(Exception):
+    """MAX_TENANTS tenants are loaded in this process and all of them are in use"""
+
+# Least recently used first
+_services: "OrderedDict[str, KnowledgeGraphService]" = OrderedDict()
+_retiring: Dict[str, asyncio.Task] = {}
+
+def _evict_idle() -> Optional[KnowledgeGraphService]:
+    """Unload the least recently used tenant nobody is using (never the default tenant)"""
+    for tenant_id, service in _services.items():
+        if tenant_id != settings.DEFAULT_TENANT_ID and service.leases == 0:
+            del _services[tenant_id]
+            return service
+    return None
+
+async def _retire(service: KnowledgeGraphService):
+    await service.close()
+    # The tenant may have been loaded again meanwhile, with this same backend;
+    # an in-memory backend is kept, since it holds the only copy of the graph
+    if service.tenant_id not in _services and service.backend.persistent:
+        await close_graph_backend(service.tenant_id)
+    logger.info(f"Unloaded idle tenant {service.tenant_id}")
+
+def get_kg_service(tenant_id: Optional[str] = None) -> KnowledgeGraphService:
+    """Service for one tenant (DEFAULT_TENANT_ID if None), created on first use.
+    
+    At most MAX_TENANTS services are kept; loading another one unloads the
+    least recently used idle tenant, and fails only when every one is leased.
+    """
+    tenant_id = tenant_id or settings.DEFAULT_TENANT_ID
+    service = _services.get(tenant_id)
+    if service is not None:
+        _services.move_to_end(tenant_id)
+        return service
+    
+    if len(_services) >= settings.MAX_TENANTS:
+        evicted = _evict_idle()
+        if evicted is None:
+            raise TenantLimitError(f"{settings.MAX_TENANTS} tenants are loaded and in use (MAX_TENANTS)")
+        try:
+            task = asyncio.get_running_loop().create_task(_retire(evicted))
+        except RuntimeError:
+            # Outside the event loop nothing runs in the background, so there is nothing to stop
+            pass
+        else:
+            _retiring[evicted.tenant_id] = task
+            task.add_done_callback(lambda _, tenant=evicted.tenant_id: _retiring.pop(tenant, None))
+    service = _services[tenant_id] = KnowledgeGraphService(tenant_id=tenant_id)
+    return service
+
+async def get_warm_kg_service(tenant_id: Optional[str] = None) -> KnowledgeGraphService:
+    """get_kg_service for request handling: a tenant's first request waits for its warm-up.
+    
+    The default tenant is warmed by app.main at startup while requests are
+    already served. Lease the returned service before the next await.
+    """
+    retiring = _retiring.get(tenant_id or settings.DEFAULT_TENANT_ID)
+    if retiring is not None:
+        # Let an unloading copy of this tenant finish writing before it is loaded again
+        await asyncio.shield(retiring)
+    service = get_kg_service(tenant_id)
+    if service.tenant_id != settings.DEFAULT_TENANT_ID:
+        with service.lease():
+            await service.warm_up()
+    return service
+
+def active_kg_services() -> List[KnowledgeGraphService]:
+    """Services of every tenant currently loaded in this process"""
+    return list(_services.values())
 
-# Global service instance
-kg_service = KnowledgeGraphService()
\ No newline at end of file
+async def close_kg_services():
+    for task in list(_retiring.values()):
+        await task
+    while _services:
+        _, service = _services.popitem()
+        await service.close()
@@ -0,0 +1,462 @@
+from typing import List, Dict, Any, Optional, Tuple
+from pathlib import Path
+from ..core.config import settings
+import asyncio
+import json
+import logging
+import os
+import time
+import unicodedata
+import zlib
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+# Mentions queued while the index loads; beyond this they are dropped (names are still found by the next load)
+MAX_PENDING = 100_000
+DRAIN_BATCH_SIZE = 1024
+LOAD_BATCH_SIZE = 4096
+
+def normalise(vector: np.ndarray) -> np.ndarray:
+    norm = float(np.linalg.norm(vector))
+    return vector / norm if norm > 0 else vector
+
+class HashingVectorizer:
+    """Signed feature hashing of character n-grams; needs no model or vocabulary.
+    
+    Names that share spelling (plurals, compounds, typos) land close together.
+    """
+    
+    def __init__(self, dim: int = 256, ngram_range: Tuple[int, int] = (3, 5)):
+        self.dim = dim
+        self.ngram_range = ngram_range
+        self.signature = f"hashing-{dim}-{ngram_range[0]}-{ngram_range[1]}"
+    
+    def __call__(self, text: str) -> np.ndarray:
+        text = " " + " ".join(unicodedata.normalize("NFKC", text).lower().split()) + " "
+        buckets, signs = [], []
+        for n in range(self.ngram_range[0], self.ngram_range[1] + 1):
+            for start in range(len(text) - n + 1):
+                digest = zlib.crc32(text[start:start + n].encode("utf-8"))
+                buckets.append(digest % self.dim)
+                signs.append(1.0 if digest & 0x80000000 else -1.0)
+        if not buckets:
+            return np.zeros(self.dim, dtype=np.float32)
+        return normalise(np.bincount(buckets, weights=signs, minlength=self.dim).astype(np.float32))
+
+class SpacyVectorizer:
+    """Mean static word vector of a spaCy model, concatenated with the hashing vector.
+    
+    The hashing half keeps names without word vectors (rare proper nouns)
+    comparable; both halves are unit length and weighted equally.
+    """
+    
+    def __init__(self, nlp, hashing: HashingVectorizer):
+        self.tokenizer = nlp.tokenizer
+        self.hashing = hashing
+        self.vector_dim = nlp.vocab.vectors.shape[1]
+        self.dim = self.vector_dim + hashing.dim
+        self.signature = f"spacy-{nlp.meta.get('lang')}_{nlp.meta.get('name')}-{self.vector_dim}+{hashing.signature}"
+    
+    def __call__(self, text: str) -> np.ndarray:
+        vectors = [token.vector for token in self.tokenizer(text) if token.has_vector]
+        semantic = normalise(np.mean(vectors, axis=0)) if vectors else np.zeros(self.vector_dim, dtype=np.float32)
+        return normalise(np.concatenate([semantic, self.hashing(text)]).astype(np.float32))
+
+class VectorMatrix:
+    """Growable float32 row matrix, memory-mapped from a .npy file when a path is given"""
+    
+    def __init__(self, dim: int, path: Optional[Path] = None, capacity: int = 1024):
+        self.dim = dim
+        self.path = path
+        if path is not None and path.exists():
+            self.array = np.lib.format.open_memmap(path, mode="r+")
+        else:
+            self.array = self._allocate(capacity)
+    
+    def _allocate(self, capacity: int) -> np.ndarray:
+        if self.path is None:
+            return np.zeros((capacity, self.dim), dtype=np.float32)
+        return np.lib.format.open_memmap(self.path, mode="w+", dtype=np.float32, shape=(capacity, self.dim))
+    
+    def ensure_capacity(self, rows: int):
+        capacity = len(self.array)
+        if rows <= capacity:
+            return
+        while capacity < rows:
+            capacity *= 2
+        if self.path is None:
+            grown = self._allocate(capacity)
+            grown[:len(self.array)] = self.array
+            self.array = grown
+            return
+        # Copied into a new file and swapped in, so a crash leaves the old file intact
+        temporary = self.path.with_suffix(".tmp.npy")
+        grown = np.lib.format.open_memmap(temporary, mode="w+", dtype=np.float32, shape=(capacity, self.dim))
+        grown[:len(self.array)] = self.array
+        grown.flush()
+        self.array = grown
+        os.replace(temporary, self.path)
+    
+    def flush(self):
+        if self.path is not None:
+            self.array.flush()
+
+class IVFIndex:
+    """Inverted-file ANN index: vectors are bucketed by their nearest of ``nlist``
+    centroids (spherical k-means), and a query scores only the rows in its
+    ``nprobe`` nearest buckets.
+    """
+    
+    def __init__(self, centroids: np.ndarray, assignment: np.ndarray):
+        self.centroids = centroids
+        self.trained_size = len(assignment)
+        self.list_of: List[int] = assignment.tolist()
+        self.lists: List[List[int]] = [[] for _ in range(len(centroids))]
+        for row, list_id in enumerate(self.list_of):
+            self.lists[list_id].append(row)
+    
+    @classmethod
+    def train(cls, vectors: np.ndarray, nlist: int, iterations: int = 20, seed: int = 0) -> "IVFIndex":
+        rng = np.random.default_rng(seed)
+        sample_size = min(len(vectors), nlist * 128)
+        sample = np.asarray(vectors[np.sort(rng.choice(len(vectors), sample_size, replace=False))])
+        centroids = sample[rng.choice(sample_size, nlist, replace=False)].copy()
+        for _ in range(iterations):
+            assignment = np.argmax(sample @ centroids.T, axis=1)
+            order = np.argsort(assignment, kind="stable")
+            counts = np.bincount(assignment, minlength=nlist)
+            used = counts > 0
+            sums = np.zeros_like(centroids)
+            sums[used] = np.add.reduceat(sample[order], np.cumsum(counts)[used] - counts[used])
+            # Empty clusters are re-seeded from random sample vectors
+            sums[~used] = sample[rng.choice(sample_size, int((~used).sum()))]
+            norms = np.linalg.norm(sums, axis=1, keepdims=True)
+            centroids = sums / np.where(norms > 0, norms, 1)
+        return cls(centroids.astype(np.float32), cls.nearest(centroids, vectors))
+    
+    @staticmethod
+    def nearest(centroids: np.ndarray, vectors: np.ndarray, chunk: int = 65536) -> np.ndarray:
+        return np.concatenate([
+            np.argmax(np.asarray(vectors[start:start + chunk]) @ centroids.T, axis=1)
+            for start in range(0, len(vectors), chunk)
+        ]) if len(vectors) else np.zeros(0, dtype=np.int64)
+    
+    def assign(self, row: int, vector: np.ndarray):
+        list_id = int(np.argmax(self.centroids @ vector))
+        if row < len(self.list_of):
+            previous = self.list_of[row]
+            if previous == list_id:
+                return
+            self.lists[previous].remove(row)
+            self.list_of[row] = list_id
+        else:
+            self.list_of.append(list_id)
+        self.lists[list_id].append(row)
+    
+    def probe(self, query: np.ndarray, nprobe: int) -> np.ndarray:
+        nprobe = min(nprobe, len(self.centroids))
+        nearest = np.argpartition(-(self.centroids @ query), nprobe - 1)[:nprobe]
+        return np.fromiter((row for list_id in nearest for row in self.lists[list_id]), dtype=np.int64)
+
+class EntitySimilarityIndex:
+    """Offline vector index over entity names and the text they were mentioned in.
+    
+    Each entity has one row: its name vector blended with the running sum
+    of its mention contexts (weight SIMILARITY_CONTEXT_WEIGHT). Rows live in
+    memory-mapped matrices under SIMILARITY_DIR, so restarts only vectorise
+    entities written since, and are searched exactly until there are
+    SIMILARITY_IVF_MIN_SIZE of them, then through an IVF index that is
+    retrained in a worker thread whenever the row count doubles. Writes are
+    queued and vectorised off the event loop.
+    """
+    
+    def __init__(self, backend, path: Optional[str] = None):
+        self.backend = backend
+        self.path = Path(path) if path else None
+        self.state = "unloaded"
+        self.vectorizer = None
+        self.ids: List[str] = []
+        self.names: List[str] = []
+        self.row_of: Dict[str, int] = {}
+        self.vectors: Optional[VectorMatrix] = None
+        self.context: Optional[VectorMatrix] = None
+        self.ivf: Optional[IVFIndex] = None
+        self._persisted = 0
+        self._last_flush = time.monotonic()
+        self._pending: List[Tuple[str, str, Optional[str]]] = []
+        self._dropped = 0
+        self._drain_task: Optional[asyncio.Task] = None
+        self._train_task: Optional[asyncio.Task] = None
+        self._dirty: Optional[set] = None
+        self.queries = 0
+        self.query_seconds = 0.0
+    
+    def __len__(self) -> int:
+        return len(self.ids)
+    
+    # Writes
+    
+    def observe(self, nodes: List[Dict[str, Any]]):
+        """Queue entities from a graph write that are not indexed yet"""
+        self._queue(
+            (node["id"], node["properties"].get("name"), None)
+            for node in nodes if node["id"] not in self.row_of
+        )
+    
+    def add_mentions(self, mentions: List[Tuple[str, str, str]]):
+        """Queue ``(entity_id, name, context)`` mentions, e.g. from a chat message"""
+        self._queue(mentions)
+    
+    def _queue(self, mentions):
+        # Before load() the backend scan picks names up; contexts are not kept
+        if self.state == "unloaded":
+            return
+        for mention in mentions:
+            if not mention[1]:
+                continue
+            if len(self._pending) >= MAX_PENDING:
+                self._dropped += 1
+                continue
+            self._pending.append(mention)
+        if self.state == "ready" and self._pending and self._drain_task is None:
+            try:
+                self._drain_task = asyncio.get_running_loop().create_task(self._drain())
+            except RuntimeError:
+                # No event loop (e.g. scripts): picked up by the next load or write
+                pass
+    
+    async def _drain(self):
+        try:
+            while self._pending:
+                batch = self._pending[:DRAIN_BATCH_SIZE]
+                del self._pending[:DRAIN_BATCH_SIZE]
+                self._apply(batch, await asyncio.to_thread(self._vectorise, batch))
+            if self.path is not None and time.monotonic() - self._last_flush > settings.SIMILARITY_FLUSH_INTERVAL:
+                await asyncio.to_thread(self.flush)
+        except Exception as e:
+            logger.warning(f"Similarity index update failed: {e}")
+        finally:
+            self._drain_task = None
+    
+    def _vectorise(self, batch: List[Tuple[str, str, Optional[str]]]) -> List[Tuple[Optional[np.ndarray], Optional[np.ndarray]]]:
+        return [
+            (None if entity_id in self.row_of else self.vectorizer(name),
+             self.vectorizer(context) if context else None)
+            for entity_id, name, context in batch
+        ]
+    
+    def _apply(self, batch, vectors):
+        weight = settings.SIMILARITY_CONTEXT_WEIGHT
+        for (entity_id, name, _), (name_vector, context_vector) in zip(batch, vectors):
+            row = self.row_of.get(entity_id)
+            if row is None:
+                row = self._append(entity_id, name, name_vector if name_vector is not None else self.vectorizer(name))
+            elif context_vector is None:
+                continue
+            if context_vector is not None:
+                context = self.context.array[row]
+                context += context_vector
+                name_vector = name_vector if name_vector is not None else self.vectorizer(self.names[row])
+                self.vectors.array[row] = normalise((1 - weight) * name_vector + weight * normalise(context))
+            if self.ivf is not None:
+                self.ivf.assign(row, self.vectors.array[row])
+            if self._dirty is not None:
+                self._dirty.add(row)
+        self._maybe_train()
+    
+    def _append(self, entity_id: str, name: str, vector: np.ndarray) -> int:
+        row = len(self.ids)
+        self.vectors.ensure_capacity(row + 1)
+        self.context.ensure_capacity(row + 1)
+        self.vectors.array[row] = vector
+        self.context.array[row] = 0
+        self.ids.append(entity_id)
+        self.names.append(name)
+        self.row_of[entity_id] = row
+        return row
+    
+    # Loading and persistence
+    
+    def _resolve_vectorizer(self):
+        hashing = HashingVectorizer(settings.SIMILARITY_DIM)
+        if settings.SIMILARITY_VECTORIZER == "hashing":
+            return hashing
+        from .chat_agent import get_chat_agent
+        nlp = get_chat_agent().nlp
+        if nlp is not None and nlp.vocab.vectors.shape[1] > 0:
+            return SpacyVectorizer(nlp, hashing)
+        if settings.SIMILARITY_VECTORIZER == "spacy":
+            raise ValueError(f"SIMILARITY_VECTORIZER=spacy but {settings.NLP_MODEL} has no word vectors")
+        return hashing
+    
+    def _open(self):
+        meta = None
+        if self.path is not None:
+            self.path.mkdir(parents=True, exist_ok=True)
+            meta_path = self.path / "meta.json"
+            if meta_path.exists():
+                meta = json.loads(meta_path.read_text())
+                if meta.get("vectorizer") != self.vectorizer.signature:
+                    logger.info(f"Similarity vectors were built with {meta.get('vectorizer')}; rebuilding")
+                    meta = None
+            if meta is None:
+                for name in ("meta.json", "entities.tsv", "vectors.npy", "context.npy"):
+                    (self.path / name).unlink(missing_ok=True)
+        dim = self.vectorizer.dim
+        self.vectors = VectorMatrix(dim, self.path / "vectors.npy" if self.path else None)
+        self.context = VectorMatrix(dim, self.path / "context.npy" if self.path else None)
+        if meta is not None:
+            count = meta["count"]
+            with open(self.path / "entities.tsv", encoding="utf-8") as entities:
+                for line, _ in zip(entities, range(count)):
+                    entity_id, name = line.rstrip("\n").split("\t", 1)
+                    self.row_of[entity_id] = len(self.ids)
+                    self.ids.append(entity_id)
+                    self.names.append(name)
+            self._persisted = len(self.ids)
+            # Lines past the recorded count were never committed by a flush
+            with open(self.path / "entities.tsv", "r+", encoding="utf-8") as entities:
+                for _ in range(self._persisted):
+                    entities.readline()
+                entities.truncate(entities.tell())
+    
+    async def load(self):
+        """Open persisted vectors, then vectorise any entity in the graph that is missing.
+        
+        Safe to call again (e.g. after a restore) to pick up entities written
+        around the write path. Writes made meanwhile are queued and applied after.
+        """
+        if self.state == "unloaded":
+            self.state = "loading"
+            try:
+                self.vectorizer = await asyncio.to_thread(self._resolve_vectorizer)
+                await asyncio.to_thread(self._open)
+            except Exception:
+                self.state = "unloaded"
+                raise
+        
+        started = time.perf_counter()
+        known = len(self.ids)
+        batch = []
+        async for row in self.backend.scan_entities():
+            if row["name"] and row["id"] not in self.row_of:
+                batch.append((row["id"], row["name"], None))
+            if len(batch) >= LOAD_BATCH_SIZE:
+                self._apply(batch, await asyncio.to_thread(self._vectorise, batch))
+                batch = []
+        if batch:
+            self._apply(batch, await asyncio.to_thread(self._vectorise, batch))
+        
+        self.state = "ready"
+        self._queue([])
+        if self.path is not None:
+            await asyncio.to_thread(self.flush)
+        logger.info(f"Similarity index ready with {len(self.ids)} entities ({self.vectorizer.signature}); "
+                    f"vectorised {len(self.ids) - known} in {time.perf_counter() - started:.1f}s")
+    
+    def flush(self):
+        """Write new rows and the row count to SIMILARITY_DIR"""
+        if self.path is None or self.vectors is None:
+            return
+        count = len(self.ids)
+        self.vectors.flush()
+        self.context.flush()
+        if count > self._persisted:
+            with open(self.path / "entities.tsv", "a", encoding="utf-8") as entities:
+                entities.writelines(
+                    f"{entity_id}\t{' '.join(name.split())}\n"
+                    for entity_id, name in zip(self.ids[self._persisted:count], self.names[self._persisted:count])
+                )
+        # The count is written last: rows past it are ignored on the next load
+        (self.path / "meta.json").write_text(json.dumps({"vectorizer": self.vectorizer.signature, "count": count}))
+        self._persisted = count
+        self._last_flush = time.monotonic()
+    
+    async def close(self):
+        for task in (self._drain_task, self._train_task):
+            if task is not None:
+                task.cancel()
+        if self.state == "ready":
+            await asyncio.to_thread(self.flush)
+    
+    # ANN index
+    
+    def _maybe_train(self):
+        count = len(self.ids)
+        if self._train_task is not None or count < settings.SIMILARITY_IVF_MIN_SIZE:
+            return
+        if self.ivf is not None and count < 2 * self.ivf.trained_size:
+            return
+        try:
+            self._train_task = asyncio.get_running_loop().create_task(self._train())
+        except RuntimeError:
+            pass
+    
+    async def _train(self):
+        try:
+            count = len(self.ids)
+            # About sqrt(n) lists keeps both the probe and the scan per list short
+            nlist = max(16, int(count ** 0.5))
+            self._dirty = set()
+            started = time.perf_counter()
+            ivf = await asyncio.to_thread(IVFIndex.train, self.vectors.array[:count], nlist)
+            # Rows added or changed while training are (re)assigned with the new centroids
+            for row in sorted(self._dirty | set(range(count, len(self.ids)))):
+                ivf.assign(row, self.vectors.array[row])
+            self.ivf = ivf
+            logger.info(f"Similarity IVF index trained on {count} entities with {nlist} lists "
+                        f"in {time.perf_counter() - started:.1f}s")
+        except Exception as e:
+            logger.warning(f"Similarity index training failed: {e}")
+        finally:
+            self._dirty = None
+            self._train_task = None
+    
+    # Queries
+    
+    def _search(self, query: np.ndarray, limit: int, exclude: Optional[int] = None) -> List[Dict[str, Any]]:
+        started = time.perf_counter()
+        count = len(self.ids)
+        if self.ivf is not None:
+            rows = self.ivf.probe(query, settings.SIMILARITY_NPROBE)
+            scores = self.vectors.array[rows] @ query
+        else:
+            rows = None
+            scores = self.vectors.array[:count] @ query
+        results = []
+        k = min(limit + 1, len(scores))
+        if k > 0:
+            top = np.argpartition(-scores, k - 1)[:k]
+            for position in top[np.argsort(-scores[top])]:
+                row = int(rows[position]) if rows is not None else int(position)
+                if row != exclude and len(results) < limit:
+                    results.append({"id": self.ids[row], "name": self.names[row], "score": round(float(scores[position]), 4)})
+        self.queries += 1
+        self.query_seconds += time.perf_counter() - started
+        return results
+    
+    def similar_to_entity(self, entity_id: str, limit: int = 10) -> Optional[List[Dict[str, Any]]]:
+        """Entities most similar to an indexed one, or None if it is not indexed"""
+        row = self.row_of.get(entity_id)
+        if row is None:
+            return None
+        return self._search(np.array(self.vectors.array[row]), limit, exclude=row)
+    
+    def similar_to_text(self, text: str, limit: int = 10) -> List[Dict[str, Any]]:
+        return self._search(self.vectorizer(text), limit)
+    
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "state": self.state,
+            "entities": len(self.ids),
+            "vectorizer": self.vectorizer.signature if self.vectorizer else None,
+            "dim": self.vectorizer.dim if self.vectorizer else None,
+            "path": str(self.path) if self.path else None,
+            "ivf_lists": len(self.ivf.centroids) if self.ivf else None,
+            "ivf_trained_size": self.ivf.trained_size if self.ivf else None,
+            "pending": len(self._pending),
+            "dropped": self._dropped,
+            "queries": self.queries,
+            "mean_query_ms": round(self.query_seconds / self.queries * 1000, 3) if self.queries else None
+        }
@@ -0,0 +1,179 @@
+from typing import List, Dict, Any, Optional, Tuple
+from collections import deque
+from functools import lru_cache
+from neo4j.exceptions import TransientError, ServiceUnavailable, SessionExpired
+from .knowledge_graph import KnowledgeGraphService, get_kg_service
+from ..core.config import settings
+import asyncio
+import logging
+import time
+
+logger = logging.getLogger(__name__)
+
+TRANSIENT_ERRORS = (TransientError, ServiceUnavailable, SessionExpired)
+
+class WriteBehindQueue:
+    """In-process queue that decouples chat replies from graph write latency.
+    
+    Each enqueued item holds one message's entity and relationship rows and
+    its tenant. A background task drains items in micro-batches (by size or
+    time window), collapses repeated upserts of the same entity or edge per
+    tenant, and retries transient Neo4j failures with exponential backoff.
+    """
+    
+    def __init__(self):
+        self._pending = deque()
+        self._wakeup = None
+        self._space = None
+        self._lock = None
+        self._task = None
+        self._stopping = False
+        self.batches_written = 0
+        self.items_written = 0
+        self.retries = 0
+        self.failed_batches = 0
+        self.last_flush_at = None
+    
+    def _ensure_primitives(self):
+        # Created lazily so they bind to the serving event loop
+        if self._lock is None:
+            self._wakeup = asyncio.Event()
+            self._space = asyncio.Condition()
+            self._lock = asyncio.Lock()
+    
+    @property
+    def running(self) -> bool:
+        return self._task is not None and not self._task.done()
+    
+    def start(self):
+        """Start the background drain task"""
+        self._ensure_primitives()
+        if not self.running:
+            self._stopping = False
+            self._task = asyncio.create_task(self._run())
+            logger.info("Write-behind queue started")
+    
+    async def stop(self):
+        """Stop the background task after writing everything still pending"""
+        if self._task:
+            # Let an in-flight batch finish instead of cancelling it mid-write
+            self._stopping = True
+            self._wakeup.set()
+            await self._task
+            self._task = None
+        await self.flush()
+    
+    async def put(self, entities: List[Dict[str, Any]], relationships: List[Dict[str, Any]],
+                  tenant_id: Optional[str] = None):
+        """Queue one message's writes for a tenant, waiting if the queue is at capacity"""
+        self._ensure_primitives()
+        tenant_id = tenant_id or settings.DEFAULT_TENANT_ID
+        async with self._space:
+            await self._space.wait_for(lambda: len(self._pending) < settings.WRITE_BEHIND_MAX_PENDING)
+            self._pending.append((time.monotonic(), tenant_id, entities, relationships))
+        if len(self._pending) >= settings.WRITE_BEHIND_BATCH_SIZE:
+            self._wakeup.set()
+    
+    async def flush(self):
+        """Write everything currently queued; used on shutdown and in tests"""
+        self._ensure_primitives()
+        while self._pending:
+            await self._drain_once()
+    
+    def stats(self) -> Dict[str, Any]:
+        """Queue depth, lag of the oldest pending item and write counters"""
+        lag = time.monotonic() - self._pending[0][0] if self._pending else 0.0
+        return {
+            "enabled": settings.WRITE_BEHIND_ENABLED,
+            "running": self.running,
+            "depth": len(self._pending),
+            "lag_seconds": round(lag, 3),
+            "batches_written": self.batches_written,
+            "items_written": self.items_written,
+            "retries": self.retries,
+            "failed_batches": self.failed_batches,
+            "last_flush_at": self.last_flush_at
+        }
+    
+    async def _run(self):
+        while not self._stopping:
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), timeout=settings.WRITE_BEHIND_FLUSH_INTERVAL)
+            except asyncio.TimeoutError:
+                pass
+            self._wakeup.clear()
+            try:
+                await self.flush()
+            except Exception as e:
+                logger.error(f"Write-behind drain failed: {e}")
+    
+    def _merge(self, items) -> Tuple[List[Dict[str, Any]], List[Dict[str, Any]]]:
+        """Collapse repeated upserts of the same entity id or edge within a batch"""
+        entities: Dict[str, Dict[str, Any]] = {}
+        relationships: Dict[Tuple[str, str, str], Dict[str, Any]] = {}
+        for _, _, item_entities, item_relationships in items:
+            for entity in item_entities:
+                entity_id = KnowledgeGraphService.make_entity_id(entity["name"], entity["type"])
+                merged = entities.get(entity_id)
+                if merged:
+                    merged["properties"].update(entity.get("properties") or {})
+                else:
+                    entities[entity_id] = {**entity, "properties": dict(entity.get("properties") or {})}
+            for rel in item_relationships:
+                key = (rel["start_entity"], rel["end_entity"], rel["type"])
+                merged = relationships.get(key)
+                if merged:
+                    merged["properties"].update(rel.get("properties") or {})
+                else:
+                    relationships[key] = {**rel, "properties": dict(rel.get("properties") or {})}
+        return list(entities.values()), list(relationships.values())
+    
+    async def _drain_once(self):
+        async with self._lock:
+            count = min(len(self._pending), settings.WRITE_BEHIND_BATCH_SIZE)
+            if not count:
+                return
+            items = [self._pending.popleft() for _ in range(count)]
+            async with self._space:
+                self._space.notify_all()
+            
+            by_tenant: Dict[str, list] = {}
+            for item in items:
+                by_tenant.setdefault(item[1], []).append(item)
+            for tenant_id, tenant_items in by_tenant.items():
+                if await self._write(tenant_id, tenant_items):
+                    self.batches_written += 1
+                    self.items_written += len(tenant_items)
+            self.last_flush_at = time.time()
+    
+    async def _write(self, tenant_id: str, items) -> bool:
+        """One tenant's share of a batch in one transaction; False if it was dropped"""
+        count = len(items)
+        try:
+            service = get_kg_service(tenant_id)
+        except Exception as e:
+            self.failed_batches += 1
+            logger.error(f"Dropping write-behind batch of {count} items for tenant {tenant_id}: {e}")
+            return False
+        entities, relationships = self._merge(items)
+        with service.lease():
+            for attempt in range(settings.WRITE_BEHIND_MAX_RETRIES + 1):
+                try:
+                    await service.upsert_batch(entities, relationships)
+                    return True
+                except TRANSIENT_ERRORS as e:
+                    if attempt == settings.WRITE_BEHIND_MAX_RETRIES:
+                        self.failed_batches += 1
+                        logger.error(f"Dropping write-behind batch of {count} items after {attempt} retries: {e}")
+                        return False
+                    self.retries += 1
+                    await asyncio.sleep(settings.WRITE_BEHIND_RETRY_BACKOFF * (2 ** attempt))
+                except Exception as e:
+                    self.failed_batches += 1
+                    logger.error(f"Dropping write-behind batch of {count} items: {e}")
+                    return False
+
+@lru_cache()
+def get_write_behind_queue() -> WriteBehindQueue:
+    """Shared write-behind queue, created on first use"""
+    return WriteBehindQueue()
\ No newline at end of file
@@ -0,0 +1,84 @@
+#!/usr/bin/env python3
+"""
+Micro-benchmark for regex entity and relationship extraction
+
+Compares the compiled single-pass ExtractionEngine with the previous
+per-pattern re.findall implementation across message lengths.
+
+Usage:
+    python -m benchmarks.bench_extraction [--repeat 200]
+"""
+
+import argparse
+import random
+import re
+import sys
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from app.services.extraction import ExtractionEngine
+
+SENTENCES = [
+    "Machine Learning relates to Artificial Intelligence.",
+    "Stress causes Anxiety and poor sleep.",
+    "Python is a Language I use every day.",
+    "My mood depends on Exercise more than I expected.",
+    "On 12/05/2024 I met Alice at the Science Museum.",
+    "Journaling influences Focus in ways that are hard to measure.",
+    "the project connects to Research from last year.",
+    "Nothing special happened today, just a quiet walk.",
+]
+
+def legacy_extract(text):
+    """The per-pattern implementation the engine replaced"""
+    entities = []
+    for concept in re.findall(r'\b[A-Z][a-z]+(?:\s+[A-Z][a-z]+)*\b', text):
+        entities.append({"text": concept, "start": text.find(concept), "end": text.find(concept) + len(concept)})
+    for date in re.findall(r'\b\d{1,2}[/-]\d{1,2}[/-]\d{2,4}\b|\b\d{4}[/-]\d{1,2}[/-]\d{1,2}\b', text):
+        entities.append({"text": date, "start": text.find(date), "end": text.find(date) + len(date)})
+    relationships = []
+    for pattern, rel_type in [
+        (r'(\w+)\s+is\s+(?:a|an)\s+(\w+)', "IS_A"),
+        (r'(\w+)\s+relates\s+to\s+(\w+)', "RELATES_TO"),
+        (r'(\w+)\s+connects\s+to\s+(\w+)', "CONNECTS_TO"),
+        (r'(\w+)\s+influences\s+(\w+)', "INFLUENCES"),
+        (r'(\w+)\s+causes\s+(\w+)', "CAUSES"),
+        (r'(\w+)\s+depends\s+on\s+(\w+)', "DEPENDS_ON"),
+    ]:
+        for match in re.findall(pattern, text, re.IGNORECASE):
+            relationships.append({"start_entity": match[0], "end_entity": match[1], "relationship_type": rel_type})
+    return entities, relationships
+
+def make_message(length: int, rng: random.Random) -> str:
+    parts = []
+    while sum(len(part) + 1 for part in parts) < length:
+        parts.append(rng.choice(SENTENCES))
+    return " ".join(parts)[:length]
+
+def time_per_call(func, text: str, repeat: int) -> float:
+    start = time.perf_counter()
+    for _ in range(repeat):
+        func(text)
+    return (time.perf_counter() - start) / repeat
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark regex extraction")
+    parser.add_argument("--repeat", type=int, default=200, help="Calls per message length")
+    parser.add_argument("--lengths", type=int, nargs="+", default=[100, 1_000, 10_000, 50_000])
+    args = parser.parse_args(argv)
+    
+    rng = random.Random(42)
+    engine = ExtractionEngine()
+    
+    print(f"{'chars':>8} {'engine µs':>12} {'legacy µs':>12} {'speedup':>8}")
+    for length in args.lengths:
+        text = make_message(length, rng)
+        repeat = max(1, args.repeat * 100 // max(length // 10, 100))
+        engine_time = time_per_call(engine.extract, text, repeat)
+        legacy_time = time_per_call(legacy_extract, text, repeat)
+        print(f"{length:>8} {engine_time * 1e6:>12.1f} {legacy_time * 1e6:>12.1f} {legacy_time / engine_time:>7.1f}x")
+
+if __name__ == "__main__":
+    main()
\ No newline at end of file
@@ -0,0 +1,64 @@
+#!/usr/bin/env python3
+"""
+Cold-start benchmark: time to import the app, serve the first request and become ready
+
+Each run uses a fresh interpreter so nothing is cached between measurements.
+
+Usage:
+    python -m benchmarks.bench_startup [--runs 5] [--skip-schema-setup]
+"""
+
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+from pathlib import Path
+
+ROOT = Path(__file__).parent.parent
+
+PROBE = """
+import json, time
+started = time.perf_counter()
+import app.main
+imported = time.perf_counter()
+from fastapi.testclient import TestClient
+with TestClient(app.main.app) as client:
+    client.get("/health")
+    first_request = time.perf_counter()
+    while client.get("/ready").status_code != 200 and time.perf_counter() - started < 120:
+        time.sleep(0.01)
+    ready = time.perf_counter()
+print(json.dumps({
+    "import": imported - started,
+    "first_request": first_request - started,
+    "ready": ready - started
+}))
+"""
+
+def run_once(env) -> dict:
+    output = subprocess.run(
+        [sys.executable, "-c", PROBE], cwd=ROOT, env=env, check=True, capture_output=True, text=True
+    ).stdout
+    return json.loads(output.strip().splitlines()[-1])
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark application cold start")
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--skip-schema-setup", action="store_true", help="Measure without a reachable Neo4j")
+    args = parser.parse_args(argv)
+    
+    env = dict(os.environ)
+    if args.skip_schema_setup:
+        env["SKIP_SCHEMA_SETUP"] = "true"
+        env["STATS_RECONCILE_ON_STARTUP"] = "false"
+    
+    runs = [run_once(env) for _ in range(args.runs)]
+    print(f"{'phase':<15} {'median s':>10} {'min s':>10} {'max s':>10}")
+    for phase in ("import", "first_request", "ready"):
+        values = [run[phase] for run in runs]
+        print(f"{phase:<15} {statistics.median(values):>10.3f} {min(values):>10.3f} {max(values):>10.3f}")
+
+if __name__ == "__main__":
+    main()
\ No newline at end of file
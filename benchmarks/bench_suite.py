@@ -0,0 +1,257 @@
+#!/usr/bin/env python3
+"""
+End-to-end benchmark suite over synthetic graphs of several sizes
+
+For each scale a fresh graph is generated (see benchmarks.corpus) and
+loaded through KnowledgeGraphService, then each operation is timed
+``--repeat`` times. Results are written as JSON with latency percentiles
+in milliseconds; ``compare`` diffs two result files and exits non-zero
+when an operation got slower than the threshold.
+
+The embedded backend needs no server. ``--backend neo4j`` benchmarks the
+Neo4j configured in the environment and requires ``--reset-neo4j``,
+because the default tenant's :Entity nodes are deleted before each scale is loaded.
+
+Usage:
+    python -m benchmarks.bench_suite run --scales 1000 10000 --output after.json
+    python -m benchmarks.bench_suite compare before.json after.json --threshold 0.1
+"""
+
+import argparse
+import asyncio
+import inspect
+import json
+import platform
+import random
+import subprocess
+import sys
+import time
+from datetime import datetime
+from pathlib import Path
+from typing import Any, Callable, Dict, List
+
+ROOT = Path(__file__).parent.parent
+sys.path.insert(0, str(ROOT))
+
+from benchmarks.corpus import ZipfSampler, generate_corpus, generate_graph
+from app.core.config import settings
+
+def percentile(sorted_values: List[float], fraction: float) -> float:
+    """Linearly interpolated percentile of already sorted values"""
+    position = (len(sorted_values) - 1) * fraction
+    lower = int(position)
+    upper = min(lower + 1, len(sorted_values) - 1)
+    return sorted_values[lower] + (sorted_values[upper] - sorted_values[lower]) * (position - lower)
+
+def summarise(samples: List[float]) -> Dict[str, float]:
+    values = sorted(sample * 1000 for sample in samples)
+    return {
+        "count": len(values),
+        "mean_ms": round(sum(values) / len(values), 4),
+        "min_ms": round(values[0], 4),
+        "p50_ms": round(percentile(values, 0.50), 4),
+        "p90_ms": round(percentile(values, 0.90), 4),
+        "p99_ms": round(percentile(values, 0.99), 4),
+        "max_ms": round(values[-1], 4)
+    }
+
+async def measure(operation: Callable[[int], Any], repeat: int, warmup: int = 3) -> Dict[str, float]:
+    """Time ``operation(index)`` calls; coroutines are awaited inside the timed region"""
+    async def call(index):
+        result = operation(index)
+        if inspect.isawaitable(result):
+            await result
+    
+    for index in range(warmup):
+        await call(index)
+    samples = []
+    for index in range(repeat):
+        started = time.perf_counter()
+        await call(index)
+        samples.append(time.perf_counter() - started)
+    return summarise(samples)
+
+def fresh_services(backend: str):
+    """New service singletons on the requested backend"""
+    from app.services import backends, knowledge_graph
+    from app.services.chat_agent import get_chat_agent
+    
+    settings.GRAPH_BACKEND = backend
+    settings.EMBEDDED_DB_PATH = None
+    settings.WRITE_BEHIND_ENABLED = False
+    backends._backends.clear()
+    knowledge_graph._services.clear()
+    return knowledge_graph.get_kg_service(), get_chat_agent()
+
+async def reset_neo4j(kg_service):
+    await kg_service.backend.db.execute_autocommit(
+        "MATCH (n:Entity {tenant_id: $tenant}) CALL { WITH n DETACH DELETE n } IN TRANSACTIONS",
+        {"tenant": kg_service.tenant_id}
+    )
+
+async def load_graph(kg_service, scale: int, skew: float, seed: int, batch_size: int = 1000) -> Dict[str, Any]:
+    entity_writes, relationship_writes = generate_graph(scale, skew=skew, seed=seed)
+    started = time.perf_counter()
+    for offset in range(0, len(entity_writes), batch_size):
+        await kg_service.upsert_batch(entity_writes[offset:offset + batch_size], [])
+    for offset in range(0, len(relationship_writes), batch_size):
+        await kg_service.upsert_batch([], relationship_writes[offset:offset + batch_size])
+    return {
+        "entities": len(entity_writes),
+        "relationships": len(relationship_writes),
+        "load_seconds": round(time.perf_counter() - started, 3),
+        "ids": [kg_service.make_entity_id(entity["name"], entity["type"]) for entity in entity_writes],
+        "names": [entity["name"] for entity in entity_writes]
+    }
+
+async def run_suite(args) -> Dict[str, Any]:
+    rng = random.Random(args.seed)
+    results: Dict[str, Any] = {}
+    corpus = generate_corpus(max(args.repeat, 100), skew=args.skew, seed=args.seed)
+    
+    kg_service, agent = fresh_services(args.backend)
+    if args.no_spacy:
+        agent._nlp, agent.nlp_loaded = None, True
+    else:
+        agent.load_nlp_model()
+    
+    # Extraction does not depend on the graph size
+    results["extract_entities"] = await measure(
+        lambda index: agent.extract_entities(corpus[index % len(corpus)]), args.repeat
+    )
+    extracted = [agent.extract_entities(text) for text in corpus]
+    results["extract_relationships"] = await measure(
+        lambda index: agent.extract_relationships(corpus[index % len(corpus)], extracted[index % len(corpus)]),
+        args.repeat
+    )
+    
+    scales = {}
+    for scale in args.scales:
+        kg_service, agent = fresh_services(args.backend)
+        if args.backend == "neo4j":
+            await kg_service.initialize_constraints()
+            await reset_neo4j(kg_service)
+        graph = await load_graph(kg_service, scale, args.skew, args.seed)
+        ids, names = graph.pop("ids"), graph.pop("names")
+        # Lookups follow the same skew as the data, so hubs are queried most
+        sampler = ZipfSampler(len(ids), args.skew, rng)
+        hubs = [ids[sampler.sample()] for _ in range(args.repeat)]
+        prefixes = [rng.choice(names).split()[0][:4].lower() for _ in range(args.repeat)]
+        
+        async def uncached_snapshot(index):
+            kg_service._snapshot_cache.clear()
+            await kg_service.get_knowledge_graph(args.snapshot_limit)
+        
+        async def uncached_neighbourhood(index):
+            kg_service._neighbourhood_cache.clear()
+            await kg_service.get_neighbourhood(hubs[index % len(hubs)], depth=2)
+        
+        operations = {
+            "process_message": lambda index: agent.process_message(corpus[index % len(corpus)], "benchmark"),
+            "search_entities": lambda index: kg_service.search_entities(prefixes[index % len(prefixes)], 10),
+            "get_knowledge_graph": uncached_snapshot,
+            "get_knowledge_graph_cached": lambda index: kg_service.get_knowledge_graph(args.snapshot_limit),
+            "get_neighbourhood": uncached_neighbourhood,
+            "get_neighbourhood_cached": lambda index: kg_service.get_neighbourhood(hubs[index % len(hubs)], depth=2),
+        }
+        scale_results = {"graph": graph}
+        for name, operation in operations.items():
+            if args.only and name not in args.only:
+                continue
+            scale_results[name] = await measure(operation, args.repeat)
+            print(f"scale {scale:>7} {name:<28} p50 {scale_results[name]['p50_ms']:>9.3f} ms", file=sys.stderr)
+        scales[str(scale)] = scale_results
+        await kg_service.backend.close()
+    
+    results["scales"] = scales
+    return results
+
+def git_commit() -> str:
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=ROOT, capture_output=True,
+                              text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return "unknown"
+
+def flatten(results: Dict[str, Any]) -> Dict[str, Dict[str, float]]:
+    """Operation results keyed "operation" or "scale/operation" """
+    flat = {name: value for name, value in results.items() if name != "scales"}
+    for scale, operations in results.get("scales", {}).items():
+        for name, value in operations.items():
+            if name != "graph":
+                flat[f"{scale}/{name}"] = value
+    return flat
+
+def compare(base: Dict[str, Any], head: Dict[str, Any], metric: str, threshold: float) -> bool:
+    """Print a comparison table; True when any operation regressed past the threshold"""
+    base_results, head_results = flatten(base["results"]), flatten(head["results"])
+    regressed = False
+    print(f"{'operation':<40} {'base ' + metric:>14} {'head ' + metric:>14} {'change':>9}")
+    for name in sorted(set(base_results) | set(head_results)):
+        if name not in base_results or name not in head_results:
+            print(f"{name:<40} {'(only in ' + ('base' if name in base_results else 'head') + ')':>39}")
+            continue
+        before, after = base_results[name][metric], head_results[name][metric]
+        change = (after - before) / before if before else 0.0
+        flag = ""
+        if change > threshold:
+            flag = "  REGRESSION"
+            regressed = True
+        elif change < -threshold:
+            flag = "  improved"
+        print(f"{name:<40} {before:>14.3f} {after:>14.3f} {change:>+8.1%}{flag}")
+    return regressed
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark extraction, writes and queries")
+    commands = parser.add_subparsers(dest="command", required=True)
+    
+    run = commands.add_parser("run", help="Run the suite and write JSON results")
+    run.add_argument("--backend", choices=["embedded", "neo4j"], default="embedded")
+    run.add_argument("--reset-neo4j", action="store_true", help="Allow deleting all of the default tenant's :Entity nodes in Neo4j")
+    run.add_argument("--scales", type=int, nargs="+", default=[1_000, 10_000], help="Entities per graph")
+    run.add_argument("--skew", type=float, default=1.0, help="Zipf exponent for mentions and edges")
+    run.add_argument("--repeat", type=int, default=200, help="Timed calls per operation")
+    run.add_argument("--snapshot-limit", type=int, default=100)
+    run.add_argument("--seed", type=int, default=42)
+    run.add_argument("--only", nargs="+", help="Only these per-scale operations")
+    run.add_argument("--no-spacy", action="store_true", help="Use regex extraction even if spaCy is installed")
+    run.add_argument("--output", help="Write JSON here instead of stdout")
+    
+    compare_parser = commands.add_parser("compare", help="Compare two result files")
+    compare_parser.add_argument("base")
+    compare_parser.add_argument("head")
+    compare_parser.add_argument("--metric", default="p50_ms", choices=["mean_ms", "p50_ms", "p90_ms", "p99_ms"])
+    compare_parser.add_argument("--threshold", type=float, default=0.10, help="Allowed slowdown, e.g. 0.1 = 10%%")
+    
+    args = parser.parse_args(argv)
+    
+    if args.command == "compare":
+        base = json.loads(Path(args.base).read_text())
+        head = json.loads(Path(args.head).read_text())
+        sys.exit(1 if compare(base, head, args.metric, args.threshold) else 0)
+    
+    if args.backend == "neo4j" and not args.reset_neo4j:
+        parser.error("--backend neo4j deletes all of the default tenant's :Entity nodes; pass --reset-neo4j to confirm")
+    
+    report = {
+        "meta": {
+            "started_at": datetime.now().isoformat(),
+            "commit": git_commit(),
+            "backend": args.backend,
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "skew": args.skew,
+            "repeat": args.repeat,
+            "seed": args.seed
+        },
+        "results": asyncio.run(run_suite(args))
+    }
+    output = json.dumps(report, indent=2)
+    if args.output:
+        Path(args.output).write_text(output + "\n")
+    else:
+        print(output)
+
+if __name__ == "__main__":
+    main()
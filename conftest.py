@@ -0,0 +1,43 @@
+"""
+Shared pytest setup: every test runs against in-memory embedded graphs, no Neo4j needed
+"""
+
+import inspect
+import os
+import sys
+from pathlib import Path
+
+# Settings are read on first import of app, so the test configuration goes first
+os.environ["GRAPH_BACKEND"] = "embedded"
+os.environ.pop("EMBEDDED_DB_PATH", None)
+os.environ.pop("SIMILARITY_DIR", None)
+os.environ["CONVERSATION_STORE"] = "memory"
+os.environ["ANALYTICS_ENABLED"] = "false"
+os.environ["SIMILARITY_ENABLED"] = "false"
+os.environ["WRITE_BEHIND_ENABLED"] = "false"
+os.environ["SKIP_SCHEMA_SETUP"] = "true"
+
+sys.path.insert(0, str(Path(__file__).parent))
+
+import pytest
+
+@pytest.hookimpl(tryfirst=True)
+def pytest_pycollect_makeitem(collector, name, obj):
+    """Run ``async def`` tests on asyncio through the anyio plugin that ships with FastAPI"""
+    if inspect.iscoroutinefunction(obj) and collector.funcnamefilter(name):
+        pytest.mark.anyio(obj)
+
+@pytest.fixture
+def anyio_backend():
+    return "asyncio"
+
+@pytest.fixture(autouse=True)
+def fresh_graphs():
+    """Every test starts with no tenant services or backends loaded"""
+    from app.services import backends, knowledge_graph
+    
+    backends._backends.clear()
+    knowledge_graph._services.clear()
+    yield
+    backends._backends.clear()
+    knowledge_graph._services.clear()
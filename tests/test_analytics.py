@@ -0,0 +1,39 @@
+"""
+Graph analytics endpoints: refresh only on a fully loaded graph
+"""
+
+import time
+import pytest
+from fastapi.testclient import TestClient
+from app.core.config import settings
+from app.main import app
+from app.services.knowledge_graph import get_kg_service
+
+@pytest.fixture
+def client():
+    with TestClient(app) as client:
+        yield client
+
+def test_refresh_is_refused_while_analytics_are_disabled(client):
+    assert client.post("/api/kg/analytics/refresh").status_code == 409
+    assert client.get("/api/kg/analytics/pagerank").status_code == 409
+
+def test_refresh_waits_for_the_graph_to_load(client, monkeypatch):
+    monkeypatch.setattr(settings, "ANALYTICS_ENABLED", True)
+    for name in ("Python", "Django"):
+        assert client.post("/api/kg/entity", params={"name": name, "entity_type": "CONCEPT"}).status_code == 200
+    
+    response = client.post("/api/kg/analytics/refresh")
+    assert response.status_code == 503
+    assert get_kg_service().analytics.results is None
+    
+    client.portal.call(get_kg_service().analytics.load)
+    response = client.post("/api/kg/analytics/refresh")
+    assert response.status_code == 202
+    assert response.json()["loaded"]
+    for _ in range(100):
+        pagerank = client.get("/api/kg/analytics/pagerank")
+        if pagerank.status_code == 200:
+            break
+        time.sleep(0.01)
+    assert {result["name"] for result in pagerank.json()["results"]} == {"Python", "Django"}
@@ -0,0 +1,57 @@
+"""
+Change tracking: write stamps and the ``since`` cursor
+"""
+
+from app.services.knowledge_graph import KnowledgeGraphService, get_kg_service
+
+def concept_id(name):
+    return KnowledgeGraphService.make_entity_id(name, "CONCEPT")
+
+async def write(service, names, edges=()):
+    await service.upsert_batch(
+        [{"name": name, "type": "CONCEPT", "properties": {}} for name in names],
+        [{"start_entity": concept_id(start), "end_entity": concept_id(end), "type": "RELATES_TO"}
+         for start, end in edges]
+    )
+
+def seqs(snapshot):
+    return [item["properties"]["seq"] for item in snapshot.nodes + snapshot.relationships]
+
+async def test_since_returns_only_what_changed_in_seq_order():
+    service = get_kg_service()
+    await write(service, ["A", "B"], [("A", "B")])
+    cursor = (await service.get_snapshot()).cursor
+    created_at = (await service.backend.get_entity(concept_id("A")))["properties"]["created_at"]
+    
+    await write(service, ["C"])
+    await write(service, ["A"], [("A", "C")])
+    changes = await service.get_changes(cursor)
+    
+    assert [node["id"] for node in changes.nodes] == [concept_id("C"), concept_id("A")]
+    assert [(rel["start_node_id"], rel["end_node_id"]) for rel in changes.relationships] == [
+        (concept_id("A"), concept_id("C"))
+    ]
+    assert all(seq > cursor for seq in seqs(changes))
+    assert changes.cursor == max(seqs(changes)) == await service.backend.current_sequence()
+    
+    rewritten = changes.nodes[1]["properties"]
+    assert rewritten["created_at"] == created_at
+    assert rewritten["updated_at"] > created_at
+    
+    nothing = await service.get_changes(changes.cursor)
+    assert (nothing.nodes, nothing.relationships, nothing.cursor) == ([], [], changes.cursor)
+
+async def test_since_pages_by_limit_without_skipping():
+    service = get_kg_service()
+    await write(service, ["A", "B", "C"], [("A", "B"), ("B", "C")])
+    
+    cursor, seen = 0, []
+    while True:
+        page = await service.get_changes(cursor, limit=2)
+        if not page.nodes and not page.relationships:
+            break
+        assert len(page.nodes) + len(page.relationships) <= 2
+        seen.extend(sorted(seqs(page)))
+        cursor = page.cursor
+    
+    assert seen == list(range(1, 6))
@@ -0,0 +1,67 @@
+"""
+Conversation history stores: paging, trimming and sharing one SQLite file between workers
+"""
+
+import pytest
+from app.services.conversation_store import SQLiteConversationStore
+
+@pytest.fixture
+def sqlite_path(tmp_path):
+    return str(tmp_path / "conversations.db")
+
+async def test_sqlite_history_pages_backwards_from_the_newest_message(sqlite_path):
+    store = SQLiteConversationStore(sqlite_path)
+    try:
+        seqs = [await store.append("s1", {"message": f"m{index}"}) for index in range(5)]
+        await store.append("s2", {"message": "other session"})
+        
+        page, cursor = await store.history("s1", limit=2)
+        assert [entry["message"] for entry in page] == ["m3", "m4"]
+        assert cursor == seqs[3]
+        
+        page, cursor = await store.history("s1", cursor=cursor, limit=2)
+        assert [entry["message"] for entry in page] == ["m1", "m2"]
+        
+        page, cursor = await store.history("s1", cursor=cursor, limit=2)
+        assert [entry["message"] for entry in page] == ["m0"]
+        assert cursor is None
+    finally:
+        store.close()
+
+async def test_sqlite_cursor_is_valid_across_store_instances(sqlite_path):
+    # Two workers sharing one database file
+    writer = SQLiteConversationStore(sqlite_path)
+    reader = SQLiteConversationStore(sqlite_path)
+    try:
+        for index in range(4):
+            await writer.append("shared", {"message": f"m{index}"})
+        
+        page, cursor = await writer.history("shared", limit=2)
+        assert [entry["message"] for entry in page] == ["m2", "m3"]
+        
+        # A message appended by the other worker afterwards doesn't shift older pages
+        await reader.append("shared", {"message": "m4"})
+        page, cursor = await reader.history("shared", cursor=cursor, limit=2)
+        assert [entry["message"] for entry in page] == ["m0", "m1"]
+        assert cursor is None
+        
+        page, _ = await writer.history("shared", limit=1)
+        assert page[0]["message"] == "m4"
+        assert reader.stats()["messages"] == 5
+    finally:
+        writer.close()
+        reader.close()
+
+async def test_sqlite_sessions_are_trimmed_and_cleared(sqlite_path):
+    store = SQLiteConversationStore(sqlite_path, max_messages=3)
+    try:
+        for index in range(5):
+            await store.append("s1", {"message": f"m{index}"})
+        page, cursor = await store.history("s1")
+        assert [entry["message"] for entry in page] == ["m2", "m3", "m4"]
+        assert cursor is None
+        
+        await store.clear("s1")
+        assert await store.history("s1") == ([], None)
+    finally:
+        store.close()
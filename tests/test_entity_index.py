@@ -0,0 +1,67 @@
+"""
+Entity resolution index: names, aliases, completion and eviction at ENTITY_INDEX_MAX_SIZE
+"""
+
+from app.core.config import settings
+from app.services.entity_index import EntityResolutionIndex
+from app.services.knowledge_graph import KnowledgeGraphService, get_kg_service
+
+def test_names_and_aliases_resolve_ignoring_formatting():
+    index = EntityResolutionIndex(backend=None)
+    index.add("concept_machine_learning", "Machine Learning", ["ML", "machine_learning"])
+    
+    for reference in ("machine learning", "  MACHINE   Learning ", "ml", "Machine_Learning", "concept_machine_learning"):
+        assert index.resolve(reference) == "concept_machine_learning"
+    assert index.resolve("deep learning") is None
+    assert (index.hits, index.misses) == (5, 1)
+
+def test_latest_write_wins_a_name_clash():
+    index = EntityResolutionIndex(backend=None)
+    index.add("concept_jaguar", "Jaguar")
+    index.add("org_jaguar", "Jaguar", ["Jaguar Cars"])
+    
+    assert index.resolve("jaguar") == "org_jaguar"
+    index.remove("org_jaguar")
+    assert index.resolve("jaguar") is None
+    assert index.resolve("jaguar cars") is None
+    assert index.stats()["names"] == 0
+
+def test_completion_is_shortest_first():
+    index = EntityResolutionIndex(backend=None)
+    for name in ("Pythonic", "Python", "Python Web", "Pandas"):
+        index.add(f"concept_{name.lower()}", name)
+    
+    assert [result["name"] for result in index.complete("pyth")] == ["python", "pythonic", "python web"]
+    assert [result["name"] for result in index.complete("py", limit=1)] == ["python"]
+    assert index.complete("rust") == []
+
+def test_least_recently_used_entities_are_evicted_with_their_names():
+    index = EntityResolutionIndex(backend=None, maxsize=2)
+    index.add("a", "Alpha", ["First"])
+    index.add("b", "Beta")
+    # Resolving keeps an entity recent
+    index.resolve("alpha")
+    index.add("c", "Gamma")
+    
+    assert len(index) == 2
+    assert index.resolve("beta") is None
+    assert (index.resolve("first"), index.resolve("gamma")) == ("a", "c")
+    assert [result["name"] for result in index.complete("b")] == []
+
+async def test_service_resolves_relationship_endpoints_up_to_the_max_size(monkeypatch):
+    monkeypatch.setattr(settings, "ENTITY_INDEX_MAX_SIZE", 2)
+    service = get_kg_service()
+    await service.upsert_entities_batch([
+        {"name": name, "type": "CONCEPT", "properties": {}} for name in ("Python", "Django", "Flask")
+    ])
+    
+    # Only the two most recently written entities fit
+    assert service.entity_index.stats()["entities"] == 2
+    assert service.resolve_entity("Python") == "Python"
+    assert await service.create_relationship("Django", "flask", "RELATES_TO")
+    assert service.stats.snapshot()["relationships_by_type"] == {"RELATES_TO": 1}
+    
+    # A new service warms from the graph, again only up to the max size
+    warmed = KnowledgeGraphService(backend=service.backend)
+    await warmed.entity_index.warm()
+    assert len(warmed.entity_index) == 2
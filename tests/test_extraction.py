@@ -0,0 +1,84 @@
+"""
+Single-pass extraction engine against the per-pattern findall implementation it replaced
+"""
+
+from collections import Counter
+import re
+import pytest
+from app.services.extraction import DEFAULT_RELATIONSHIP_PATTERNS, ExtractionEngine
+from benchmarks.bench_extraction import SENTENCES, legacy_extract
+
+# Single-word endpoints and one mention of each verb, where both implementations must agree
+TEXTS = SENTENCES[1:] + [
+    " ".join(SENTENCES[1:]),
+    "water is an element and fire relates to heat; the cable connects to power",
+    "sleep INFLUENCES mood, noise causes stress and growth Depends On rain",
+    "Released 2024-01-15 and patched 3-4-25 by Alice in Paris",
+    "",
+]
+
+def engine_result(engine, text):
+    entities, relationships = engine.extract(text)
+    return (
+        Counter(entity["text"] for entity in entities),
+        Counter((rel["start_entity"], rel["end_entity"], rel["relationship_type"]) for rel in relationships)
+    )
+
+def legacy_result(text):
+    entities, relationships = legacy_extract(text)
+    return (
+        Counter(entity["text"] for entity in entities),
+        Counter((rel["start_entity"], rel["end_entity"], rel["relationship_type"]) for rel in relationships)
+    )
+
+@pytest.mark.parametrize("text", TEXTS)
+def test_engine_matches_legacy_findall(text):
+    assert engine_result(ExtractionEngine(), text) == legacy_result(text)
+
+def test_every_default_verb_is_extracted():
+    engine = ExtractionEngine()
+    for relationship_type, phrase in [
+        ("IS_A", "is a"), ("IS_A", "is an"), ("RELATES_TO", "relates to"), ("CONNECTS_TO", "connects to"),
+        ("INFLUENCES", "influences"), ("CAUSES", "causes"), ("DEPENDS_ON", "depends on")
+    ]:
+        text = f"alpha {phrase} beta"
+        assert engine_result(engine, text) == legacy_result(text)
+        assert engine_result(engine, text)[1] == Counter({("alpha", "beta", relationship_type): 1})
+    assert sorted(engine.relationship_types) == sorted(DEFAULT_RELATIONSHIP_PATTERNS)
+
+def test_registered_verbs_match_findall_with_the_same_pattern():
+    engine = ExtractionEngine({**DEFAULT_RELATIONSHIP_PATTERNS, "BELONGS_TO": r"belongs\s+to", "MENTORS": r"mentors"})
+    text = "wheel belongs to car, spoke BELONGS TO wheel and alice mentors bob; rust causes decay"
+    legacy_entities, legacy_relationships = legacy_result(text)
+    for pattern, relationship_type in [(r"belongs\s+to", "BELONGS_TO"), (r"mentors", "MENTORS")]:
+        legacy_relationships.update(
+            (start, end, relationship_type)
+            for start, end in re.findall(rf"(\w+)\s+{pattern}\s+(\w+)", text, re.IGNORECASE)
+        )
+    assert engine_result(engine, text) == (legacy_entities, legacy_relationships)
+    assert engine.relationship_type_for("Belongs To") == "BELONGS_TO"
+
+def test_entities_carry_labels_and_their_own_spans():
+    text = "Alice met Bob. Later Alice wrote on 12/05/2024 and again on 2024-06-01."
+    entities, _ = ExtractionEngine().extract(text)
+    
+    assert [(entity["text"], entity["label"]) for entity in entities] == [
+        ("Alice", "CONCEPT"), ("Bob", "CONCEPT"), ("Later Alice", "CONCEPT"),
+        ("12/05/2024", "DATE"), ("2024-06-01", "DATE")
+    ]
+    assert all(text[entity["start"]:entity["end"]] == entity["text"] for entity in entities)
+
+def test_deliberate_differences_from_legacy():
+    engine = ExtractionEngine()
+    # Multi-word concepts are whole endpoints, and chained verbs share a term
+    _, relationships = engine.extract("Machine Learning relates to Artificial Intelligence")
+    assert [(rel["start_entity"], rel["end_entity"]) for rel in relationships] == [
+        ("Machine Learning", "Artificial Intelligence")
+    ]
+    _, relationships = engine.extract("stress causes fatigue causes errors")
+    assert [(rel["start_entity"], rel["end_entity"]) for rel in relationships] == [
+        ("stress", "fatigue"), ("fatigue", "errors")
+    ]
+    assert legacy_extract("stress causes fatigue causes errors")[1] == [
+        {"start_entity": "stress", "end_entity": "fatigue", "relationship_type": "CAUSES"}
+    ]
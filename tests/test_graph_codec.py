@@ -0,0 +1,84 @@
+"""
+Compact columnar wire format and content negotiation for GET /api/kg/
+"""
+
+import json
+from types import SimpleNamespace
+import pytest
+from fastapi.testclient import TestClient
+from app.main import app
+from app.services import graph_codec
+from app.services.graph_codec import GraphSnapshot, decode_compact, encode_compact, negotiate_format
+
+NODES = [
+    {"id": "concept_python", "labels": ["Entity", "CONCEPT"],
+     "properties": {"id": "concept_python", "name": "Python", "type": "CONCEPT", "aliases": ["py"]}},
+    {"id": "person_guido", "labels": ["Entity", "PERSON"],
+     "properties": {"id": "person_guido", "name": "Guido", "type": "PERSON", "seq": 3}},
+]
+RELATIONSHIPS = [
+    {"rel_id": 7, "type": "RELATES_TO", "start_node_id": "person_guido", "end_node_id": "concept_python",
+     "properties": {"confidence": 0.7}},
+    # An endpoint outside the snapshot
+    {"rel_id": 8, "type": "INFLUENCES", "start_node_id": "concept_python", "end_node_id": "concept_rust",
+     "properties": {}},
+]
+
+def test_compact_round_trip():
+    payload = json.loads(graph_codec.dumps(encode_compact(NODES, RELATIONSHIPS, version=4, cursor=12)))
+    assert (payload["graph_version"], payload["next_cursor"]) == (4, 12)
+    assert payload["ids"] == ["concept_python", "person_guido", "concept_rust"]
+    assert payload["nodes"]["properties"]["seq"] == [None, 3]
+    
+    assert decode_compact(payload) == (NODES, RELATIONSHIPS)
+
+def test_snapshot_bodies_decode_to_the_same_rows():
+    snapshot = GraphSnapshot(4, NODES, RELATIONSHIPS, cursor=12)
+    assert decode_compact(json.loads(snapshot.body("compact")[0])) == (NODES, RELATIONSHIPS)
+    
+    plain = json.loads(snapshot.body("json")[0])
+    assert plain == json.loads(snapshot.response().model_dump_json())
+    assert [rel["id"] for rel in plain["relationships"]] == ["7", "8"]
+    
+    with pytest.raises(ValueError):
+        decode_compact({**json.loads(snapshot.body("compact")[0]), "format": 2})
+
+def test_accept_header_negotiation(monkeypatch):
+    monkeypatch.setattr(graph_codec, "msgpack", None)
+    assert negotiate_format("") == "json"
+    assert negotiate_format("application/vnd.kg.compact+json") == "compact"
+    assert negotiate_format("application/json;q=0.9, application/vnd.kg.compact+json;q=0.5") == "compact"
+    assert negotiate_format("application/vnd.kg.compact+json;q=0") == "json"
+    # MessagePack isn't installed, so the next acceptable format is used, else JSON
+    assert negotiate_format("application/msgpack, application/vnd.kg.compact+json;q=0.5") == "compact"
+    assert negotiate_format("application/msgpack") == "json"
+    with pytest.raises(ValueError):
+        negotiate_format("", "msgpack")
+    
+    monkeypatch.setattr(graph_codec, "msgpack", SimpleNamespace())
+    assert negotiate_format("application/x-msgpack") == "msgpack"
+    assert negotiate_format("", "msgpack") == "msgpack"
+
+@pytest.fixture
+def client(monkeypatch):
+    monkeypatch.setattr(graph_codec, "msgpack", None)
+    with TestClient(app) as client:
+        yield client
+
+def test_responses_fall_back_to_json_without_optional_packages(client):
+    for index in range(30):
+        response = client.post("/api/kg/entity", params={"name": f"Concept {index}", "entity_type": "CONCEPT"})
+        assert response.status_code == 200
+    
+    response = client.get("/api/kg/", headers={"Accept": "application/msgpack", "Accept-Encoding": "zstd"})
+    assert response.headers["content-type"] == "application/json"
+    assert "content-encoding" not in response.headers
+    assert len(response.json()["nodes"]) == 30
+    assert client.get("/api/kg/", params={"format": "msgpack"}).status_code == 400
+    
+    response = client.get("/api/kg/", params={"format": "compact"}, headers={"Accept-Encoding": "zstd, gzip"})
+    assert response.headers["content-type"] == "application/vnd.kg.compact+json"
+    # TestClient transparently gunzips, so the header is the evidence
+    assert response.headers["content-encoding"] == "gzip"
+    nodes, _ = decode_compact(response.json())
+    assert {node["properties"]["name"] for node in nodes} == {f"Concept {index}" for index in range(30)}
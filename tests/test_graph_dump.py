@@ -0,0 +1,80 @@
+"""
+Graph dump and restore: chunked compressed files loaded back into an empty tenant
+"""
+
+import json
+import pytest
+from app.services import graph_dump
+from app.services.graph_dump import get_graph_dumper
+from app.services.knowledge_graph import KnowledgeGraphService, get_kg_service
+
+# Stamped anew by the restoring write
+WRITE_STAMPS = {"seq", "updated_at", "tenant_id"}
+
+def entity_id(name, entity_type="CONCEPT"):
+    return KnowledgeGraphService.make_entity_id(name, entity_type)
+
+async def graph_contents(service):
+    nodes, relationships = {}, set()
+    async for record in service.export_graph(page_size=2):
+        properties = {key: value for key, value in record["properties"].items() if key not in WRITE_STAMPS}
+        if record["kind"] == "node":
+            nodes[record["id"]] = (sorted(record["labels"]), properties)
+        else:
+            relationships.add((record["type"], record["start_node_id"], record["end_node_id"],
+                               json.dumps(properties, sort_keys=True)))
+    return nodes, relationships
+
+@pytest.fixture
+async def source():
+    service = get_kg_service("acme")
+    await service.upsert_batch(
+        [
+            {"name": "Python", "type": "CONCEPT", "properties": {"aliases": ["py", "cpython"], "rank": 1}},
+            {"name": "Django", "type": "CONCEPT", "properties": {"description": "Web framework"}},
+            {"name": "Guido", "type": "PERSON", "properties": {"born": 1956}},
+            {"name": "Flask", "type": "CONCEPT", "properties": {}},
+            {"name": "Rust", "type": "CONCEPT", "properties": {"score": 0.5}},
+        ],
+        [
+            {"start_entity": entity_id("Django"), "end_entity": entity_id("Python"), "type": "DEPENDS_ON",
+             "properties": {"confidence": 0.9}},
+            {"start_entity": entity_id("Flask"), "end_entity": entity_id("Python"), "type": "DEPENDS_ON"},
+            {"start_entity": entity_id("Guido", "PERSON"), "end_entity": entity_id("Python"), "type": "INFLUENCES",
+             "properties": {"since": "1991"}},
+        ]
+    )
+    return service
+
+@pytest.mark.parametrize("compression", ["gzip", "none"])
+async def test_dump_restores_into_an_empty_tenant(source, tmp_path, compression):
+    report = await get_graph_dumper("acme").dump(str(tmp_path / "dump"), compression=compression, chunk_records=2)
+    assert (report.nodes, report.relationships) == (5, 3)
+    
+    manifest = json.loads((tmp_path / "dump" / "manifest.json").read_text())
+    # Chunks of at most two records: three node files and two relationship files
+    assert [(file["kind"], file["records"]) for file in manifest["files"]] == [
+        ("nodes", 2), ("nodes", 2), ("nodes", 1), ("relationships", 2), ("relationships", 1)
+    ]
+    assert all(file["name"].endswith(graph_dump.EXTENSIONS[compression]) for file in manifest["files"])
+    assert report.files == 5 and manifest["tenant_id"] == "acme"
+    
+    restored = await get_graph_dumper("globex").restore(str(tmp_path / "dump"), batch_size=3)
+    assert (restored.nodes, restored.relationships, restored.skipped_relationships) == (5, 3, 0)
+    
+    target = get_kg_service("globex")
+    assert await graph_contents(target) == await graph_contents(source)
+    # Derived state was rebuilt from the bulk load
+    assert target.stats.snapshot()["total_relationships"] == 3
+    assert target.resolve_entity("guido") == entity_id("Guido", "PERSON")
+    # The source tenant is untouched
+    assert len((await get_kg_service("acme").get_snapshot()).nodes) == 5
+
+async def test_incomplete_dumps_and_missing_zstandard_are_refused(source, tmp_path, monkeypatch):
+    with pytest.raises(FileNotFoundError):
+        await get_graph_dumper("globex").restore(str(tmp_path))
+    
+    monkeypatch.setattr(graph_dump, "zstandard", None)
+    with pytest.raises(ValueError):
+        await get_graph_dumper("acme").dump(str(tmp_path / "dump"), compression="zstd")
+    assert not (tmp_path / "dump").exists()
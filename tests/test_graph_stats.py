@@ -0,0 +1,88 @@
+"""
+Graph statistics: incremental updates and reconciling while writes land
+"""
+
+import asyncio
+from collections import Counter
+from app.services.graph_stats import GraphStats
+
+class PausingBackend:
+    """Graph held as an edge list whose scans wait at chosen points for a test to write"""
+    
+    def __init__(self, entities, edges):
+        self.entities = dict(entities)
+        self.edges = list(edges)
+        self.pause_after_rows = None
+        self.pause_before_counts_return = False
+        self.paused = asyncio.Event()
+        self.resume = asyncio.Event()
+    
+    def proceed(self):
+        self.paused.clear()
+        self.resume.set()
+    
+    def write(self, stats, entities, edges):
+        """Commit to the graph, then apply to the statistics like upsert_batch does"""
+        self.entities.update(entities)
+        self.edges.extend(edges)
+        stats.apply(entities.items(), edges)
+    
+    async def _pause(self):
+        self.paused.set()
+        await self.resume.wait()
+        self.resume.clear()
+    
+    def degree(self, entity_id):
+        return sum((start_id == entity_id) + (end_id == entity_id) for start_id, end_id, _ in self.edges)
+    
+    async def scan_entities(self, with_degree=False):
+        for index, entity_id in enumerate(sorted(self.entities)):
+            if index == self.pause_after_rows:
+                await self._pause()
+            yield {"id": entity_id, "type": self.entities[entity_id], "degree": self.degree(entity_id)}
+    
+    async def relationship_type_counts(self):
+        counts = Counter(relationship_type for _, _, relationship_type in self.edges)
+        if self.pause_before_counts_return:
+            await self._pause()
+        return counts
+
+async def test_writes_applied_during_a_reconcile_survive_it():
+    backend = PausingBackend({"a": "CONCEPT", "b": "CONCEPT"}, [("a", "b", "RELATES_TO")])
+    stats = GraphStats(backend)
+    await stats.reconcile()
+    
+    # First write lands after "a" was scanned and before "b" is
+    backend.pause_after_rows = 1
+    backend.pause_before_counts_return = True
+    reconcile = asyncio.create_task(stats.reconcile())
+    await backend.paused.wait()
+    backend.write(stats, {"c": "PERSON"}, [("a", "c", "KNOWS"), ("b", "c", "KNOWS")])
+    backend.proceed()
+    
+    # Second write lands after the relationship counts were read
+    await backend.paused.wait()
+    backend.write(stats, {"d": "PERSON"}, [("c", "d", "KNOWS")])
+    backend.proceed()
+    await reconcile
+    
+    during = stats.snapshot()
+    assert during["entities_by_type"] == {"CONCEPT": 2, "PERSON": 2}
+    assert during["relationships_by_type"] == {"RELATES_TO": 1, "KNOWS": 3}
+    assert stats._degrees == {"a": 2, "b": 2, "c": 3, "d": 1}
+    
+    # The same as reconciling a quiet graph
+    backend.pause_after_rows = None
+    backend.pause_before_counts_return = False
+    await stats.reconcile()
+    quiet = stats.snapshot()
+    assert {key: value for key, value in during.items() if key != "last_reconciled_at"} == \
+        {key: value for key, value in quiet.items() if key != "last_reconciled_at"}
+
+async def test_apply_counts_new_items_and_degrees():
+    stats = GraphStats(PausingBackend({}, []))
+    stats.apply([("a", "CONCEPT"), ("b", "CONCEPT")], [("a", "b", "RELATES_TO"), ("a", "a", "RELATES_TO")])
+    
+    snapshot = stats.snapshot()
+    assert (snapshot["total_entities"], snapshot["total_relationships"]) == (2, 2)
+    assert snapshot["degree_histogram"] == {"1": 1, "2-3": 1}
@@ -0,0 +1,70 @@
+"""
+Prometheus text exposition of the latency histograms, counters and gauges
+"""
+
+import pytest
+from fastapi.testclient import TestClient
+from app.core.metrics import MetricsRegistry
+from app.main import app
+
+def test_histogram_renders_cumulative_buckets_per_outcome():
+    registry = MetricsRegistry()
+    histogram = registry.histogram("stage_seconds", "Time per stage", ["stage", "outcome"], buckets=(0.5, 0.1))
+    for value in (0.05, 0.1, 0.3, 2.0):
+        histogram.observe(value, stage="nlp", outcome="ok")
+    with pytest.raises(RuntimeError):
+        with histogram.time(stage="graph_write"):
+            raise RuntimeError("deadlock")
+    
+    lines = registry.render().splitlines()
+    assert lines[:2] == ["# HELP stage_seconds Time per stage", "# TYPE stage_seconds histogram"]
+    # Sorted by label values; a value on a bound counts towards it
+    assert lines[2:5] == [
+        'stage_seconds_bucket{stage="graph_write",outcome="error",le="0.1"} 1',
+        'stage_seconds_bucket{stage="graph_write",outcome="error",le="0.5"} 1',
+        'stage_seconds_bucket{stage="graph_write",outcome="error",le="+Inf"} 1',
+    ]
+    assert lines[5].startswith('stage_seconds_sum{stage="graph_write",outcome="error"} ')
+    assert lines[6:] == [
+        'stage_seconds_count{stage="graph_write",outcome="error"} 1',
+        'stage_seconds_bucket{stage="nlp",outcome="ok",le="0.1"} 2',
+        'stage_seconds_bucket{stage="nlp",outcome="ok",le="0.5"} 3',
+        'stage_seconds_bucket{stage="nlp",outcome="ok",le="+Inf"} 4',
+        f'stage_seconds_sum{{stage="nlp",outcome="ok"}} {0.05 + 0.1 + 0.3 + 2.0!r}',
+        'stage_seconds_count{stage="nlp",outcome="ok"} 4',
+    ]
+
+def test_counters_and_gauges_escape_label_values():
+    registry = MetricsRegistry()
+    retries = registry.counter("retries_total", "Retried transactions", ["query"])
+    retries.inc(query='say "hi"\n')
+    retries.inc(2, query='say "hi"\n')
+    in_flight = registry.gauge("in_flight", "Queries running")
+    in_flight.inc()
+    in_flight.inc()
+    in_flight.dec()
+    
+    assert registry.render() == "\n".join([
+        "# HELP retries_total Retried transactions",
+        "# TYPE retries_total counter",
+        'retries_total{query="say \\"hi\\"\\n"} 3',
+        "# HELP in_flight Queries running",
+        "# TYPE in_flight gauge",
+        "in_flight 1",
+    ]) + "\n"
+
+def test_labels_and_names_are_checked():
+    registry = MetricsRegistry()
+    histogram = registry.histogram("stage_seconds", "Time per stage", ["stage"])
+    with pytest.raises(ValueError):
+        histogram.observe(1.0, query="x")
+    with pytest.raises(ValueError):
+        registry.counter("stage_seconds", "Duplicate")
+
+def test_metrics_endpoint_serves_the_text_format():
+    with TestClient(app) as client:
+        response = client.get("/metrics")
+    assert response.status_code == 200
+    assert response.headers["content-type"] == "text/plain; version=0.0.4; charset=utf-8"
+    assert "# TYPE chat_stage_seconds histogram" in response.text
+    assert "# TYPE neo4j_queries_in_flight gauge" in response.text
@@ -0,0 +1,123 @@
+"""
+k-hop neighbourhoods: depth, direction, fan-out, paging, caching and GET /api/kg/entity/{id}
+"""
+
+import pytest
+from fastapi.testclient import TestClient
+from app.main import app
+from app.services.knowledge_graph import KnowledgeGraphService, get_kg_service
+
+def concept_id(name):
+    return KnowledgeGraphService.make_entity_id(name, "CONCEPT")
+
+async def write(service, names, edges=(), **properties):
+    await service.upsert_batch(
+        [{"name": name, "type": "CONCEPT", "properties": dict(properties)} for name in names],
+        [{"start_entity": concept_id(start), "end_entity": concept_id(end), "type": relationship_type}
+         for start, end, relationship_type in edges]
+    )
+
+def neighbour_hops(neighbourhood):
+    return {node["properties"]["name"]: node["hop"] for node in neighbourhood["neighbours"]}
+
+@pytest.fixture
+async def chain():
+    """A -> B -> C -> D, plus E -> A"""
+    service = get_kg_service()
+    await write(service, ["A", "B", "C", "D", "E"], [
+        ("A", "B", "RELATES_TO"), ("B", "C", "RELATES_TO"), ("C", "D", "CAUSES"), ("E", "A", "INFLUENCES")
+    ])
+    return service
+
+async def test_depth_and_direction(chain):
+    assert neighbour_hops(await chain.get_neighbourhood(concept_id("A"))) == {"B": 1, "E": 1}
+    assert neighbour_hops(await chain.get_neighbourhood(concept_id("A"), depth=3, direction="out")) == {
+        "B": 1, "C": 2, "D": 3
+    }
+    assert neighbour_hops(await chain.get_neighbourhood(concept_id("A"), direction="in")) == {"E": 1}
+    
+    neighbourhood = await chain.get_neighbourhood(concept_id("A"), depth=2)
+    assert neighbour_hops(neighbourhood) == {"B": 1, "E": 1, "C": 2}
+    assert {(rel["start_node_id"], rel["end_node_id"]) for rel in neighbourhood["relationships"]} == {
+        (concept_id("A"), concept_id("B")), (concept_id("B"), concept_id("C")), (concept_id("E"), concept_id("A"))
+    }
+    assert await chain.get_neighbourhood(concept_id("Z")) is None
+
+async def test_relationship_type_filter(chain):
+    neighbourhood = await chain.get_neighbourhood(concept_id("A"), depth=3, relationship_types=["RELATES_TO"])
+    assert neighbour_hops(neighbourhood) == {"B": 1, "C": 2}
+    
+    with pytest.raises(ValueError):
+        await chain.get_neighbourhood(concept_id("A"), relationship_types=["RELATES_TO]-(x"])
+    with pytest.raises(ValueError):
+        await chain.get_neighbourhood(concept_id("A"), direction="sideways")
+
+async def test_fan_out_caps_each_node_and_pages_cover_every_neighbour():
+    service = get_kg_service()
+    spokes = [f"Spoke{index}" for index in range(5)]
+    await write(service, ["Hub", *spokes], [("Hub", spoke, "RELATES_TO") for spoke in spokes])
+    
+    assert len((await service.get_neighbourhood(concept_id("Hub"), fan_out=2))["neighbours"]) == 2
+    
+    first = await service.get_neighbourhood(concept_id("Hub"), limit=3)
+    assert (first["total_neighbours"], first["next_offset"]) == (5, 3)
+    # Only edges between the entity and this page's nodes
+    assert len(first["relationships"]) == 3
+    rest = await service.get_neighbourhood(concept_id("Hub"), limit=3, offset=3)
+    assert rest["next_offset"] is None
+    assert {node["id"] for node in first["neighbours"] + rest["neighbours"]} == {concept_id(spoke) for spoke in spokes}
+
+async def test_cached_neighbourhood_is_dropped_when_a_node_in_it_is_written(chain):
+    await chain.get_neighbourhood(concept_id("A"), depth=2)
+    await chain.get_neighbourhood(concept_id("A"), depth=2)
+    assert chain.neighbourhood_cache_stats()["hits"] == 1
+    
+    # A write elsewhere in the graph keeps the entry
+    await write(chain, ["Elsewhere"])
+    await chain.get_neighbourhood(concept_id("A"), depth=2)
+    assert chain.neighbourhood_cache_stats()["hits"] == 2
+    
+    # A new edge at the edge of the neighbourhood drops it
+    await write(chain, ["F"], [("C", "F", "RELATES_TO")])
+    assert neighbour_hops(await chain.get_neighbourhood(concept_id("A"), depth=3)) == {
+        "B": 1, "E": 1, "C": 2, "D": 3, "F": 3
+    }
+    await chain.get_neighbourhood(concept_id("A"), depth=2)
+    assert chain.neighbourhood_cache_stats()["invalidations"] == 1
+    
+    # So does a property change on a node in it
+    await write(chain, ["B"], note="updated")
+    neighbourhood = await chain.get_neighbourhood(concept_id("A"), depth=2)
+    updated = next(node for node in neighbourhood["neighbours"] if node["id"] == concept_id("B"))
+    assert updated["properties"]["note"] == "updated"
+
+@pytest.fixture
+def client():
+    with TestClient(app) as client:
+        yield client
+
+def test_entity_details_keep_the_original_response_shape(client):
+    for name in ("Python", "Django", "Guido"):
+        assert client.post("/api/kg/entity", params={"name": name, "entity_type": "CONCEPT"}).status_code == 200
+    for start, end in (("Django", "Python"), ("Python", "Guido")):
+        response = client.post("/api/kg/relationship", params={
+            "start_entity": start, "end_entity": end, "relationship_type": "DEPENDS_ON"
+        })
+        assert response.status_code == 200
+    
+    details = client.get(f"/api/kg/entity/{concept_id('Python')}").json()
+    assert details["entity_id"] == concept_id("Python")
+    connections = details["connections"]
+    assert connections["entity"]["name"] == "Python"
+    outgoing = [(item["relationship"][1], item["connected"]["name"], item["direction"])
+                for item in connections["outgoing"]]
+    assert outgoing == [("DEPENDS_ON", "Guido", "outgoing")]
+    incoming = connections["incoming"][0]
+    assert (incoming["connected"]["name"], incoming["direction"]) == ("Django", "incoming")
+    assert [incoming["relationship"][0]["name"], incoming["relationship"][2]["name"]] == ["Django", "Python"]
+    
+    assert client.get("/api/kg/entity/concept_missing").json() == {"entity_id": "concept_missing", "connections": {}}
+    
+    neighbourhood = client.get(f"/api/kg/entity/{concept_id('Python')}/neighbourhood").json()
+    assert neighbourhood["total_neighbours"] == 2
+    assert client.get("/api/kg/entity/concept_missing/neighbourhood").status_code == 404
@@ -0,0 +1,29 @@
+"""
+POST /api/kg/search: ranking, paging and request validation
+"""
+
+import pytest
+from fastapi.testclient import TestClient
+from app.main import app
+
+@pytest.fixture
+def client():
+    with TestClient(app) as client:
+        yield client
+
+def test_search_pages_best_matches_first(client):
+    for name in ("Python", "Python Web", "CPython"):
+        assert client.post("/api/kg/entity", params={"name": name, "entity_type": "CONCEPT"}).status_code == 200
+    
+    page = client.post("/api/kg/search", json={"query": "python", "limit": 2}).json()
+    assert [result["name"] for result in page["results"]] == ["Python", "Python Web"]
+    assert page["next_offset"] == 2
+    
+    last = client.post("/api/kg/search", json={"query": "python", "limit": 2, "offset": 2}).json()
+    assert [result["name"] for result in last["results"]] == ["CPython"]
+    assert last["next_offset"] is None
+
+@pytest.mark.parametrize("paging", [{"limit": None}, {"offset": None}, {"limit": 0}, {"offset": -1}])
+def test_invalid_paging_is_rejected(client, paging):
+    response = client.post("/api/kg/search", json={"query": "python", **paging})
+    assert response.status_code == 422
@@ -0,0 +1,85 @@
+"""
+Entity similarity index: exact and IVF search agree, and vectors persist in SIMILARITY_DIR
+"""
+
+import numpy as np
+import pytest
+from app.core.config import settings
+from app.services.knowledge_graph import KnowledgeGraphService, get_kg_service
+from app.services.similarity import EntitySimilarityIndex
+
+LANGUAGES = ["Python", "Django", "Flask", "Rust", "Go", "Java", "Kotlin", "Scala", "Ruby", "Rails"]
+NAMES = [language + suffix for language in LANGUAGES
+         for suffix in ("", " Web", " Framework", " Library", " Compiler", " Runtime")]
+
+def concept_id(name):
+    return KnowledgeGraphService.make_entity_id(name, "CONCEPT")
+
+@pytest.fixture
+async def service(monkeypatch):
+    monkeypatch.setattr(settings, "SIMILARITY_VECTORIZER", "hashing")
+    service = get_kg_service()
+    await service.upsert_batch([{"name": name, "type": "CONCEPT", "properties": {}} for name in NAMES], [])
+    return service
+
+async def settle(index):
+    for task in (index._drain_task, index._train_task):
+        if task is not None:
+            await task
+
+async def test_ivf_search_matches_brute_force(service, monkeypatch):
+    exact = EntitySimilarityIndex(service.backend)
+    await exact.load()
+    assert exact.ivf is None
+    
+    monkeypatch.setattr(settings, "SIMILARITY_IVF_MIN_SIZE", len(NAMES))
+    # Probing every list makes the IVF search exhaustive, so the results must be identical
+    monkeypatch.setattr(settings, "SIMILARITY_NPROBE", 16)
+    approximate = EntitySimilarityIndex(service.backend)
+    await approximate.load()
+    await settle(approximate)
+    assert approximate.stats()["ivf_lists"] == 16
+    
+    for text in ("python", "web framework", "rust compiler", "kotlin"):
+        assert approximate.similar_to_text(text, limit=5) == exact.similar_to_text(text, limit=5)
+    assert approximate.similar_to_entity(concept_id("Django Web")) == exact.similar_to_entity(concept_id("Django Web"))
+    assert concept_id("Django Web") not in {result["id"] for result in exact.similar_to_entity(concept_id("Django Web"))}
+    
+    # Entities written after training are assigned to a list and found
+    await service.upsert_batch([{"name": "Pythonic Runtime", "type": "CONCEPT", "properties": {}}], [])
+    approximate.observe([{"id": concept_id("Pythonic Runtime"), "properties": {"name": "Pythonic Runtime"}}])
+    await settle(approximate)
+    assert approximate.similar_to_text("pythonic runtime", limit=1)[0]["name"] == "Pythonic Runtime"
+
+async def test_vectors_reload_from_the_similarity_dir(service, tmp_path):
+    index = EntitySimilarityIndex(service.backend, str(tmp_path))
+    await index.load()
+    index.add_mentions([(concept_id("Rust"), "Rust", "a systems language with a borrow checker")])
+    await settle(index)
+    vectors = np.array(index.vectors.array[:len(index)])
+    assert not np.allclose(vectors[index.row_of[concept_id("Rust")]], index.vectorizer("Rust"))
+    await index.close()
+    
+    # A row appended but never committed by a flush
+    with open(tmp_path / "entities.tsv", "a", encoding="utf-8") as entities:
+        entities.write("concept_uncommitted\tUncommitted\n")
+    await service.upsert_batch([{"name": "Zig", "type": "CONCEPT", "properties": {}}], [])
+    
+    reloaded = EntitySimilarityIndex(service.backend, str(tmp_path))
+    await reloaded.load()
+    assert reloaded.ids[:len(NAMES)] == index.ids[:len(NAMES)]
+    # Context-blended rows come from disk rather than being re-vectorised from the name
+    assert np.array_equal(reloaded.vectors.array[:len(NAMES)], vectors)
+    assert "concept_uncommitted" not in reloaded.row_of
+    # Only the entity written since is vectorised
+    assert reloaded.ids[len(NAMES):] == [concept_id("Zig")]
+    assert reloaded.similar_to_text("zig", limit=1)[0]["name"] == "Zig"
+    await reloaded.close()
+    
+    # A different vectorizer discards the stored vectors
+    with pytest.MonkeyPatch.context() as patch:
+        patch.setattr(settings, "SIMILARITY_DIM", 128)
+        rebuilt = EntitySimilarityIndex(service.backend, str(tmp_path))
+        await rebuilt.load()
+        assert rebuilt.stats()["dim"] == 128 and len(rebuilt) == len(NAMES) + 1
+        await rebuilt.close()
@@ -0,0 +1,79 @@
+"""
+GET /api/kg/ snapshot cache: ETags, 304 responses and invalidation
+"""
+
+import asyncio
+import pytest
+from fastapi.testclient import TestClient
+from app.core.config import settings
+from app.main import app
+from app.services.knowledge_graph import get_kg_service
+
+@pytest.fixture
+def client():
+    with TestClient(app) as client:
+        yield client
+
+def add_entity(client, name, tenant_id=None):
+    headers = {"X-Tenant-ID": tenant_id} if tenant_id else {}
+    response = client.post("/api/kg/entity", params={"name": name, "entity_type": "CONCEPT"}, headers=headers)
+    assert response.status_code == 200
+
+def test_unchanged_graph_is_not_modified(client, monkeypatch):
+    add_entity(client, "Python")
+    response = client.get("/api/kg/")
+    etag = response.headers["etag"]
+    
+    # A 304 is answered from the sequence this process already knows
+    backend = get_kg_service().backend
+    monkeypatch.setattr(backend, "current_sequence", None)
+    monkeypatch.setattr(backend, "snapshot", None)
+    not_modified = client.get("/api/kg/", headers={"If-None-Match": etag})
+    assert not_modified.status_code == 304
+    assert not_modified.headers["etag"] == etag
+    assert not_modified.headers["vary"] == response.headers["vary"] == "Accept, Accept-Encoding, X-Tenant-ID"
+    monkeypatch.undo()
+    
+    # Other wire formats and tenants are tagged differently
+    assert client.get("/api/kg/", params={"format": "compact"}).headers["etag"] != etag
+    assert client.get("/api/kg/", headers={"X-Tenant-ID": "acme"}).headers["etag"] != etag
+
+def test_write_invalidates_the_etag(client):
+    add_entity(client, "Python")
+    etag = client.get("/api/kg/").headers["etag"]
+    
+    add_entity(client, "Rust")
+    response = client.get("/api/kg/", headers={"If-None-Match": etag})
+    assert response.status_code == 200
+    assert response.headers["etag"] != etag
+    assert {node["properties"]["name"] for node in response.json()["nodes"]} == {"Python", "Rust"}
+
+def write_outside_the_service():
+    # Another worker or the CLI writes to storage without touching this process's service
+    asyncio.run(get_kg_service().backend.upsert(
+        {"CONCEPT": [{"id": "concept_rust", "properties": {"id": "concept_rust", "name": "Rust", "type": "CONCEPT"}}]},
+        {}
+    ))
+
+def test_write_outside_the_service_is_seen_after_a_sequence_refresh(client):
+    add_entity(client, "Python")
+    etag = client.get("/api/kg/").headers["etag"]
+    write_outside_the_service()
+    
+    # Until the background refresh reads the durable sequence, the old tag still matches
+    assert client.get("/api/kg/", headers={"If-None-Match": etag}).status_code == 304
+    asyncio.run(get_kg_service().refresh_sequence())
+    
+    response = client.get("/api/kg/", headers={"If-None-Match": etag})
+    assert response.status_code == 200
+    assert {node["properties"]["name"] for node in response.json()["nodes"]} == {"Python", "Rust"}
+
+def test_without_a_refresh_interval_every_request_reads_the_sequence(client, monkeypatch):
+    monkeypatch.setattr(settings, "GRAPH_SEQUENCE_REFRESH_INTERVAL", 0)
+    add_entity(client, "Python")
+    etag = client.get("/api/kg/").headers["etag"]
+    write_outside_the_service()
+    
+    response = client.get("/api/kg/", headers={"If-None-Match": etag})
+    assert response.status_code == 200
+    assert {node["properties"]["name"] for node in response.json()["nodes"]} == {"Python", "Rust"}
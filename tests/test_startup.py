@@ -0,0 +1,61 @@
+"""
+Start-up warm-up: schema setup retries, readiness and the order of tenant-scoped scans
+"""
+
+import asyncio
+import pytest
+from app import main
+from app.core.config import settings
+from app.services.knowledge_graph import get_kg_service
+
+class StubChatAgent:
+    def load_nlp_model(self):
+        pass
+
+@pytest.fixture
+def startup(monkeypatch):
+    """warm_up() with a stub NLP model, Neo4j schema setup enabled and a fresh readiness report"""
+    monkeypatch.setattr(main, "readiness", {**main.readiness, "schema_ready": False, "schema_attempts": 0,
+                                            "schema_error": None})
+    monkeypatch.setattr(main, "get_chat_agent", StubChatAgent)
+    monkeypatch.setattr(settings, "SKIP_SCHEMA_SETUP", False)
+    monkeypatch.setattr(settings, "SCHEMA_SETUP_RETRY_INTERVAL", 0)
+    monkeypatch.setattr(settings, "SCHEMA_SETUP_MAX_RETRIES", 2)
+    return get_kg_service()
+
+async def test_statistics_are_reconciled_after_schema_setup(startup, monkeypatch):
+    calls = []
+    
+    async def initialize():
+        # Slower than the scans, which must still wait for it
+        await asyncio.sleep(0.01)
+        calls.append("schema")
+        return True
+    
+    async def reconcile():
+        calls.append("stats")
+    
+    async def warm():
+        calls.append("entity_index")
+    
+    monkeypatch.setattr(startup.backend, "initialize", initialize)
+    monkeypatch.setattr(startup.stats, "reconcile", reconcile)
+    monkeypatch.setattr(startup.entity_index, "warm", warm)
+    await main.warm_up()
+    
+    assert calls == ["schema", "stats", "entity_index"]
+    assert main.readiness["schema_ready"] and main.readiness["schema_attempts"] == 1
+
+async def test_schema_setup_gives_up_after_the_last_retry(startup, monkeypatch):
+    async def initialize():
+        return False
+    
+    monkeypatch.setattr(startup.backend, "initialize", initialize)
+    await main.warm_up()
+    
+    assert main.readiness["schema_attempts"] == 3
+    assert not main.readiness["schema_ready"]
+    assert main.readiness["schema_error"] == "Schema setup failed after 3 attempts"
+    
+    response = await main.readiness_check()
+    assert response.status_code == 503
@@ -0,0 +1,133 @@
+"""
+Tenant isolation: graphs, search, changes, snapshots, history and the service registry
+"""
+
+import asyncio
+import threading
+import pytest
+from fastapi.testclient import TestClient
+from app.core.config import settings
+from app.main import app
+from app.services import chat_agent, ingestion, knowledge_graph
+from app.services.chat_agent import get_chat_agent
+from app.services.conversation_store import MemoryConversationStore, SQLiteConversationStore
+from app.services.knowledge_graph import (
+    KnowledgeGraphService, TenantLimitError, get_kg_service, get_warm_kg_service
+)
+
+def concept_id(name):
+    return KnowledgeGraphService.make_entity_id(name, "CONCEPT")
+
+async def write(tenant_id, names, **properties):
+    await get_kg_service(tenant_id).upsert_batch(
+        [{"name": name, "type": "CONCEPT", "properties": dict(properties)} for name in names],
+        [{"start_entity": concept_id(names[0]), "end_entity": concept_id(name), "type": "RELATES_TO"}
+         for name in names[1:]]
+    )
+
+async def test_same_entity_in_two_tenants_is_two_entities():
+    await write("acme", ["Python", "Django"], owner="acme")
+    await write("globex", ["Python"], owner="globex")
+    acme, globex = get_kg_service("acme"), get_kg_service("globex")
+    
+    assert (await acme.backend.get_entity(concept_id("Python")))["properties"]["owner"] == "acme"
+    assert (await globex.backend.get_entity(concept_id("Python")))["properties"]["owner"] == "globex"
+    assert await globex.backend.get_entity(concept_id("Django")) is None
+    assert await get_kg_service().backend.get_entity(concept_id("Python")) is None
+    
+    assert [result["id"] for result in await acme.search_entities("django")] == [concept_id("Django")]
+    assert await globex.search_entities("django") == []
+    
+    acme_snapshot, globex_snapshot = await acme.get_snapshot(), await globex.get_snapshot()
+    assert {node["id"] for node in acme_snapshot.nodes} == {concept_id("Python"), concept_id("Django")}
+    assert [node["id"] for node in globex_snapshot.nodes] == [concept_id("Python")]
+    assert len(acme_snapshot.relationships) == 1 and globex_snapshot.relationships == []
+    assert {node["properties"]["tenant_id"] for node in acme_snapshot.nodes} == {"acme"}
+    
+    # Each tenant has its own change sequence
+    globex_changes = await globex.get_changes(0)
+    assert [node["properties"]["owner"] for node in globex_changes.nodes] == ["globex"]
+    assert globex_changes.cursor == 1
+    assert len((await acme.get_changes(0)).nodes) == 2
+    assert acme.stats.snapshot()["total_entities"] == 2
+    assert globex.stats.snapshot()["total_entities"] == 1
+
+async def test_conversation_history_is_scoped_by_tenant(tmp_path):
+    for store in (MemoryConversationStore(), SQLiteConversationStore(str(tmp_path / "conversations.db"))):
+        try:
+            await store.append("s1", {"message": "acme"}, tenant_id="acme")
+            await store.append("s1", {"message": "default"})
+            
+            page, _ = await store.history("s1", tenant_id="acme")
+            assert [entry["message"] for entry in page] == ["acme"]
+            await store.clear("s1", tenant_id="acme")
+            page, _ = await store.history("s1")
+            assert [entry["message"] for entry in page] == ["default"]
+        finally:
+            store.close()
+
+async def test_least_recently_used_idle_tenant_is_unloaded(monkeypatch):
+    monkeypatch.setattr(settings, "MAX_TENANTS", 3)
+    await write("acme", ["Python"])
+    get_kg_service()
+    globex = get_kg_service("globex")
+    acme = get_kg_service("acme")
+    
+    with acme.lease():
+        # globex is the least recently used tenant not in use; the default tenant is never unloaded
+        get_kg_service("initech")
+        assert list(knowledge_graph._services) == ["default", "acme", "initech"]
+        
+        with get_kg_service("initech").lease():
+            with pytest.raises(TenantLimitError):
+                get_kg_service("umbrella")
+    await asyncio.gather(*knowledge_graph._retiring.values())
+    
+    reloaded = await get_warm_kg_service("globex")
+    assert reloaded is not globex
+    assert "acme" not in knowledge_graph._services
+    # The in-memory graph outlives its unloaded service
+    assert (await get_warm_kg_service("acme")).stats.snapshot()["total_entities"] == 1
+
+async def test_bulk_ingest_resolves_against_its_tenant_without_the_registry(monkeypatch):
+    registry = knowledge_graph.get_kg_service
+    
+    def registry_on_the_event_loop_only(tenant_id=None):
+        assert threading.current_thread() is threading.main_thread(), "tenant registry used off the event loop"
+        return registry(tenant_id)
+    
+    monkeypatch.setattr(chat_agent, "get_kg_service", registry_on_the_event_loop_only)
+    monkeypatch.setattr(ingestion, "get_kg_service", registry_on_the_event_loop_only)
+    
+    acme = get_kg_service("acme")
+    await acme.upsert_batch([{"name": "Python", "type": "CONCEPT", "properties": {"aliases": ["py"]}}], [])
+    report = await ingestion.get_bulk_ingestor("acme").ingest(
+        ['{"text": "Django depends on Python."}', '{"text": "Flask depends on Django."}']
+    )
+    assert (report.documents, report.relationships) == (2, 2)
+    assert acme.stats.snapshot()["total_entities"] == 3
+    assert "default" not in knowledge_graph._services
+    
+    # Endpoints not in the text resolve through the index that is passed in, and only through it
+    relationships = [{"start_entity": "Flask", "end_entity": "py", "relationship_type": "USES", "confidence": 0.7}]
+    _, _, writes = get_chat_agent().build_graph_writes([], relationships, {}, acme.entity_index)
+    assert [(write["start_entity"], write["end_entity"]) for write in writes] == [(concept_id("Flask"), concept_id("Python"))]
+    assert get_chat_agent().build_graph_writes([], relationships, {})[2] == []
+
+@pytest.fixture
+def client():
+    with TestClient(app) as client:
+        yield client
+
+def test_requests_are_routed_by_tenant_header(client):
+    for tenant_id in ("acme", "globex"):
+        response = client.post("/api/kg/entity", params={"name": tenant_id.title(), "entity_type": "ORG"},
+                               headers={"X-Tenant-ID": tenant_id})
+        assert response.status_code == 200
+    
+    graph = client.get("/api/kg/", headers={"X-Tenant-ID": "acme"}).json()
+    assert [node["properties"]["name"] for node in graph["nodes"]] == ["Acme"]
+    assert client.get("/api/kg/").json()["nodes"] == []
+    
+    response = client.get("/api/kg/", headers={"X-Tenant-ID": "../etc"})
+    assert response.status_code == 400
@@ -0,0 +1,92 @@
+"""
+Write-behind queue: batching, merging, retries and draining
+"""
+
+import asyncio
+from neo4j.exceptions import TransientError
+from app.core.config import settings
+from app.services.knowledge_graph import KnowledgeGraphService, get_kg_service
+from app.services.write_behind import WriteBehindQueue
+
+def concept(name, **properties):
+    return {"name": name, "type": "CONCEPT", "properties": properties}
+
+def edge(start, end, relationship_type="RELATES_TO"):
+    return {
+        "start_entity": KnowledgeGraphService.make_entity_id(start, "CONCEPT"),
+        "end_entity": KnowledgeGraphService.make_entity_id(end, "CONCEPT"),
+        "type": relationship_type
+    }
+
+async def entity_properties(name, tenant_id=None):
+    entity = await get_kg_service(tenant_id).backend.get_entity(KnowledgeGraphService.make_entity_id(name, "CONCEPT"))
+    return entity and entity["properties"]
+
+async def test_flush_merges_repeated_upserts_into_one_batch():
+    queue = WriteBehindQueue()
+    await queue.put([concept("Python", source="a")], [])
+    await queue.put([concept("Python", note="b"), concept("Rust")], [edge("Python", "Rust")])
+    assert queue.stats()["depth"] == 2
+    
+    await queue.flush()
+    
+    stats = queue.stats()
+    assert (stats["depth"], stats["batches_written"], stats["items_written"]) == (0, 1, 2)
+    properties = await entity_properties("Python")
+    assert (properties["source"], properties["note"]) == ("a", "b")
+    assert get_kg_service().stats.snapshot()["relationships_by_type"] == {"RELATES_TO": 1}
+
+async def test_background_task_drains_full_batches_and_stop_flushes_the_rest(monkeypatch):
+    monkeypatch.setattr(settings, "WRITE_BEHIND_BATCH_SIZE", 2)
+    monkeypatch.setattr(settings, "WRITE_BEHIND_FLUSH_INTERVAL", 60)
+    queue = WriteBehindQueue()
+    queue.start()
+    try:
+        await queue.put([concept("A")], [])
+        await queue.put([concept("B")], [])
+        for _ in range(100):
+            if queue.stats()["items_written"] == 2:
+                break
+            await asyncio.sleep(0.01)
+        assert queue.stats()["items_written"] == 2
+        
+        # Below the batch size nothing wakes the task before the interval; stop() writes it
+        await queue.put([concept("C")], [])
+    finally:
+        await queue.stop()
+    
+    assert not queue.running
+    assert queue.stats()["depth"] == 0
+    assert await entity_properties("C") is not None
+
+async def test_transient_errors_are_retried(monkeypatch):
+    monkeypatch.setattr(settings, "WRITE_BEHIND_RETRY_BACKOFF", 0)
+    service = get_kg_service()
+    upsert_batch = service.upsert_batch
+    calls = []
+    
+    async def flaky_upsert_batch(entities, relationships):
+        calls.append(len(entities))
+        if len(calls) == 1:
+            raise TransientError("deadlock")
+        return await upsert_batch(entities, relationships)
+    
+    monkeypatch.setattr(service, "upsert_batch", flaky_upsert_batch)
+    queue = WriteBehindQueue()
+    await queue.put([concept("Retried")], [])
+    await queue.flush()
+    
+    assert calls == [1, 1]
+    assert (queue.retries, queue.failed_batches, queue.items_written) == (1, 0, 1)
+    assert await entity_properties("Retried") is not None
+
+async def test_batches_are_written_per_tenant():
+    queue = WriteBehindQueue()
+    await queue.put([concept("Shared", owner="acme")], [], tenant_id="acme")
+    await queue.put([concept("Shared", owner="globex")], [], tenant_id="globex")
+    await queue.flush()
+    
+    assert queue.batches_written == 2
+    assert (await entity_properties("Shared", "acme"))["owner"] == "acme"
+    assert (await entity_properties("Shared", "globex"))["owner"] == "globex"
+    assert await entity_properties("Shared") is None